@@ -7,14 +7,81 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "super_secret_key_change_me_in_prod"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    # Cache del usuario autenticado por token (se invalida al cambiar rol/estado)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 1024
     
     # Database - Using unique name to avoid conflict with Railway's default DATABASE_URL
     # Will use PostgreSQL in production (Railway) or SQLite locally
     FINANCE_DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+    # Pool de conexiones (Postgres y SQLite en archivo)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0 # segundos esperando una conexión libre
+    DB_POOL_RECYCLE: int = 1800 # Postgres: renovar conexiones antes de que el proxy/servidor las corte
+    DB_STATEMENT_TIMEOUT_MS: int = 30000 # Postgres: 0 = sin límite
+    DB_LOCK_TIMEOUT_MS: int = 10000 # Postgres: 0 = sin límite
+    # SQLite (PRAGMAs por conexión, ver app/database.py)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 15000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_FOREIGN_KEYS: bool = True
 
     # Google Sheets - Finance App
     GOOGLE_SHEETS_CREDENTIALS_JSON: str = ""
     GOOGLE_SHEET_ID: str = "19eXI3AV-S5uzXfwxC9HoGa6FExZ4ZlvmCvK79fbwMts"
+    # Cola de escrituras a Sheets (worker en segundo plano)
+    SHEETS_OUTBOX_ENABLED: bool = True
+    SHEETS_OUTBOX_POLL_SECONDS: float = 5.0
+    SHEETS_OUTBOX_COALESCE_SECONDS: float = 2.0
+    SHEETS_OUTBOX_BATCH_SIZE: int = 500
+    SHEETS_OUTBOX_MAX_ATTEMPTS: int = 8
+    SHEETS_INDEX_RECONCILE_MINUTES: int = 60 # 0 = solo al detectar diferencias
+    SHEETS_IMPORT_CHUNK_ROWS: int = 5000 # filas por lectura/inserción al importar desde 'Gastos'
+    # Bitácora de /sync/changes: un cliente más atrasado que esto recibe un snapshot completo
+    CHANGE_LOG_RETENTION_DAYS: int = 30 # 0 = sin poda
+    CHANGE_LOG_PRUNE_INTERVAL_MINUTES: int = 6 * 60
+
+    # Modelos (Lúcio/Miguel/Faro/Nexo): timeout por llamada en segundos
+    LLM_TIMEOUT_SECONDS: float = 45.0
+    LLM_OCR_TIMEOUT_SECONDS: float = 60.0 # Miguel con imagen
+    LLM_MAX_RETRIES: int = 2
+    FAST_INTENT_ENABLED: bool = True # mensajes simples del chat sin pasar por el modelo
+    OCR_CACHE_TTL_SECONDS: int = 60 * 60 * 24 # resultados de Miguel por boleta
+    OCR_CACHE_MAX_ENTRIES: int = 500
+    # Fotos de boletas: versión para OCR (grises) y miniatura guardada junto al original
+    OCR_IMAGE_MAX_SIDE: int = 1600
+    OCR_JPEG_QUALITY: int = 80
+    RECEIPT_THUMB_MAX_SIDE: int = 480
+    RECEIPT_THUMB_QUALITY: int = 70
+    # Almacén de boletas por hash: "local" (RECEIPT_STORAGE_DIR) o "s3" (MinIO/R2/S3, requiere boto3)
+    RECEIPT_STORAGE_BACKEND: str = "local"
+    RECEIPT_STORAGE_DIR: str = "uploads/receipts"
+    RECEIPT_MAX_BYTES: int = 15 * 1024 * 1024
+    UPLOAD_FORM_OVERHEAD_BYTES: int = 64 * 1024 # resto del multipart (campos, boundaries) sobre RECEIPT_MAX_BYTES
+    RECEIPT_S3_BUCKET: str = ""
+    RECEIPT_S3_ENDPOINT_URL: str = ""
+    RECEIPT_S3_REGION: str = ""
+    RECEIPT_S3_ACCESS_KEY: str = ""
+    RECEIPT_S3_SECRET_KEY: str = ""
+
+    # Listas grandes (GET /expenses/, /commitments/): columnas + orjson, gzip sobre el umbral
+    FAST_JSON_LISTS: bool = True
+    JSON_GZIP_MIN_BYTES: int = 4096
+    JSON_GZIP_LEVEL: int = 6
+
+    # Gmail (Nexo)
+    GMAIL_BATCH_SIZE: int = 50 # mensajes por request batch (Gmail admite hasta 100)
+    GMAIL_FETCH_ATTEMPTS: int = 3 # intentos por mensaje ante 429/5xx dentro del batch
+    GMAIL_RETRY_BASE_SECONDS: float = 2.0 # backoff exponencial si Gmail no manda Retry-After
+    GMAIL_RETRY_MAX_WAIT_SECONDS: float = 60.0
+    GMAIL_HISTORY_MAX_MESSAGES: int = 500 # tope de mensajes nuevos por sync incremental
+    # Ingesta en segundo plano (app/services/email_ingest.py): el chat solo lee EmailLog
+    GMAIL_SYNC_ENABLED: bool = True
+    GMAIL_SYNC_INTERVAL_MINUTES: int = 5
+    GMAIL_SYNC_LEASE_SECONDS: int = 300 # si un sync muere, otro puede tomar el usuario pasado este tiempo
+    GMAIL_SYNC_FULL_LIMIT: int = 25 # correos del resync completo
 
     # Email (SMTP)
     SMTP_SERVER: str = "smtp.gmail.com"
@@ -0,0 +1,64 @@
+"""
+Camino rápido para respuestas JSON de listas grandes (GET /expenses/, /commitments/).
+
+Con response_model, FastAPI carga cada fila como entidad ORM, la valida contra el
+modelo Pydantic una por una, la pasa por jsonable_encoder y recién ahí json.dumps.
+Aquí se seleccionan solo las columnas del modelo de salida (tuplas, sin identity
+map) y se serializan de una vez: con orjson si está instalado, si no con un
+TypeAdapter de Pydantic construido una sola vez. El JSON es el mismo (mismas
+claves, en el mismo orden; fechas ISO).
+
+Sobre JSON_GZIP_MIN_BYTES se comprime con gzip si el cliente lo acepta. Es por
+respuesta y no GZipMiddleware: el middleware también comprimiría (y bufferearía)
+el stream SSE del chat.
+
+Los endpoints lo usan si FAST_JSON_LISTS está activo; el response_model se mantiene
+para la documentación OpenAPI.
+"""
+import gzip
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type
+
+from pydantic import BaseModel, TypeAdapter
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError: # opcional: sin orjson se usa el TypeAdapter
+    orjson = None
+
+_ROWS_ADAPTER = TypeAdapter(List[Dict[str, Any]])
+
+
+def fields_of(schema: Type[BaseModel]) -> List[str]:
+    """Campos del modelo de salida, en el orden en que FastAPI los serializa."""
+    return list(schema.model_fields)
+
+
+def columns(entity, fields: Sequence[str]) -> list:
+    """Columnas ORM para db.query(*columns(...)): una tupla por fila en vez de una entidad."""
+    return [getattr(entity, name) for name in fields]
+
+
+def dumps_rows(rows: Iterable[Sequence[Any]], fields: Sequence[str]) -> bytes:
+    items = [dict(zip(fields, row)) for row in rows]
+    if orjson is not None:
+        return orjson.dumps(items)
+    return _ROWS_ADAPTER.dump_json(items)
+
+
+def json_response(body: bytes, request: Request, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Respuesta JSON ya serializada; gzip si es grande y el cliente lo acepta."""
+    headers = {k: v for k, v in (headers or {}).items() if k.lower() != "content-length"}
+    if len(body) >= settings.JSON_GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=settings.JSON_GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def rows_response(rows: Iterable[Sequence[Any]], fields: Sequence[str], request: Request,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    return json_response(dumps_rows(rows, fields), request, headers)
@@ -0,0 +1,31 @@
+import os
+
+# backend/ (donde viven alembic.ini y migrations/)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def get_alembic_config():
+    from alembic.config import Config
+    cfg = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    return cfg
+
+
+def is_up_to_date() -> bool:
+    """La BD ya está en head (sin cargar env.py ni abrir una transacción de migración)."""
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    from app.database import engine
+    heads = set(ScriptDirectory.from_config(get_alembic_config()).get_heads())
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    return current == heads
+
+
+def run_migrations(revision: str = "head") -> bool:
+    """Aplica las migraciones pendientes (reemplaza a Base.metadata.create_all). False si no había."""
+    from alembic import command
+    if revision == "head" and is_up_to_date():
+        return False
+    command.upgrade(get_alembic_config(), revision)
+    return True
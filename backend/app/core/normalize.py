@@ -0,0 +1,27 @@
+import re
+import unicodedata
+from typing import Optional
+
+
+def lookup_key(value: Optional[str]) -> Optional[str]:
+    """
+    Clave normalizada para búsquedas sin distinguir mayúsculas ni acentos:
+    " Educación " -> "EDUCACION". Se guarda indexada (section_key, name_key, ...)
+    para reemplazar los ILIKE por igualdades.
+    """
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value.strip())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.casefold().upper()
+
+
+def parse_amount(text) -> int:
+    """Monto en pesos chilenos desde texto ("$12.780" -> 12780). 0 si no hay dígitos."""
+    if not text: return 0
+    try:
+        # Quitar todo lo que no sea dígito
+        clean = re.sub(r'[^\d]', '', text)
+        return int(clean)
+    except:
+        return 0
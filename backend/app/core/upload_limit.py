@@ -0,0 +1,61 @@
+"""
+Límite de tamaño para los endpoints que reciben fotos de boletas.
+
+FastAPI lee el multipart completo (a memoria o a un temporal) antes de llamar al
+endpoint, así que validar el tamaño en store_upload llega tarde: el upload gigante
+ya se recibió entero. Este middleware corta antes:
+  - con Content-Length mayor al límite responde 413 sin leer el cuerpo;
+  - sin Content-Length (chunked) cuenta los bytes a medida que llegan y corta con
+    413 apenas se pasa.
+
+El límite es RECEIPT_MAX_BYTES más UPLOAD_FORM_OVERHEAD_BYTES para el resto del
+formulario (campos, boundaries). store_upload sigue validando el archivo en sí.
+"""
+from typing import Iterable
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"La solicitud supera {limit // (1024 * 1024)} MB")
+
+
+class UploadLimitMiddleware:
+    def __init__(self, app: ASGIApp, paths: Iterable[str]):
+        self.app = app
+        self.paths = tuple(paths)
+
+    def _limit(self) -> int:
+        return settings.RECEIPT_MAX_BYTES + settings.UPLOAD_FORM_OVERHEAD_BYTES
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit()
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            # Sin leer el cuerpo: el cliente recibe el 413 antes de terminar de enviar
+            error = UploadTooLarge(limit)
+            await JSONResponse({"detail": error.detail}, status_code=413, headers={"Connection": "close"})(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Es HTTPException: FastAPI la deja pasar tal cual al parsear el form
+                    raise UploadTooLarge(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
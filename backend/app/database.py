@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 import os
+import threading
 
 db_url = settings.FINANCE_DATABASE_URL
 
@@ -18,10 +19,101 @@ if db_url.startswith("sqlite"):
         # Construct absolute path for the db file
         db_file = db_url.replace("sqlite:///./", "")
         db_url = f"sqlite:///{os.path.join(backend_dir, db_file)}"
-    
-    engine = create_engine(db_url, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(db_url, pool_pre_ping=True)
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Por conexión nueva. WAL: los lectores no bloquean a quien escribe (ni al revés);
+    con synchronous=NORMAL el commit no espera un fsync (en WAL no arriesga corrupción).
+    busy_timeout: un escritor espera su turno en vez de fallar con "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_JOURNAL_MODE:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    if settings.SQLITE_SYNCHRONOUS:
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA foreign_keys={'ON' if settings.SQLITE_FOREIGN_KEYS else 'OFF'}")
+    cursor.close()
+
+
+def make_engine(url: str, **overrides):
+    """Engine con el perfil de su backend (SQLite o Postgres), configurable en Settings."""
+    if url.startswith("sqlite"):
+        options = {
+            "connect_args": {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+        }
+        if ":memory:" in url or url.rstrip("/") == "sqlite:":
+            options = {"connect_args": {"check_same_thread": False}} # una sola BD por conexión: sin pool
+        options.update(overrides)
+        new_engine = create_engine(url, **options)
+        event.listen(new_engine, "connect", _sqlite_pragmas)
+    else:
+        server_options = []
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            server_options.append(f"-c statement_timeout={int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+        if settings.DB_LOCK_TIMEOUT_MS:
+            server_options.append(f"-c lock_timeout={int(settings.DB_LOCK_TIMEOUT_MS)}")
+        options = {
+            "pool_pre_ping": True,
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "connect_args": {"options": " ".join(server_options)} if server_options else {},
+        }
+        options.update(overrides)
+        new_engine = create_engine(url, **options)
+    _watch_pool(new_engine)
+    return new_engine
+
+
+_pool_lock = threading.Lock()
+_pool_stats = {}
+
+
+def _watch_pool(target):
+    """Métricas del pool: uso, pico y cuántas veces se llegó al tope (pool_size + max_overflow)."""
+    stats = {"checkouts": 0, "in_use": 0, "peak_in_use": 0, "saturated": 0, "connects": 0}
+    _pool_stats[id(target)] = stats
+    capacity = None
+    if hasattr(target.pool, "size") and hasattr(target.pool, "_max_overflow"):
+        capacity = target.pool.size() + max(target.pool._max_overflow, 0)
+
+    @event.listens_for(target, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        with _pool_lock:
+            stats["connects"] += 1
+
+    @event.listens_for(target, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with _pool_lock:
+            stats["checkouts"] += 1
+            stats["in_use"] += 1
+            stats["peak_in_use"] = max(stats["peak_in_use"], stats["in_use"])
+            if capacity and stats["in_use"] >= capacity:
+                stats["saturated"] += 1 # el siguiente checkout tendrá que esperar (pool_timeout)
+
+    @event.listens_for(target, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        with _pool_lock:
+            stats["in_use"] = max(stats["in_use"] - 1, 0)
+
+
+def pool_stats(target=None) -> dict:
+    target = target or engine
+    with _pool_lock:
+        s = dict(_pool_stats.get(id(target), {}))
+    s["backend"] = target.dialect.name
+    s["status"] = target.pool.status()
+    return s
+
+
+engine = make_engine(db_url)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
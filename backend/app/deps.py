@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -5,12 +6,26 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.database import get_db
 from app.models.models import User
-from app.core.config import settings
+from app.services import principal_cache
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+@dataclass(frozen=True)
+class Principal:
+    """Usuario autenticado, desacoplado de la sesión (se comparte entre requests vía cache)."""
+    id: int
+    email: str
+    tecnico_nombre: str
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        role = user.role.value if hasattr(user.role, "value") else user.role
+        return cls(id=user.id, email=user.email, tecnico_nombre=user.tecnico_nombre, role=role, is_active=bool(user.is_active))
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -23,21 +38,28 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    
-    if not user.is_active:
+
+    # (sub, exp): un token nuevo del mismo usuario es otra entrada
+    exp = payload.get("exp")
+    principal = principal_cache.get(email, exp)
+    if principal is None:
+        seen_generation = principal_cache.generation()
+        user = db.query(User).filter(User.email == email).first()
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        principal_cache.put(email, exp, principal, seen_generation)
+
+    if not principal.is_active:
          raise HTTPException(status_code=400, detail="Inactive user")
-         
-    return user
 
-def get_current_active_tech(current_user: User = Depends(get_current_user)) -> User:
+    return principal
+
+def get_current_active_tech(current_user: Principal = Depends(get_current_user)) -> Principal:
     # MVP: All active users can access tech features
     return current_user
 
-def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+def get_current_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     if current_user.role != "ADMIN":
         raise HTTPException(status_code=403, detail="Not enough privileges")
     return current_user
@@ -1,4 +1,6 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 import os
 from dotenv import load_dotenv
 
@@ -6,50 +8,91 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from app.core.config import settings
-from app.database import engine, Base
 from fastapi.staticfiles import StaticFiles
-from app.routers import auth, users, finance, commitments, setup, agent, webhooks
-from app.models.finance import Expense, Commitment, PendingExpense, EmailLog  # Import to register with Base
+from app.routers import auth, users, finance, commitments, setup, agent, webhooks, sync, receipts
+from app.models.finance import Expense, Commitment, PendingExpense, EmailLog, ExpenseRollup  # Import to register with Base
 from app.models.budget import Budget, Category, AppConfig  # Import budget models
-
-# Create tables on startup (simple for MVP)
-Base.metadata.create_all(bind=engine)
+from app.models.sync import SyncVersion, ChangeLog, SheetsOutbox, ExpenseSheetRow, ImportJob, GmailSyncState
 
 def init_user():
+    """Crea el usuario inicial si no existe. Si ya existe no se toca (antes se re-hasheaba la clave en cada arranque)."""
     from app.database import SessionLocal
     from app.models.models import User, Role
-    from app.core.security import get_password_hash
     db = SessionLocal()
     try:
         chr_email = "christian.zv@cerebro.com"
         christian = db.query(User).filter(User.email == chr_email).first()
-        hashed_pwd = get_password_hash("123456")
-        
+
         if not christian:
+            from app.core.security import get_password_hash
             print(f"Creating user {chr_email}...")
             christian = User(
                 email=chr_email,
                 tecnico_nombre="Christian ZV",
-                hashed_password=hashed_pwd,
+                hashed_password=get_password_hash("123456"),
                 role=Role.ADMIN,
                 is_active=True
             )
             db.add(christian)
-        else:
-            print(f"Updating password for {chr_email}...")
-            christian.hashed_password = hashed_pwd
+        elif not christian.is_active:
+            print(f"Reactivating {chr_email}...")
             christian.is_active = True
-        
+        else:
+            return
+
         db.commit()
     except Exception as e:
         print(f"Error initializing user: {e}")
     finally:
         db.close()
 
-init_user()
+def init_rollups():
+    from app.database import SessionLocal
+    from app.services.rollup_service import ensure_rollups
+    db = SessionLocal()
+    try:
+        if ensure_rollups(db):
+            print("Expense rollups built from existing expenses.")
+    except Exception as e:
+        print(f"Error initializing expense rollups: {e}")
+    finally:
+        db.close()
+
+def bootstrap():
+    """Tareas de arranque. Idempotentes: con la BD al día no escriben nada."""
+    # Apply pending schema migrations (alembic, see migrations/)
+    from app.core.migrations import run_migrations
+    if run_migrations():
+        print("Database migrations applied.")
+    init_user()
+    init_rollups()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importar app.main no toca la BD ni carga SDKs: todo el arranque corre aquí
+    await run_in_threadpool(bootstrap)
+    if settings.SHEETS_OUTBOX_ENABLED:
+        # Worker que envía la cola de escrituras a Google Sheets
+        from app.services.sheets_outbox import start_worker as start_sheets_outbox
+        start_sheets_outbox()
+    if settings.GMAIL_SYNC_ENABLED:
+        # Worker que mantiene EmailLog al día (el chat ya no sincroniza Gmail)
+        from app.services.email_ingest import start_worker as start_email_ingest
+        start_email_ingest()
+    if settings.CHANGE_LOG_RETENTION_DAYS:
+        # Poda periódica de la bitácora de sync
+        from app.services.sync_service import start_retention_worker
+        start_retention_worker()
+    yield
+    from app.services import llm_gateway, sheets_outbox, email_ingest, sync_service
+    sheets_outbox.stop_worker()
+    email_ingest.stop_worker()
+    sync_service.stop_retention_worker()
+    await llm_gateway.aclose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
@@ -60,8 +103,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Import-Job"],
 )
 
+# Fotos de boletas: 413 antes de recibir el cuerpo completo (ver core/upload_limit.py)
+from app.core.upload_limit import UploadLimitMiddleware
+app.add_middleware(UploadLimitMiddleware, paths=[
+    f"{settings.API_V1_STR}/expenses/",
+    f"{settings.API_V1_STR}/agent/chat",
+    f"{settings.API_V1_STR}/agent/chat/stream",
+])
+
 # ... (omitted) ...
 
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
@@ -71,9 +123,17 @@ app.include_router(commitments.router, prefix=f"{settings.API_V1_STR}/commitment
 app.include_router(setup.router, prefix=f"{settings.API_V1_STR}/setup", tags=["setup"])
 app.include_router(agent.router, prefix=f"{settings.API_V1_STR}/agent", tags=["agent"])
 app.include_router(webhooks.router, prefix=f"{settings.API_V1_STR}/webhooks", tags=["webhooks"])
+app.include_router(sync.router, prefix=f"{settings.API_V1_STR}/sync", tags=["sync"])
+app.include_router(receipts.router, prefix=f"{settings.API_V1_STR}/receipts", tags=["receipts"])
 
+from fastapi import Request
 from fastapi.responses import FileResponse
 
+# Assets con huella (scripts/build_static.py): immutable y precomprimidos. Montado antes que /static.
+from app.services import static_assets
+if os.path.isdir(static_assets.DIST_DIR):
+    app.mount("/static/dist", static_assets.PrecompressedStaticFiles(directory=static_assets.DIST_DIR), name="static-dist")
+
 # Serve Static Files (Frontend) using absolute path to be safe in Docker
 # "app/static" relative to where uvicorn is run (usually /app)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -81,33 +141,44 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 @app.get("/debug-deploy")
 def debug_deploy():
     import os
+    from app.services.sheets_client import stats as sheets_client_stats
+    from app.database import pool_stats
+    from app.services import llm_gateway, prompt_context, intent_parser, ocr_cache, email_ingest, principal_cache
     return {
         "version": "v4.0.0-GoogleCloud",
         "cwd": os.getcwd(),
         "files_in_static": os.listdir("app/static") if os.path.exists("app/static") else "not found",
         "env_check": "GCP" if "K_SERVICE" in os.environ else ("RAILWAY" if "RAILWAY_STATIC_URL" in os.environ else "LOCAL"),
-        "database": "PostgreSQL" if os.getenv("DATABASE_URL", "").startswith("postgresql") else "SQLite"
+        "database": "PostgreSQL" if os.getenv("DATABASE_URL", "").startswith("postgresql") else "SQLite",
+        "db_pool": pool_stats(),
+        "sheets_client": sheets_client_stats(),
+        "llm_usage": llm_gateway.usage_stats(),
+        "prompt_context_cache": prompt_context.stats(),
+        "fast_intent": intent_parser.stats(),
+        "ocr_cache": ocr_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "email_ingest": email_ingest.stats()
     }
 
 @app.get("/")
-def read_root():
-    return FileResponse("app/static/index.html")
+def read_root(request: Request):
+    return static_assets.revalidated_response("index.html", request)
 
 @app.get("/index.html")
-def read_index_html():
-    return FileResponse("app/static/index.html")
+def read_index_html(request: Request):
+    return static_assets.revalidated_response("index.html", request)
 
 @app.get("/analytics")
-def read_analytics():
-    return FileResponse("app/static/analytics.html")
+def read_analytics(request: Request):
+    return static_assets.revalidated_response("analytics.html", request)
 
 @app.get("/manifest.json")
 def get_manifest():
     return FileResponse("app/static/manifest.json")
 
 @app.get("/sw.js")
-def get_sw():
-    return FileResponse("app/static/sw.js")
+def get_sw(request: Request):
+    return static_assets.revalidated_response("sw.js", request)
 
 @app.get("/icon-512.png")
 def get_icon():
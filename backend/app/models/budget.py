@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, Date
+from sqlalchemy import Column, Integer, String, Date, Index
+from sqlalchemy.orm import validates
 from app.database import Base
+from app.core.normalize import lookup_key
 
 class Budget(Base):
     """Modelo para presupuesto mensual global"""
@@ -10,6 +12,8 @@ class Budget(Base):
     month = Column(String, nullable=False)  # Formato: "2026-02"
     user_id = Column(Integer, nullable=False)  # Relacionado con User
 
+    __table_args__ = (Index("ix_budgets_user_month", "user_id", "month"),)
+
 class Category(Base):
     """Modelo para categorías de gastos con presupuesto asignado"""
     __tablename__ = "categories"
@@ -19,6 +23,19 @@ class Category(Base):
     name = Column(String, nullable=False)  # Nombre de la categoría
     budget = Column(Integer, default=0)  # Presupuesto asignado a esta categoría
     user_id = Column(Integer, nullable=False)
+    # Claves normalizadas (sin acentos, mayúsculas) para búsquedas indexadas
+    section_key = Column(String, default=lambda ctx: lookup_key(ctx.get_current_parameters().get("section")))
+    name_key = Column(String, default=lambda ctx: lookup_key(ctx.get_current_parameters().get("name")))
+
+    __table_args__ = (
+        Index("ix_categories_user_section_name", "user_id", "section", "name"),
+        Index("ix_categories_user_keys", "user_id", "section_key", "name_key"),
+    )
+
+    @validates("section", "name")
+    def _sync_lookup_keys(self, key, value):
+        setattr(self, f"{key}_key", lookup_key(value))
+        return value
 
 class AppConfig(Base):
     """Configuración global de la aplicación"""
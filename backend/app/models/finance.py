@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date, Text, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date, Text, Boolean, UniqueConstraint, Index
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime, date
 from app.database import Base
+from app.core.normalize import lookup_key
 
 class Expense(Base):
     __tablename__ = "expenses"
@@ -16,9 +17,24 @@ class Expense(Base):
     payment_method = Column(String, nullable=True) # Débito, Crédito, Efectivo, Transferencia
     image_url = Column(String, nullable=True) # Link a la boleta (futuro)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Claves normalizadas (sin acentos, mayúsculas) para búsquedas indexadas
+    section_key = Column(String, nullable=True, default=lambda ctx: lookup_key(ctx.get_current_parameters().get("section")))
+    category_key = Column(String, nullable=True, default=lambda ctx: lookup_key(ctx.get_current_parameters().get("category") or "General"))
 
     owner = relationship("User", back_populates="expenses")
 
+    __table_args__ = (
+        Index("ix_expenses_user_date", "user_id", "date"), # Dashboard / rangos de fechas
+        Index("ix_expenses_user_section_category", "user_id", "section", "category"), # Categorías y borrados
+        Index("ix_expenses_user_id_id", "user_id", "id"), # Listados ORDER BY id DESC
+        Index("ix_expenses_user_keys", "user_id", "section_key", "category_key"),
+    )
+
+    @validates("section", "category")
+    def _sync_lookup_keys(self, key, value):
+        setattr(self, f"{key}_key", lookup_key(value))
+        return value
+
 class Commitment(Base):
     __tablename__ = "commitments"
 
@@ -32,6 +48,8 @@ class Commitment(Base):
     status = Column(String, default="PENDING") # 'PENDING', 'PAID'
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_commitments_user_id_id", "user_id", "id"),)
+
 class PendingExpense(Base):
     __tablename__ = "pending_expenses"
 
@@ -70,3 +88,18 @@ class EmailLog(Base):
     processed = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_email_logs_user_date", "user_id", "date"),)
+
+class ExpenseRollup(Base):
+    """Totales de gastos pre-agregados por usuario/mes/sección/categoría (alimenta el dashboard)"""
+    __tablename__ = "expense_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    month = Column(String, nullable=False) # Formato: "2026-02"
+    section = Column(String, nullable=False) # Sección del gasto ("OTROS" si venía vacía)
+    category = Column(String, nullable=False)
+    total = Column(Integer, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (UniqueConstraint("user_id", "month", "section", "category", name="_rollup_user_month_cat_uc"),)
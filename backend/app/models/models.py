@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Enum as SqEnum, Text, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Enum as SqEnum, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 import enum
 from app.database import Base
@@ -82,3 +82,5 @@ class ChatHistory(Base):
     role = Column(String, nullable=False)  # "user" or "assistant"
     message = Column(Text, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_chat_history_user_id_id", "user_id", "id"),)
@@ -0,0 +1,85 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from datetime import datetime
+from app.database import Base
+
+class SyncVersion(Base):
+    """Versión de cambios por usuario (monótona, +1 por cada flush con escrituras)"""
+    __tablename__ = "sync_versions"
+
+    user_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    # Versiones <= min_version ya se podaron de change_log: desde ahí solo snapshot
+    min_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+class ChangeLog(Base):
+    """Bitácora de cambios para la sincronización incremental de la PWA"""
+    __tablename__ = "change_log"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False)
+    entity = Column(String, nullable=False) # expense, category, budget, commitment ("*" para reset)
+    entity_id = Column(Integer, nullable=True)
+    op = Column(String, nullable=False) # upsert, delete, reset
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_change_log_user_version", "user_id", "version"),
+        Index("ix_change_log_created_at", "created_at"),
+    )
+
+class SheetsOutbox(Base):
+    """Cola durable de escrituras pendientes hacia Google Sheets (ver sheets_outbox.py)"""
+    __tablename__ = "sheets_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    op = Column(String, nullable=False) # expense_append, expense_update, commitment_upsert, category_add, ...
+    entity_key = Column(String, nullable=True) # "expense:12": operaciones con la misma clave se fusionan
+    payload = Column(Text, nullable=False) # JSON
+    status = Column(String, nullable=False, default="pending") # pending, processing, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)
+    claim = Column(String, nullable=True) # worker que la tomó
+    claimed_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_sheets_outbox_status_id", "status", "id"),)
+
+class ExpenseSheetRow(Base):
+    """Índice local expense_id -> fila en la hoja 'Gastos' (ver sheet_index.py)"""
+    __tablename__ = "expense_sheet_rows"
+
+    expense_id = Column(Integer, primary_key=True)
+    sheet_row = Column(Integer, nullable=False) # 1-based, la fila 1 es el encabezado
+
+    __table_args__ = (Index("ix_expense_sheet_rows_row", "sheet_row"),)
+
+class ImportJob(Base):
+    """Importación masiva de gastos desde 'Gastos' en segundo plano (ver import_service.py)"""
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False) # sync_force (reemplaza todo), restore (BD vacía)
+    status = Column(String, nullable=False, default="pending") # pending, running, done, error
+    total_rows = Column(Integer, nullable=True) # estimado (filas de la hoja)
+    processed_rows = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_import_jobs_user_status", "user_id", "status"),)
+
+class GmailSyncState(Base):
+    """Último historyId de Gmail sincronizado por usuario (sync incremental de Nexo)"""
+    __tablename__ = "gmail_sync_state"
+
+    user_id = Column(Integer, primary_key=True)
+    history_id = Column(String, nullable=True)
+    last_sync_at = Column(DateTime, nullable=True)
+    last_full_sync_at = Column(DateTime, nullable=True)
+    locked_until = Column(DateTime, nullable=True) # lease de email_ingest: un solo sync por usuario a la vez
+    pending_ids = Column(Text, nullable=True) # JSON: mensajes que no se pudieron descargar, se reintentan
@@ -1,16 +1,18 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Body, BackgroundTasks, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, Body, File, UploadFile, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
-from app.database import get_db
-from app.models.models import User
-from app.deps import get_current_user
+from app.database import get_db, SessionLocal
+from app.deps import get_current_user, Principal
 from app.models.finance import Expense, Commitment, PendingExpense, PushSubscription
 from datetime import date, datetime
-from app.services.ai_service import process_finance_message
-from app.services.sheets_service import sync_expense_to_sheet, add_category_to_sheet, sync_commitment_to_sheet, delete_commitment_from_sheet, update_category_in_sheet, delete_category_from_sheet
-from app.services.db_service import add_category_to_db, get_dashboard_data_from_db, update_category_in_db, delete_category_from_db
+import json
+from app.services.ai_service import process_finance_message, stream_finance_message
+from app.services.db_service import add_category_to_db, get_dashboard_data_from_db, update_category_in_db, delete_category_from_db, filter_categories_by_key, filter_expenses_by_key, find_category
+from app.services import rollup_service, sheets_outbox, image_service, email_ingest
 from app.models.budget import Category, Budget
 
 router = APIRouter(tags=["agent"])
@@ -38,7 +40,7 @@ class PushSubRequest(BaseModel):
 def subscribe_push(
     payload: PushSubRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Guarda una suscripción de Push Notifications para el usuario actual.
@@ -65,7 +67,7 @@ def subscribe_push(
 @router.get("/check-pending", response_model=ChatResponse)
 def check_pending_expenses(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Verifica si hay gastos pendientes de categorización (desde correos).
@@ -89,12 +91,11 @@ def check_pending_expenses(
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_agent(
-    background_tasks: BackgroundTasks,
     message: str = Form(""),
     pending_id: Optional[int] = Form(None),
     image: Optional[UploadFile] = File(None),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Endpoint para interactuar con el agente 'Lúcio'. Soporta texto e imágenes (OCR).
@@ -103,6 +104,74 @@ async def chat_with_agent(
     if not user_msg and not image:
         raise HTTPException(status_code=400, detail="Mensaje o imagen requerida")
 
+    pending_ref, pending_context, chat_history, img_bytes = await _prepare_chat(db, current_user, user_msg, pending_id, image)
+
+    result = await process_finance_message(
+        db, current_user.id, user_msg, 
+        extra_context=pending_context, 
+        history=chat_history,
+        image_data=img_bytes
+    )
+    # Escrituras síncronas (SQLAlchemy, cola de Sheets): fuera del event loop
+    return await run_in_threadpool(_run_ai_actions, db, current_user, user_msg, pending_ref, result)
+
+@router.post("/chat/stream")
+async def chat_with_agent_stream(
+    message: str = Form(""),
+    pending_id: Optional[int] = Form(None),
+    image: Optional[UploadFile] = File(None),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Igual que /chat, pero por Server-Sent Events: 'token' con el texto de Lúcio a medida
+    que se genera y 'done' con el ChatResponse final, después de ejecutar las acciones.
+    """
+    user_msg = message.strip()
+    if not user_msg and not image:
+        raise HTTPException(status_code=400, detail="Mensaje o imagen requerida")
+
+    pending_ref, pending_context, chat_history, img_bytes = await _prepare_chat(db, current_user, user_msg, pending_id, image)
+    user_id = current_user.id
+    pending_ref_id = pending_ref.id if pending_ref else None
+
+    async def events():
+        # Sesión propia: la del Depends se cierra antes de que termine el stream
+        # (current_user es un Principal inmutable, no depende de esa sesión)
+        stream_db = SessionLocal()
+        try:
+            pending = stream_db.get(PendingExpense, pending_ref_id) if pending_ref_id else None
+            result = {"status": "error", "message": "Lúcio no respondió."}
+            async for kind, value in stream_finance_message(
+                stream_db, user_id, user_msg,
+                extra_context=pending_context,
+                history=chat_history,
+                image_data=img_bytes
+            ):
+                if kind == "token":
+                    yield _sse("token", {"text": value})
+                else:
+                    result = value
+            response = await run_in_threadpool(_run_ai_actions, stream_db, current_user, user_msg, pending, result)
+            yield _sse("done", response.model_dump())
+        except Exception as e:
+            print(f"Error en stream de Lúcio: {e}")
+            stream_db.rollback()
+            yield _sse("error", {"message": "Lúcio tuvo un problema procesando eso."})
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _prepare_chat(db: Session, current_user: Principal, user_msg: str, pending_id: Optional[int], image: Optional[UploadFile]):
+    """Guarda el mensaje del usuario y reúne lo que Lúcio necesita (historial, pendiente, imagen)."""
     # Si viene de un gasto pendiente
     pending_ref = None
     if pending_id:
@@ -128,24 +197,19 @@ async def chat_with_agent(
     # Manejo de imagen
     img_bytes = None
     if image:
-        img_bytes = await image.read()
+        # Enderezar, reducir y quitar EXIF fuera del event loop (Pillow es CPU)
+        img_bytes = await run_in_threadpool(image_service.prepare_for_ocr, await image.read())
 
-    # 0. Sincronizar correos si el usuario habla de ellos (Nexo se activa)
+    # 0. Si el usuario habla de correos, Lúcio responde con lo ya ingerido y se pide
+    # un sync en segundo plano (email_ingest) para el próximo turno
     nexo_triggers = ["correo", "mail", "recibí", "nexo", "gmail", "transferencia", "compra", "movimiento", "llegó", "llego"]
     if user_msg and any(k in user_msg.lower() for k in nexo_triggers):
-        from app.services.gmail_service import sync_emails_with_nexo
-        try:
-            sync_emails_with_nexo(db, current_user.id, limit=25)
-        except Exception as e:
-            print(f"Error en trigger de Nexo: {e}")
+        email_ingest.request_sync(current_user.id)
 
-    result = process_finance_message(
-        db, current_user.id, user_msg, 
-        extra_context=pending_context, 
-        history=chat_history,
-        image_data=img_bytes
-    )
-    
+    return pending_ref, pending_context, chat_history, img_bytes
+
+def _run_ai_actions(db: Session, current_user: Principal, user_msg: str, pending_ref: Optional[PendingExpense], result: dict) -> ChatResponse:
+    """Ejecuta las acciones que devolvió Lúcio y guarda su respuesta en el historial."""
     if result["status"] == "error":
         return ChatResponse(message=result["message"])
     
@@ -203,9 +267,9 @@ async def chat_with_agent(
             if target_id:
                 expense = db.query(Expense).filter(Expense.id == target_id, Expense.user_id == current_user.id).first()
                 if expense:
-                    from app.services.sheets_service import delete_expense_from_sheet
                     expense_info = {"date": str(expense.date), "concept": expense.concept, "amount": expense.amount}
-                    background_tasks.add_task(delete_expense_from_sheet, expense_info, current_user.tecnico_nombre)
+                    sheets_outbox.queue_expense_delete(db, expense.id, expense_info, current_user.tecnico_nombre)
+                    rollup_service.remove_expense(db, expense)
                     db.delete(expense)
                     db.commit()
                     final_action_taken = True
@@ -222,18 +286,18 @@ async def chat_with_agent(
                 expense = db.query(Expense).filter(Expense.id == target_id, Expense.user_id == current_user.id).first()
                 if expense:
                     old_info = {"date": str(expense.date), "concept": expense.concept, "amount": expense.amount}
+                    rollup_service.remove_expense(db, expense)
                     if data.get("amount") is not None: expense.amount = int(data["amount"])
                     if data.get("concept"): expense.concept = data["concept"]
                     if data.get("category"): expense.category = data["category"]
                     if data.get("section"): expense.section = data["section"]
-                    db.commit()
-                    
-                    from app.services.sheets_service import update_expense_in_sheet
+                    rollup_service.add_expense(db, expense)
                     new_info = {
                         "date": str(expense.date), "concept": expense.concept, "category": expense.category,
                         "section": expense.section or "OTROS", "amount": expense.amount, "payment_method": expense.payment_method
                     }
-                    background_tasks.add_task(update_expense_in_sheet, old_info, new_info, current_user.tecnico_nombre)
+                    sheets_outbox.queue_expense_update(db, expense.id, old_info, new_info, current_user.tecnico_nombre)
+                    db.commit()
                     final_action_taken = True
                     last_expense_data = new_info
                     aggregated_responses.append(response_text or "Gasto actualizado.")
@@ -306,8 +370,9 @@ async def chat_with_agent(
                     created_at=c_date
                 )
                 db.add(new_comm)
+                db.flush()
+                sheets_outbox.queue_commitment_upsert(db, new_comm, current_user.tecnico_nombre)
                 db.commit()
-                background_tasks.add_task(sync_commitment_to_sheet, new_comm, current_user.tecnico_nombre)
                 final_action_taken = True
                 
                 date_str = c_date.strftime("%d/%m")
@@ -321,10 +386,9 @@ async def chat_with_agent(
             if target_id:
                 comm = db.query(Commitment).filter(Commitment.id == target_id, Commitment.user_id == current_user.id).first()
                 if comm:
-                    comm_id = comm.id
+                    sheets_outbox.queue_commitment_delete(db, comm.id)
                     db.delete(comm)
                     db.commit()
-                    background_tasks.add_task(delete_commitment_from_sheet, comm_id)
                     final_action_taken = True
                     aggregated_responses.append(response_text or "Compromiso eliminado.")
             else:
@@ -338,8 +402,8 @@ async def chat_with_agent(
                 if comm:
                     comm.status = "PAID"
                     comm.paid_amount = comm.total_amount
+                    sheets_outbox.queue_commitment_upsert(db, comm, current_user.tecnico_nombre)
                     db.commit()
-                    background_tasks.add_task(sync_commitment_to_sheet, comm, current_user.tecnico_nombre)
                     final_action_taken = True
                     aggregated_responses.append(response_text or "Compromiso marcado pagado.")
 
@@ -352,16 +416,10 @@ async def chat_with_agent(
 
             if target_type == "SECTION" and (sec or cat):
                 folder_to_delete = sec if sec else cat
-                section_items = db.query(Category).filter(
-                    Category.user_id == current_user.id,
-                    Category.section.ilike(folder_to_delete)
-                ).all()
+                section_items = filter_categories_by_key(db.query(Category), current_user.id, section=folder_to_delete).all()
 
                 if section_items:
-                    has_exp = db.query(Expense).filter(
-                        Expense.user_id == current_user.id,
-                        Expense.section.ilike(folder_to_delete)
-                    ).first()
+                    has_exp = filter_expenses_by_key(db.query(Expense.id), current_user.id, section=folder_to_delete).first()
 
                     if has_exp:
                         aggregated_responses.append(f"No puedo eliminar la carpeta '{folder_to_delete}' porque tiene gastos registrados dentro.")
@@ -375,17 +433,10 @@ async def chat_with_agent(
             else:
                 found_cat = None
                 if sec and cat:
-                     found_cat = db.query(Category).filter(
-                         Category.user_id == current_user.id, 
-                         Category.section.ilike(sec), 
-                         Category.name.ilike(cat)
-                     ).first()
+                     found_cat = find_category(db, current_user.id, sec, cat)
 
                 if not found_cat and cat:
-                    found_cat = db.query(Category).filter(
-                        Category.user_id == current_user.id, 
-                        Category.name.ilike(cat)
-                    ).first()
+                    found_cat = find_category(db, current_user.id, None, cat)
 
                 if found_cat:
                     expenses_count = db.query(Expense).filter(
@@ -469,7 +520,9 @@ async def chat_with_agent(
                             final_section = new_section if new_section else sec
                             c_obj = db.query(Category).filter(Category.user_id==current_user.id, Category.section==final_section, Category.name==final_name).first()
                             current_budget = c_obj.budget if c_obj else 0
-                            if not new_section: background_tasks.add_task(update_category_in_sheet, sec, cat, current_budget, new_cat=new_name)
+                            if not new_section:
+                                sheets_outbox.queue_category_update(db, sec, cat, current_budget, new_cat=new_name)
+                                db.commit()
                             final_action_taken = True
                             msg_parts = []
                             if new_name: msg_parts.append(f"renombrada a '{new_name}'")
@@ -522,7 +575,8 @@ async def chat_with_agent(
                         if placeholder: db.delete(placeholder); db.commit()
                     except: pass
                     
-                    background_tasks.add_task(add_category_to_sheet, sec, cat, initial_budget)
+                    sheets_outbox.queue_category_add(db, sec, cat, initial_budget)
+                    db.commit()
                     
                     # FIX: Si se crea con un monto, registrar TAMBIÉN el gasto inicial asociado
                     if initial_budget > 0:
@@ -536,8 +590,10 @@ async def chat_with_agent(
                             date=date.today()
                         )
                         db.add(new_expense)
+                        rollup_service.add_expense(db, new_expense)
+                        db.flush()
+                        sheets_outbox.queue_expense_append(db, new_expense, current_user.tecnico_nombre, section=sec)
                         db.commit()
-                        background_tasks.add_task(sync_expense_to_sheet, {"date": str(new_expense.date), "concept": new_expense.concept, "category": new_expense.category, "amount": new_expense.amount, "payment_method": new_expense.payment_method}, current_user.tecnico_nombre, section=sec)
                     
                     final_action_taken = True
                     
@@ -617,8 +673,7 @@ async def chat_with_agent(
                     # FIX: Usar el monto del gasto como presupuesto inicial para que no quede en 0
                     initial_amount = int(data.get("amount", 0))
                     add_category_to_db(db, current_user.id, target_section, data.get("category", "General"), initial_amount)
-                    try: background_tasks.add_task(add_category_to_sheet, target_section, data.get("category", "General"), initial_amount)
-                    except: pass
+                    sheets_outbox.queue_category_add(db, target_section, data.get("category", "General"), initial_amount)
                 else:
                     target_section = exists.section
 
@@ -632,10 +687,12 @@ async def chat_with_agent(
                     date=date.today()
                 )
                 db.add(new_expense)
+                rollup_service.add_expense(db, new_expense)
+                db.flush()
+                sheets_outbox.queue_expense_append(db, new_expense, current_user.tecnico_nombre, section=target_section if 'target_section' in locals() else data.get("section", "OTROS"))
                 db.commit()
                 
                 expense_dict = {"date": str(new_expense.date), "concept": new_expense.concept, "category": new_expense.category, "amount": new_expense.amount, "payment_method": new_expense.payment_method}
-                background_tasks.add_task(sync_expense_to_sheet, expense_dict, current_user.tecnico_nombre, section=target_section if 'target_section' in locals() else data.get("section", "OTROS"))
                 final_action_taken = True
                 last_expense_data = expense_dict
                 aggregated_responses.append(response_text or "Gasto registrado.")
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel, ConfigDict
 from datetime import date, datetime
+from app.core import fast_json
+from app.core.config import settings
 from app.database import get_db
 from app.models.models import User
 from app.models.finance import Commitment
-from app.deps import get_current_user
-from app.services.sheets_service import sync_commitment_to_sheet, delete_commitment_from_sheet
+from app.deps import get_current_user, Principal
+from app.services import sheets_outbox
 
 router = APIRouter(tags=["commitments"])
 
@@ -36,25 +38,34 @@ class CommitmentOut(CommitmentBase):
     paid_amount: int
     created_at: datetime
 
+COMMITMENT_FIELDS = fast_json.fields_of(CommitmentOut)
+
 # --- Endpoints ---
 
 @router.get("/", response_model=List[CommitmentOut])
 def get_commitments(
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Get all commitments for the authenticated user.
     """
     user = current_user
-    
-    return db.query(Commitment).filter(Commitment.user_id == user.id).order_by(Commitment.status.desc(), Commitment.id.desc()).all()
+
+    # Camino rápido: solo las columnas de CommitmentOut, serializadas de una vez (core/fast_json.py)
+    fast = settings.FAST_JSON_LISTS
+    entities = fast_json.columns(Commitment, COMMITMENT_FIELDS) if fast else [Commitment]
+    rows = db.query(*entities).filter(Commitment.user_id == user.id).order_by(Commitment.status.desc(), Commitment.id.desc()).all()
+    if fast:
+        return fast_json.rows_response(rows, COMMITMENT_FIELDS, request)
+    return rows
 
 @router.post("/", response_model=CommitmentOut)
 def create_commitment(
     commitment: CommitmentCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Create a new commitment linked to the current user.
@@ -71,16 +82,13 @@ def create_commitment(
     )
     
     db.add(new_commitment)
+    db.flush()
+
+    # Sync to Sheets (queued in the same transaction, sent by the outbox worker)
+    sheets_outbox.queue_commitment_upsert(db, new_commitment, user.tecnico_nombre)
     db.commit()
     db.refresh(new_commitment)
 
-    # Sync to Sheets
-    # Need to run in background or direct? Direct for MVP.
-    try:
-        sync_commitment_to_sheet(new_commitment, user.tecnico_nombre)
-    except Exception as e:
-        print(f"WARNING: Sync commitment failed: {e}")
-
     return new_commitment
 
 @router.patch("/{commitment_id}", response_model=CommitmentOut)
@@ -104,9 +112,6 @@ def update_commitment(
         comm.title = update_data.title
     if update_data.due_date is not None:
         comm.due_date = update_data.due_date
-        
-    db.commit()
-    db.refresh(comm)
 
     # Sync Update
     # Find user name?
@@ -114,10 +119,9 @@ def update_commitment(
     user = db.query(User).filter(User.id == comm.user_id).first()
     if user: user_name = user.tecnico_nombre
 
-    try:
-        sync_commitment_to_sheet(comm, user_name)
-    except Exception as e:
-        print(f"WARNING: Sync commitment update failed: {e}")
+    sheets_outbox.queue_commitment_upsert(db, comm, user_name)
+    db.commit()
+    db.refresh(comm)
 
     return comm
 
@@ -134,12 +138,8 @@ def delete_commitment(
         raise HTTPException(status_code=404, detail="Commitment not found")
         
     db.delete(comm)
+    # Sync Delete (queued)
+    sheets_outbox.queue_commitment_delete(db, commitment_id)
     db.commit()
 
-    # Sync Delete
-    try:
-        delete_commitment_from_sheet(commitment_id)
-    except Exception as e:
-        print(f"WARNING: Sync commitment delete failed: {e}")
-
     return {"message": "Commitment deleted"}
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel, ConfigDict
 from datetime import date
+import hashlib
+from app.core import fast_json
+from app.core.config import settings
 from app.database import get_db
-from app.models.models import User, Role
 from app.models.finance import Expense
-from app.deps import get_current_user
-from app.services.sheets_service import sync_expense_to_sheet, get_dashboard_data
+from app.deps import get_current_user, Principal
+from app.services import rollup_service, sync_service, sheets_outbox, import_service, receipt_store
 
 router = APIRouter(tags=["finance"])
 
@@ -24,11 +26,12 @@ class ExpenseOut(BaseModel):
     payment_method: Optional[str] = None
     image_url: Optional[str] = None
 
+EXPENSE_FIELDS = fast_json.fields_of(ExpenseOut)
+
 # --- Endpoints ---
 
 @router.post("/", response_model=ExpenseOut)
 def create_expense(
-    background_tasks: BackgroundTasks,
     amount: int = Form(...),
     concept: str = Form(None),
     category: str = Form(...),
@@ -36,32 +39,22 @@ def create_expense(
     section: str = Form(None),
     image: UploadFile = File(None),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Create a new expense linked to the authenticated user.
     """
+    image_url = None
+    if image:
+        # Se guarda por bloques con su hash como clave (una boleta repetida no se duplica)
+        try:
+            image_url = receipt_store.store_upload(image.file).url
+        except receipt_store.ReceiptTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
     try:
         user = current_user
 
-        image_url = None
-        if image:
-            import os
-            import shutil
-            from datetime import datetime
-            
-            upload_dir = "uploads/receipts"
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{user.tecnico_nombre}_{timestamp}_{image.filename}"
-            file_path = f"{upload_dir}/{filename}"
-            
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(image.file, buffer)
-            
-            image_url = f"/uploads/receipts/{filename}"
-
         new_expense = Expense(
             user_id=user.id,
             amount=amount,
@@ -73,25 +66,13 @@ def create_expense(
             image_url=image_url
         )
         db.add(new_expense)
+        rollup_service.add_expense(db, new_expense)
+        db.flush()
+        # Sync a Sheets vía cola (misma transacción, lo envía el worker)
+        sheets_outbox.queue_expense_append(db, new_expense, user.tecnico_nombre, section=section)
         db.commit()
         db.refresh(new_expense)
         
-        # Preparar data para sync opcional a Sheets (background)
-        expense_data = {
-            "date": str(new_expense.date),
-            "concept": new_expense.concept,
-            "category": new_expense.category,
-            "amount": new_expense.amount,
-            "payment_method": new_expense.payment_method,
-            "image_url": new_expense.image_url
-        }
-        
-        # Sync opcional a Sheets (no bloqueante, se ignora si falla)
-        try:
-            background_tasks.add_task(sync_expense_to_sheet, expense_data, user.tecnico_nombre, section=section)
-        except Exception as e:
-            print(f"WARNING: Optional Sheets sync failed (ignoring): {e}")
-        
         return new_expense
         
     except Exception as e:
@@ -103,13 +84,11 @@ def create_expense(
 def delete_expense(
     expense_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Delete an expense.
     """
-    from app.services.sheets_service import delete_expense_from_sheet
-    
     expense = db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == current_user.id).first()
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found or not owned by you")
@@ -120,17 +99,12 @@ def delete_expense(
         "concept": expense.concept,
         "amount": expense.amount
     }
-    
-    # BEST EFFORT: Delete from Sheets
-    # We try to delete from Sheets, but if it fails (e.g. no match found, row locked),
-    # we MUST still delete from the local DB so the user sees it gone.
-    try:
-        delete_expense_from_sheet(expense_data, current_user.tecnico_nombre)
-    except Exception as e:
-        print(f"WARNING [DELETE] Failed to delete from Sheets (ignoring): {e}")
 
-    # TRANSACTION: Delete from Local DB
+    # TRANSACTION: Delete from Local DB (Sheets deletion is queued in the same commit;
+    # if no matching row is found there, the worker just skips it)
     try:
+        rollup_service.remove_expense(db, expense)
+        sheets_outbox.queue_expense_delete(db, expense.id, expense_data, current_user.tecnico_nombre)
         db.delete(expense)
         db.commit()
         return {"message": "Expense deleted successfully"}
@@ -139,94 +113,110 @@ def delete_expense(
         print(f"Error deleting expense from DB: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _expenses_etag(version: int, request: Request) -> str:
+    """ETag débil: versión de sync del usuario + parámetros de la consulta."""
+    params = hashlib.sha1(str(request.url.query).encode()).hexdigest()[:12]
+    return f'W/"v{version}-{params}"'
+
 @router.get("/", response_model=List[ExpenseOut])
 def get_my_expenses(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Tamaño de página (sin limit: todo el historial)"),
+    cursor: Optional[int] = Query(None, description="ID del último gasto recibido (X-Next-Cursor de la página anterior)"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    section: Optional[str] = None,
+    category: Optional[str] = None,
+    payment_method: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
-    Get all expenses. If DB is empty, attempts to restore from Sheets.
+    Get expenses, newest first. If DB is empty, attempts to restore from Sheets.
+    Keyset pagination: pass `limit`, then send back `X-Next-Cursor` as `cursor`.
+    Returns 304 when `If-None-Match` matches the page's ETag.
     """
-    expenses = db.query(Expense).filter(Expense.user_id == current_user.id).order_by(Expense.id.desc()).all()
+    from app.services.db_service import filter_expenses_by_key
     
-    if not expenses:
-        print("DEBUG [DB] Database empty. Fetching from Sheets...")
-        try:
-            from app.services.sheets_service import get_all_expenses_from_sheet
-            sheet_expenses = get_all_expenses_from_sheet()
-            
-            if sheet_expenses:
-                for exp_data in sheet_expenses:
-                    new_expense = Expense(
-                        user_id=current_user.id,
-                        date=exp_data["date"],
-                        concept=exp_data["concept"],
-                        category=exp_data["category"],
-                        amount=exp_data["amount"],
-                        payment_method=exp_data["payment_method"],
-                        image_url=exp_data["image_url"],
-                        section="OTROS"
-                    )
-                    db.add(new_expense)
-                
-                db.commit()
-                # Query again strictly for this user
-                expenses = db.query(Expense).filter(Expense.user_id == current_user.id).order_by(Expense.id.desc()).all()
-                print(f"DEBUG [DB] Restored {len(expenses)} expenses from Sheets.")
-        except Exception as e:
-            print(f"ERROR [DB] Emergency sync failed: {e}")
-            
+    # Cualquier escritura sube la versión: si el cliente ya tiene esta versión no hace falta consultar
+    version = sync_service.get_version(db, current_user.id)
+    etag = _expenses_etag(version, request)
+    if version and request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    
+    # Camino rápido: solo las columnas de ExpenseOut, serializadas de una vez (core/fast_json.py)
+    fast = settings.FAST_JSON_LISTS
+    entities = fast_json.columns(Expense, EXPENSE_FIELDS) if fast else [Expense]
+    query = filter_expenses_by_key(db.query(*entities), current_user.id, section, category)
+    if cursor is not None:
+        query = query.filter(Expense.id < cursor)
+    if date_from:
+        query = query.filter(Expense.date >= date_from)
+    if date_to:
+        query = query.filter(Expense.date <= date_to)
+    if payment_method:
+        query = query.filter(Expense.payment_method == payment_method)
+    query = query.order_by(Expense.id.desc())
+    
+    def fetch_page():
+        if not limit:
+            return query.all()
+        # Pedimos una fila extra para saber si hay otra página
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = str(rows[-1].id)
+        return rows
+    
+    expenses = fetch_page()
+    
+    is_unfiltered = not any([cursor, date_from, date_to, section, category, payment_method])
+    if not expenses and is_unfiltered:
+        # BD vacía: se restaura desde Sheets en segundo plano; el cliente sigue el job
+        job = import_service.start_restore_if_needed(db, current_user.id)
+        if job:
+            response.headers["X-Import-Job"] = str(job.id)
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+    if fast:
+        return fast_json.rows_response(expenses, EXPENSE_FIELDS, request, headers=dict(response.headers))
     return expenses
 
-@router.post("/sync-force")
+@router.post("/sync-force", status_code=202)
 def force_sync_from_sheets(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Force full resync from Google Sheets.
     WARNING: This deletes local expenses and re-fetches everything from 'Gastos' sheet.
+    Runs as a background job; poll GET /import-jobs/{job_id} for progress.
     """
-    try:
-        # 1. Delete all local expenses (Nuclear Option)
-        db.query(Expense).delete()
-        db.commit()
-        print("DEBUG [SYNC] Local expenses cleared.")
-        
-        # 2. Fetch all from Sheets
-        from app.services.sheets_service import get_all_expenses_from_sheet
-        sheet_expenses = get_all_expenses_from_sheet()
-        
-        count = 0
-        if sheet_expenses:
-            for exp_data in sheet_expenses:
-                new_expense = Expense(
-                    user_id=current_user.id,
-                    date=exp_data["date"],
-                    concept=exp_data["concept"],
-                    category=exp_data["category"],
-                    section=exp_data.get("section", "OTROS"), # Now catching section
-                    amount=exp_data["amount"],
-                    payment_method=exp_data["payment_method"],
-                    image_url=exp_data["image_url"]
-                )
-                db.add(new_expense)
-                count += 1
-            
-            db.commit()
-            print(f"DEBUG [SYNC] Restored {count} expenses from Sheets.")
-            
-        return {"message": f"Sincronización forzada completada. {count} gastos recuperados.", "count": count}
-        
-    except Exception as e:
-        print(f"ERROR [SYNC] Force sync failed: {e}")
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
+    job = import_service.start_import(db, current_user.id, "sync_force")
+    return {"message": "Sincronización forzada en curso.", **import_service.job_status(job)}
+
+@router.get("/import-jobs/{job_id}")
+def get_import_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Progress of a Sheets import job (sync-force or empty-DB restore).
+    """
+    from app.models.sync import ImportJob
+    job = db.query(ImportJob).filter(ImportJob.id == job_id, ImportJob.user_id == current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return import_service.job_status(job)
 
 @router.get("/dashboard")
 def get_finance_dashboard(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Get dashboard summary data for the authenticated user from DATABASE.
@@ -288,13 +278,12 @@ class CategoryDelete(BaseModel):
 def create_category_endpoint(
     payload: CategoryCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Add a new subcategory to a section in DATABASE and Sync to SHEETS.
     """
     from app.services.db_service import add_category_to_db
-    from app.services.sheets_service import add_category_to_sheet
     
     # 1. DB (Primary)
     success = add_category_to_db(db, current_user.id, payload.section, payload.category, payload.budget)
@@ -303,11 +292,9 @@ def create_category_endpoint(
         # For now, return error.
         raise HTTPException(status_code=400, detail="Category already exists")
 
-    # 2. Sheets (Sync)
-    try:
-        add_category_to_sheet(payload.section, payload.category, payload.budget)
-    except Exception as e:
-        print(f"WARNING: Sheets sync for new category failed: {e}")
+    # 2. Sheets (Queued)
+    sheets_outbox.queue_category_add(db, payload.section, payload.category, payload.budget)
+    db.commit()
 
     return {"message": "Category added successfully"}
 
@@ -315,24 +302,21 @@ def create_category_endpoint(
 def delete_category_endpoint(
     payload: CategoryDelete,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Delete a subcategory from DATABASE and SHEETS, but only if it has no expenses.
     """
     from app.services.db_service import delete_category_from_db
-    from app.services.sheets_service import delete_category_from_sheet
     
     # 1. DB
     success = delete_category_from_db(db, current_user.id, payload.section, payload.category)
     if not success:
         raise HTTPException(status_code=400, detail="No se puede borrar: tiene gastos asociados o no existe")
 
-    # 2. Sheets
-    try:
-        delete_category_from_sheet(payload.section, payload.category)
-    except Exception as e:
-        print(f"WARNING: Sheets sync for delete category failed: {e}")
+    # 2. Sheets (Queued)
+    sheets_outbox.queue_category_delete(db, payload.section, payload.category)
+    db.commit()
 
     return {"message": "Category deleted successfully"}
 
@@ -346,13 +330,12 @@ class CategoryUpdate(BaseModel):
 def update_category_endpoint(
     payload: CategoryUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Update a subcategory's budget in DATABASE and SHEETS, and optionally rename it.
     """
     from app.services.db_service import update_category_in_db
-    from app.services.sheets_service import update_category_in_sheet
     
     # 1. DB
     success = update_category_in_db(
@@ -366,16 +349,15 @@ def update_category_endpoint(
     if not success:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    # 2. Sheets
-    try:
-        update_category_in_sheet(
-            payload.section, 
-            payload.category, 
-            payload.new_budget, 
-            new_cat=payload.new_category
-        )
-    except Exception as e:
-        print(f"WARNING: Sheets sync for update category failed: {e}")
+    # 2. Sheets (Queued)
+    sheets_outbox.queue_category_update(
+        db,
+        payload.section, 
+        payload.category, 
+        payload.new_budget, 
+        new_cat=payload.new_category
+    )
+    db.commit()
 
     return {"message": "Category updated successfully", "new_category": payload.new_category or payload.category}
 
@@ -386,7 +368,7 @@ class UpdateBudgetSchema(BaseModel):
 def update_global_budget_endpoint(
     payload: UpdateBudgetSchema,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Update the global monthly budget in DATABASE.
@@ -402,7 +384,7 @@ def update_global_budget_endpoint(
 @router.post("/sync-gmail")
 def sync_gmail_endpoint(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Trigger manual synchronization with Gmail to find new bank expenses.
@@ -419,7 +401,7 @@ def sync_gmail_endpoint(
 @router.post("/reset-data")
 def reset_all_data(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     NUCLEAR OPTION: Resets all financial data to 0.
@@ -427,26 +409,24 @@ def reset_all_data(
     2. Clears 'Gastos' sheet in Google Sheets.
     3. Resets monthly budget to 0 (Local & Sheet).
     """
-    from app.services.sheets_service import clear_expenses_sheet, update_monthly_budget as update_sheet_budget
     from app.services.db_service import update_monthly_budget
     from app.models.finance import Expense
     
     try:
         # 1. Delete Local Expenses
         num_deleted = db.query(Expense).delete()
+        rollup_service.rebuild_rollups(db)
+        sync_service.mark_reset(db)
         
         # 2. Reset Local Budget
         update_monthly_budget(db, current_user.id, 0)
+
+        # 3. Clear Sheets (queued, applied by the worker)
+        sheets_outbox.queue_expenses_clear(db)
+        sheets_outbox.queue_budget_update(db, 0)
         
         db.commit()
         print(f"DEBUG [RESET] Deleted {num_deleted} local expenses and reset budget.")
-        
-        # 3. Clear Sheets (Best Effort)
-        try:
-            clear_expenses_sheet()
-            update_sheet_budget(0)
-        except Exception as e:
-            print(f"WARNING [RESET] Failed to clear sheets completely: {e}")
             
         return {"message": "All data has been reset to 0.", "deleted_count": num_deleted}
         
@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+from app.database import get_db
+from app.deps import get_current_user, Principal
+from app.models.finance import Expense
+from app.services import receipt_store
+
+router = APIRouter(tags=["receipts"])
+
+# El contenido de una clave nunca cambia (es su hash). "private": son documentos
+# financieros, ningún proxy/CDN compartido debe guardarlos; solo el navegador del dueño.
+IMMUTABLE = "private, max-age=31536000, immutable"
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """'bytes=0-99' / 'bytes=100-' / 'bytes=-500' -> (inicio, fin). None = archivo completo."""
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None # Varios rangos: se responde el archivo completo (permitido por la RFC)
+    start_s, _, end_s = spec.strip().partition("-")
+    try:
+        if start_s == "":
+            length = int(end_s)
+            if length <= 0:
+                raise ValueError
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+    except ValueError:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _serve(key: str, request: Request, db: Session, current_user: Principal):
+    if not receipt_store.is_valid_key(key):
+        raise HTTPException(status_code=404, detail="Boleta no encontrada")
+    # Solo el dueño: algún gasto suyo apunta a esta boleta (con dedupe, una misma
+    # foto puede ser de varios usuarios). 404 y no 403: no confirma que el hash exista.
+    sha = key[:-len(receipt_store.THUMB_SUFFIX)] if key.endswith(receipt_store.THUMB_SUFFIX) else key
+    owned = db.query(Expense.id).filter(
+        Expense.user_id == current_user.id,
+        Expense.image_url == receipt_store.receipt_url(sha),
+    ).first()
+    if owned is None:
+        raise HTTPException(status_code=404, detail="Boleta no encontrada")
+    backend = receipt_store.get_backend()
+    info = backend.stat(key)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Boleta no encontrada")
+    size, content_type = info
+
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE, "Accept-Ranges": "bytes"}
+    if etag in (request.headers.get("if-none-match") or ""):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range == etag:
+        byte_range = _parse_range(request.headers.get("range"), size)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(backend.iter_range(key, 0, size - 1), media_type=content_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(backend.iter_range(key, start, end), status_code=206, media_type=content_type, headers=headers)
+
+
+@router.get("/{key}")
+def get_receipt(
+    key: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Imagen de una boleta por su hash. Requiere sesión y que la boleta sea de un gasto del usuario."""
+    return _serve(key, request, db, current_user)
+
+
+@router.get("/{key}/thumb")
+def get_receipt_thumbnail(
+    key: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    return _serve(key + receipt_store.THUMB_SUFFIX, request, db, current_user)
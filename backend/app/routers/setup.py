@@ -1,15 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.models import User
-from app.deps import get_current_user
+from app.deps import get_current_user, Principal
 
 router = APIRouter(tags=["setup"])
 
 @router.post("/initialize-user-data")
 def initialize_user_data(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Inicializa datos por defecto para el usuario actual:
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.deps import get_current_user, Principal
+from app.services import sync_service
+
+router = APIRouter(tags=["sync"])
+
+@router.get("/changes")
+def get_changes(
+    since: int = Query(0, ge=0, description="Última versión aplicada por el cliente (0 = snapshot completo)"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Cambios (upserts + tombstones) de gastos, categorías, presupuestos y compromisos
+    posteriores a `since`. Si `full` es true el cliente debe reemplazar su copia.
+    """
+    return sync_service.get_changes(db, current_user.id, since)
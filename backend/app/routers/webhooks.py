@@ -4,6 +4,7 @@ from app.database import get_db
 from app.models.finance import PendingExpense
 from app.models.models import User
 from app.services.notification_service import notify_user_new_expense
+from app.services import email_ingest
 from pydantic import BaseModel
 from datetime import date
 
@@ -31,6 +32,9 @@ def receive_gmail_notification(
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
+    # Llegó correo: el worker de ingesta actualiza EmailLog sin bloquear este request
+    email_ingest.request_sync(user.id)
+
     # 2. Verificar duplicados
     exists = db.query(PendingExpense).filter(PendingExpense.raw_email_id == payload.email_id).first()
     if exists:
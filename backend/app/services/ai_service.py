@@ -1,16 +1,17 @@
 
 import os
+import re
 import json
 from dotenv import load_dotenv
 load_dotenv()
 
-import google.generativeai as genai
-from openai import OpenAI
 from sqlalchemy.orm import Session
 from app.models.budget import Category
 from app.models.finance import Expense, Commitment, EmailLog
 from app.models.models import User
+from app.core.config import settings
 from datetime import datetime
+from app.services import llm_gateway, prompt_context, intent_parser, ocr_cache
 
 # Configuración de Miguel (Agente especialista en OCR y Cálculos)
 MIGUEL_PROMPT = """
@@ -67,23 +68,57 @@ Tu misión es EXCLUSIVAMENTE financiera. No te interesan correos que no sean de
 Instrucción de Lúcio: "{user_message}"
 """
 
-def analyze_with_nexo(user_message, email_context):
+# Prompt de Lúcio (Orquestador y Cara del app). Es fijo: el contexto va en mensajes aparte
+LUCIO_PROMPT = """
+Eres "Lúcio", el asistente financiero y cara visible de Cerebro. 
+Tu estilo es ejecutivo pero amigable. 
+
+### TU EQUIPO:
+1. **Miguel (Ingeniero de campo):** Lee boletas (OCR) y hace divisiones matemáticas simples.
+2. **Faro (Científico de datos):** Analiza tendencias, predice gastos y busca ahorros.
+3. **Nexo (Gestor de Memoria):** Administra el historial de correos y notificaciones externas.
+
+### TU ROL:
+- Eres el único que habla con el cliente.
+- Coordinas a tu equipo bajo cuerda. 
+- Si Faro te pasó un análisis, úsalo para responder la pregunta técnica.
+- Si Miguel te pasó acciones, confírmalas.
+- Si Nexo encontró información en los correos (transferencias enviadas, recibidas, compras), NO asumas que el usuario solo busca ingresos. Informa TODO movimiento relevante con detalle de monto y destinatario/comercio.
+- **PROACTIVIDAD CONDICIONAL:** 
+  1. Si ves movimientos marcados como `(NUEVO - HOY - PENDIENTE)`, debes mencionarlos y preguntar dónde registrarlos.
+  2. Si NO hay movimientos de HOY pendientes, compórtate como Lúcio normal: responde la duda del usuario usando a tus 3 expertos (Miguel, Faro, Nexo) según sea necesario, pero sin forzar el registro de correos antiguos.
+
+### INSTRUCCIONES DE RESPUESTA:
+- **FORMATO:** Devuelve ÚNICAMENTE un objeto JSON.
+- **TONO:** Lúcio es brillante, atento y proactivo. 
+- **IMPARCIALIDAD:** Si el usuario pregunta "¿llegó una transferencia?", revisa tanto las recibidas como las que él mismo realizó (comprobantes de envío).
+- **INTEGRACIÓN:** Si Faro dio un consejo de ahorro, preséntalo como algo que "tú y tu equipo de análisis" prepararon.
+
+### JSON SCHEMA OBLIGATORIO:
+{
+  "intent": "MULTI_ACTION | TALK",
+  "response_text": "Tu mensaje para el usuario",
+  "actions": [ ... acciones de Miguel o cualquier CREATE/COMMITMENT que Lúcio deba hacer ...]
+}
+
+El contexto de datos (gastos, categorías, correos, compromisos) y el del turno (fecha,
+historial, acciones de Miguel) llegan en los mensajes siguientes; el último es el mensaje del usuario.
+"""
+
+async def analyze_with_nexo(user_message, email_context):
     """
     Nexo analiza el historial de correos.
     """
     gemini_key = os.getenv("GEMINI_API_KEY")
     if not gemini_key: return "Nexo no puede acceder a su base de datos de correos."
     
-    genai.configure(api_key=gemini_key)
-    model = genai.GenerativeModel('gemini-flash-latest')
     prompt = NEXO_PROMPT.format(
         user_message=user_message,
         email_context=email_context
     )
     
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return await llm_gateway.gemini_generate(prompt)
     except Exception as e:
         print(f"ERROR NEXO: {e}")
         return "Nexo tuvo un problema revisando los correos."
@@ -95,9 +130,6 @@ def analyze_single_email(subject, sender, snippet):
     gemini_key = os.getenv("GEMINI_API_KEY")
     if not gemini_key: return {"category": "INFO", "summary": snippet[:100]}
     
-    genai.configure(api_key=gemini_key)
-    model = genai.GenerativeModel('gemini-flash-latest')
-    
     prompt = f"""
     Eres un clasificador financiero experto para la app "Cerebro".
     Analiza este correo y devuelve un JSON.
@@ -119,8 +151,7 @@ def analyze_single_email(subject, sender, snippet):
     """
     
     try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
+        text = llm_gateway.gemini_generate_sync(prompt).strip()
         
         # Intentar extraer JSON si viene envuelto, o parsear simple
         if "{" in text and "}" in text:
@@ -143,15 +174,13 @@ def analyze_single_email(subject, sender, snippet):
         print(f"ERROR NEXO AI: {e}")
         return {"category": "INFO", "summary": "Correo de " + sender}
 
-def analyze_with_faro(user_message, expense_context, cat_context, comm_context):
+async def analyze_with_faro(user_message, expense_context, cat_context, comm_context):
     """
     Faro analiza los datos y devuelve insights.
     """
     gemini_key = os.getenv("GEMINI_API_KEY")
     if not gemini_key: return "Faro no tiene acceso a sus herramientas."
     
-    genai.configure(api_key=gemini_key)
-    model = genai.GenerativeModel('gemini-flash-latest')
     prompt = FARO_PROMPT.format(
         user_message=user_message,
         expense_context=expense_context,
@@ -160,63 +189,55 @@ def analyze_with_faro(user_message, expense_context, cat_context, comm_context):
     )
     
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return await llm_gateway.gemini_generate(prompt)
     except Exception as e:
         print(f"ERROR FARO: {e}")
         return "Faro tuvo un problema analizando los datos."
 
-def analyze_with_miguel(image_data: bytes, user_message: str, sections_list: str):
+async def analyze_with_miguel(image_data: bytes, user_message: str, sections_list: str):
     """
     Miguel analiza la boleta y devuelve la lista de acciones técnicas.
+    La misma boleta con la misma instrucción sale del cache (ocr_cache) sin llamar a Gemini.
     """
     gemini_key = os.getenv("GEMINI_API_KEY")
     if not gemini_key:
         return None
-    
-    genai.configure(api_key=gemini_key)
-    model = genai.GenerativeModel('gemini-flash-latest')
-    
+
+    key = ocr_cache.cache_key(image_data, user_message, sections_list)
+    return await ocr_cache.get_or_compute(
+        key, lambda: _run_miguel(image_data, user_message, sections_list)
+    )
+
+async def _run_miguel(image_data: bytes, user_message: str, sections_list: str):
     prompt = MIGUEL_PROMPT.format(user_message=user_message, sections_list=sections_list)
     
     mime = "image/png" if image_data.startswith(b'\x89PNG') else "image/jpeg"
     content = [prompt, {'mime_type': mime, 'data': image_data}]
     
+    raw = None
     try:
-        response = model.generate_content(
+        raw = await llm_gateway.gemini_generate(
             content,
-            generation_config={"response_mime_type": "application/json"}
+            generation_config={"response_mime_type": "application/json"},
+            timeout=settings.LLM_OCR_TIMEOUT_SECONDS
         )
-        data = json.loads(response.text)
+        data = json.loads(raw)
         return data if isinstance(data, list) else [data]
     except Exception as e:
-        print(f"ERROR MIGUEL: {e} | Raw: {response.text if 'response' in locals() else 'No response'}")
+        print(f"ERROR MIGUEL: {e} | Raw: {raw if raw is not None else 'No response'}")
         return None
 
-def process_finance_message(db: Session, user_id: int, message: str, extra_context: str = None, history: list = None, image_data: bytes = None):
+async def _prepare_lucio(db: Session, user_id: int, message: str, history: list = None, image_data: bytes = None):
     """
-    Lúcio es el director de orquesta. Si hay imagen, llama a Miguel.
+    Arma los mensajes de Lúcio (y llama a Miguel si hay imagen).
+    Orden pensado para el prompt caching del proveedor: instrucciones fijas, luego el
+    contexto de datos (cacheado por versión, igual entre turnos) y al final lo del turno.
+    Retorna {"messages", "miguel_actions"} o un dict de error.
     """
     gemini_key = os.getenv("GEMINI_API_KEY")
     
     # 1. Preparar Contexto común
-    categories = db.query(Category).filter(Category.user_id == user_id).all()
-    sections = set([c.section for c in categories])
-    sections_list = ", ".join(sections)
-    cat_context = "\n".join([f"- [{c.section}] -> {c.name} (Presupuesto: ${c.budget:,})" for c in categories])
-    
-    recent_expenses = db.query(Expense).filter(Expense.user_id == user_id).order_by(Expense.id.desc()).limit(15).all()
-    expense_context = "\n".join([f" - ID: {e.id} | {e.date} | ${e.amount} | {e.concept} | [{e.section}] {e.category}" for e in recent_expenses])
-    
-    commitments = db.query(Commitment).filter(Commitment.user_id == user_id).order_by(Commitment.id.desc()).limit(10).all()
-    comm_context = "\n".join([f" - ID: {c.id} | {'DEBO' if c.type == 'DEBT' else 'ME DEBEN'} | ${c.total_amount} | {c.title} | Estado: {c.status}" for c in commitments])
-
-    emails = db.query(EmailLog).filter(EmailLog.user_id == user_id).order_by(EmailLog.date.desc()).limit(15).all()
-    hoy_dt = datetime.now().date()
-    email_context = "\n".join([
-        f" - [{e.date}] {'(NUEVO - HOY - PENDIENTE)' if (not e.processed and e.date == hoy_dt) else ''} {e.sender}: {e.subject} ({e.summary})" 
-        for e in emails
-    ])
+    context = prompt_context.get_context(db, user_id)
 
     chat_history_txt = ""
     if history:
@@ -228,59 +249,15 @@ def process_finance_message(db: Session, user_id: int, message: str, extra_conte
     miguel_actions = None
     if image_data:
         print(f"[DEBUG] Llamando a Miguel para analizar boleta...")
-        miguel_actions = analyze_with_miguel(image_data, message, sections_list)
+        miguel_actions = await analyze_with_miguel(image_data, message, context.sections_list)
     
     # --- ELIMINADOS LOS LLAMADOS INDEPENDIENTES PARA AHORRAR CUOTA ---
     # Lúcio ahora procesará todo el contexto directamente.
-    faro_insights = None
-    nexo_insights = None
-
-    # Prompt de Lúcio (Orquestador y Cara del app)
-    prompt = f"""
-Eres "Lúcio", el asistente financiero y cara visible de Cerebro. 
-Tu estilo es ejecutivo pero amigable. 
-
-### TU EQUIPO:
-1. **Miguel (Ingeniero de campo):** Lee boletas (OCR) y hace divisiones matemáticas simples.
-2. **Faro (Científico de datos):** Analiza tendencias, predice gastos y busca ahorros.
-3. **Nexo (Gestor de Memoria):** Administra el historial de correos y notificaciones externas.
-
-### TU ROL:
-- Eres el único que habla con el cliente.
-- Coordinas a tu equipo bajo cuerda. 
-- Si Faro te pasó un análisis, úsalo para responder la pregunta técnica.
-- Si Miguel te pasó acciones, confírmalas.
-- Si Nexo encontró información en los correos (transferencias enviadas, recibidas, compras), NO asumas que el usuario solo busca ingresos. Informa TODO movimiento relevante con detalle de monto y destinatario/comercio.
-- **PROACTIVIDAD CONDICIONAL:** 
-  1. Si ves movimientos marcados como `(NUEVO - HOY - PENDIENTE)`, debes mencionarlos y preguntar dónde registrarlos.
-  2. Si NO hay movimientos de HOY pendientes, compórtate como Lúcio normal: responde la duda del usuario usando a tus 3 expertos (Miguel, Faro, Nexo) según sea necesario, pero sin forzar el registro de correos antiguos.
 
-### CONTEXTO DINÁMICO:
+    turn = f"""### CONTEXTO DEL TURNO:
 Fecha: {hoy}
-SECCIONES: [{sections_list}]
 HISTORIAL: {chat_history_txt}
-
-### INFORMACIÓN DE TU EQUIPO (CONTEXTO):
-- **DATOS DE GASTOS (Faro):** {expense_context if expense_context else "Sin gastos registrados."}
-- **DATOS DE CATEGORÍAS/PRESUPUESTO:** {cat_context}
-- **REGISTRO DE CORREOS BANCARIOS (Nexo):** {email_context if email_context else "Sin correos recientes."}
-- **COMPROMISOS/DEUDAS:** {comm_context if comm_context else "Sin compromisos."}
 - **ACCIONES DE MIGUEL (Boleta):** {json.dumps(miguel_actions, indent=2) if miguel_actions else "Miguel no ha intervenido."}
-
-### INSTRUCCIONES DE RESPUESTA:
-- **FORMATO:** Devuelve ÚNICAMENTE un objeto JSON.
-- **TONO:** Lúcio es brillante, atento y proactivo. 
-- **IMPARCIALIDAD:** Si el usuario pregunta "¿llegó una transferencia?", revisa tanto las recibidas como las que él mismo realizó (comprobantes de envío).
-- **INTEGRACIÓN:** Si Faro dio un consejo de ahorro, preséntalo como algo que "tú y tu equipo de análisis" prepararon.
-
-### JSON SCHEMA OBLIGATORIO:
-{{
-  "intent": "MULTI_ACTION | TALK",
-  "response_text": "Tu mensaje para el usuario",
-  "actions": [ ... acciones de Miguel o cualquier CREATE/COMMITMENT que Lúcio deba hacer ...]
-}}
-
-MENSAJE DEL USUARIO: "{message}"
 """
     if not gemini_key:
         return {"status": "error", "message": "No hay API Key de Gemini configurada."}
@@ -289,43 +266,161 @@ MENSAJE DEL USUARIO: "{message}"
     openai_key = os.getenv("OPENAI_API_KEY")
     if not openai_key:
         return {"status": "error", "message": "No hay API Key de OpenAI configurada para Lúcio."}
-    
-    client = OpenAI(api_key=openai_key)
 
+    return {
+        "messages": [
+            {"role": "system", "content": LUCIO_PROMPT},
+            {"role": "system", "content": context.text},
+            {"role": "system", "content": turn},
+            {"role": "user", "content": message}
+        ],
+        "miguel_actions": miguel_actions,
+    }
+
+def _parse_lucio_response(text_response: str, miguel_actions, message: str):
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": message}
-            ],
-            response_format={ "type": "json_object" }
-        )
-        
-        text_response = response.choices[0].message.content.strip()
-        
-        try:
-            data = json.loads(text_response)
-            if miguel_actions and not data.get("actions"):
-                data["actions"] = miguel_actions
-                data["intent"] = "MULTI_ACTION"
-        except Exception as e:
-            import re
-            match = re.search(r'\{.*\}', text_response, re.DOTALL)
-            if match:
-                try:
-                    data = json.loads(match.group())
-                except:
-                    data = {"intent": "TALK", "response_text": text_response}
-            else:
+        data = json.loads(text_response)
+        if miguel_actions and not data.get("actions"):
+            data["actions"] = miguel_actions
+            data["intent"] = "MULTI_ACTION"
+    except Exception as e:
+        match = re.search(r'\{.*\}', text_response, re.DOTALL)
+        if match:
+            try:
+                data = json.loads(match.group())
+            except:
                 data = {"intent": "TALK", "response_text": text_response}
-        
-        return {"status": "success", "data": _normalize_ai_data(data, message)}
+        else:
+            data = {"intent": "TALK", "response_text": text_response}
+    return _normalize_ai_data(data, message)
+
+def _fast_path(db: Session, user_id: int, message: str, extra_context: str, image_data: bytes):
+    """Mensajes simples ("gasté 5000 en uber") se resuelven sin llamar al modelo."""
+    if image_data or extra_context or not settings.FAST_INTENT_ENABLED:
+        return None
+    try:
+        return intent_parser.try_fast_path(db, user_id, message)
+    except Exception as e:
+        print(f"ERROR FAST INTENT: {e}")
+        return None
+
+async def process_finance_message(db: Session, user_id: int, message: str, extra_context: str = None, history: list = None, image_data: bytes = None):
+    """
+    Lúcio es el director de orquesta. Si hay imagen, llama a Miguel.
+    """
+    fast = _fast_path(db, user_id, message, extra_context, image_data)
+    if fast:
+        return {"status": "success", "data": fast}
 
+    request = await _prepare_lucio(db, user_id, message, history, image_data)
+    if "status" in request:
+        return request
+
+    try:
+        text_response = await llm_gateway.openai_chat(request["messages"], json_mode=True)
+        return {"status": "success", "data": _parse_lucio_response(text_response, request["miguel_actions"], message)}
     except Exception as e:
         print(f"ERROR LÚCIO (OpenAI): {e}")
         return {"status": "error", "message": "Error técnico lúcio (OpenAI): " + str(e)}
 
+class JsonStringFieldStream:
+    """
+    Extrae, a medida que llega, el valor de un campo string de un JSON incompleto
+    (p. ej. "response_text" mientras el modelo todavía genera el objeto).
+    feed() retorna el texto nuevo ya decodificado (escapes incluidos).
+    """
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field: str):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buf = ""
+        self._pos = None # índice del primer carácter del valor
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self._buf += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            m = self._key.search(self._buf)
+            if not m:
+                return ""
+            self._pos = m.end()
+        out = []
+        i = self._pos
+        while i < len(self._buf):
+            ch = self._buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch == '\\':
+                if i + 1 >= len(self._buf):
+                    break # escape incompleto: esperar más texto
+                nxt = self._buf[i + 1]
+                if nxt == 'u':
+                    if i + 6 > len(self._buf):
+                        break
+                    code = self._hex(i + 2)
+                    if code is not None and 0xD800 <= code <= 0xDBFF:
+                        # Par sustituto (emoji): esperar la segunda mitad y combinarlas
+                        if i + 12 > len(self._buf):
+                            break
+                        low = self._hex(i + 8) if self._buf[i + 6:i + 8] == '\\u' else None
+                        if low is not None and 0xDC00 <= low <= 0xDFFF:
+                            out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                            i += 12
+                            continue
+                        code = 0xFFFD # mitad suelta: no se puede codificar en UTF-8
+                    elif code is not None and 0xDC00 <= code <= 0xDFFF:
+                        code = 0xFFFD
+                    if code is not None:
+                        out.append(chr(code))
+                    i += 6
+                    continue
+                out.append(self._ESCAPES.get(nxt, nxt))
+                i += 2
+                continue
+            out.append(ch)
+            i += 1
+        self._pos = i
+        return "".join(out)
+
+    def _hex(self, start: int):
+        try:
+            return int(self._buf[start:start + 4], 16)
+        except ValueError:
+            return None
+
+async def stream_finance_message(db: Session, user_id: int, message: str, extra_context: str = None, history: list = None, image_data: bytes = None):
+    """
+    Igual que process_finance_message, pero va entregando el response_text de Lúcio
+    mientras se genera: produce ("token", texto) y al final ("result", dict de resultado).
+    """
+    fast = _fast_path(db, user_id, message, extra_context, image_data)
+    if fast:
+        yield "result", {"status": "success", "data": fast}
+        return
+
+    request = await _prepare_lucio(db, user_id, message, history, image_data)
+    if "status" in request:
+        yield "result", request
+        return
+
+    field = JsonStringFieldStream("response_text")
+    parts = []
+    try:
+        async for delta in llm_gateway.openai_chat_stream(request["messages"], json_mode=True):
+            parts.append(delta)
+            text = field.feed(delta)
+            if text:
+                yield "token", text
+        data = _parse_lucio_response("".join(parts).strip(), request["miguel_actions"], message)
+        yield "result", {"status": "success", "data": data}
+    except Exception as e:
+        print(f"ERROR LÚCIO (OpenAI stream): {e}")
+        yield "result", {"status": "error", "message": "Error técnico lúcio (OpenAI): " + str(e)}
+
 def _normalize_ai_data(data, user_message=None):
     if isinstance(data, list):
         return [_normalize_ai_data(item, user_message) for item in data]
@@ -1,11 +1,15 @@
 """
 Servicio de base de datos para reemplazar Google Sheets
 """
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import datetime, date
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from app.models.finance import Expense
 from app.models.budget import Budget, Category, AppConfig
+from app.core.normalize import lookup_key
+from app.services import rollup_service, sync_service
+from app.services.rollup_service import get_month_spending
 
 
 def get_or_create_monthly_budget(db: Session, user_id: int, month: Optional[str] = None) -> int:
@@ -13,19 +17,19 @@ def get_or_create_monthly_budget(db: Session, user_id: int, month: Optional[str]
     if not month:
         month = datetime.now().strftime("%Y-%m")
     
-    budget = db.query(Budget).filter(
+    row = db.query(Budget.amount).filter(
         Budget.user_id == user_id,
         Budget.month == month
     ).first()
     
-    if not budget:
-        # Crear presupuesto inicial de $0
-        budget = Budget(user_id=user_id, month=month, amount=0)
-        db.add(budget)
-        db.commit()
-        db.refresh(budget)
+    if row:
+        return row[0]
     
-    return budget.amount
+    # Crear presupuesto inicial de $0
+    budget = Budget(user_id=user_id, month=month, amount=0)
+    db.add(budget)
+    db.commit()
+    return 0
 
 
 def update_monthly_budget(db: Session, user_id: int, new_amount: int, month: Optional[str] = None) -> bool:
@@ -50,63 +54,84 @@ def update_monthly_budget(db: Session, user_id: int, new_amount: int, month: Opt
 
 def get_categories_with_budget(db: Session, user_id: int) -> Dict[str, List[Dict]]:
     """Obtiene todas las categorías organizadas por sección con sus presupuestos"""
-    categories = db.query(Category).filter(Category.user_id == user_id).all()
+    # Solo columnas (tuplas), sin hidratar objetos Category
+    rows = db.query(Category.section, Category.name, Category.budget).filter(Category.user_id == user_id).all()
     
     result = {}
-    for cat in categories:
-        sec_name = cat.section.strip().upper()
+    for section, name, budget in rows:
+        sec_name = section.strip().upper()
         if sec_name not in result:
             result[sec_name] = []
         result[sec_name].append({
-            "name": cat.name.strip(),
-            "budget": cat.budget
+            "name": name.strip(),
+            "budget": budget
         })
     
     return result
 
 
-def get_dashboard_data_from_db(db: Session, user_id: int) -> Dict:
+def get_spending_by_category(db: Session, user_id: int, start_date: date, end_date: Optional[date] = None) -> List[Tuple[str, str, int, int]]:
+    """
+    Suma los gastos en SQL (GROUP BY section, category) para un rango de fechas [start_date, end_date).
+    Retorna tuplas (section, category, total, count) sin cargar objetos Expense.
+    """
+    query = db.query(
+        Expense.section,
+        Expense.category,
+        func.sum(Expense.amount),
+        func.count(Expense.id)
+    ).filter(
+        Expense.user_id == user_id,
+        Expense.date >= start_date
+    )
+    if end_date:
+        query = query.filter(Expense.date < end_date)
+    
+    return [
+        (section or "OTROS", category, int(total or 0), int(count or 0))
+        for section, category, total, count in query.group_by(Expense.section, Expense.category).all()
+    ]
+
+
+def _month_bounds(month: str) -> Tuple[date, date]:
+    year, mon = (int(x) for x in month.split("-"))
+    start = date(year, mon, 1)
+    end = date(year + 1, 1, 1) if mon == 12 else date(year, mon + 1, 1)
+    return start, end
+
+
+def get_dashboard_data_from_db(db: Session, user_id: int, use_rollups: bool = True) -> Dict:
     """
     Genera los datos del dashboard desde la base de datos
     DEBE coincidir con la estructura esperada por app.js:
     - categories: Dict[section_name, {budget, spent, categories: Dict[subcat, {budget, spent}]}]
     - available_balance: int
     - monthly_budget: int
+    use_rollups=False agrega en vivo con GROUP BY sobre `expenses` (sin pasar por expense_rollups).
     """
     current_month = datetime.now().strftime("%Y-%m")
     
     # 1. Presupuesto mensual
     monthly_budget = get_or_create_monthly_budget(db, user_id, current_month)
     
-    # 2. Gastos del mes actual
-    first_day = datetime.now().replace(day=1).date()
-    expenses = db.query(Expense).filter(
-        Expense.user_id == user_id,
-        Expense.date >= first_day
-    ).all()
+    # 2. Gastos del mes actual (pre-agregados en expense_rollups, o GROUP BY en SQL)
+    if use_rollups:
+        expenses_by_category = get_month_spending(db, user_id, current_month)
+    else:
+        expenses_by_category = {}
+        start, end = _month_bounds(current_month)
+        for section, category, total, _count in get_spending_by_category(db, user_id, start, end):
+            section_totals = expenses_by_category.setdefault(section, {})
+            section_totals[category] = section_totals.get(category, 0) + total
     
     # 3. Calcular total gastado
-    total_spent = sum(exp.amount for exp in expenses)
+    total_spent = sum(sum(cats.values()) for cats in expenses_by_category.values())
     available_balance = monthly_budget - total_spent
     
     # 4. Obtener categorías con presupuesto
     categories_dict = get_categories_with_budget(db, user_id)
     
-    # 5. Calcular gastos por categoría
-    expenses_by_category = {}
-    for exp in expenses:
-        section = exp.section or "OTROS"
-        category = exp.category
-        
-        if section not in expenses_by_category:
-            expenses_by_category[section] = {}
-        
-        if category not in expenses_by_category[section]:
-            expenses_by_category[section][category] = 0
-        
-        expenses_by_category[section][category] += exp.amount
-    
-    # 6. Construir estructura compatible con frontend (DICCIONARIO, no lista)
+    # 5. Construir estructura compatible con frontend (DICCIONARIO, no lista)
     categories_output = {}
     
     for section, cats in categories_dict.items():
@@ -147,6 +172,34 @@ def get_dashboard_data_from_db(db: Session, user_id: int) -> Dict:
     }
 
 
+def filter_categories_by_key(query, user_id: int, section: Optional[str] = None, name: Optional[str] = None):
+    """
+    Filtra categorías sin distinguir mayúsculas/acentos usando las claves indexadas
+    (equivalente a Category.section.ilike(section) / Category.name.ilike(name)).
+    """
+    query = query.filter(Category.user_id == user_id)
+    if section is not None:
+        query = query.filter(Category.section_key == lookup_key(section))
+    if name is not None:
+        query = query.filter(Category.name_key == lookup_key(name))
+    return query
+
+
+def filter_expenses_by_key(query, user_id: int, section: Optional[str] = None, category: Optional[str] = None):
+    """Igual que filter_categories_by_key, para gastos (section_key / category_key)."""
+    query = query.filter(Expense.user_id == user_id)
+    if section is not None:
+        query = query.filter(Expense.section_key == lookup_key(section))
+    if category is not None:
+        query = query.filter(Expense.category_key == lookup_key(category))
+    return query
+
+
+def find_category(db: Session, user_id: int, section: Optional[str], name: Optional[str]) -> Optional[Category]:
+    """Resuelve una categoría por sección y/o nombre (sin distinguir mayúsculas ni acentos)"""
+    return filter_categories_by_key(db.query(Category), user_id, section, name).first()
+
+
 def add_category_to_db(db: Session, user_id: int, section: str, category: str, budget: int = 0) -> bool:
     """Agrega una nueva categoría a la base de datos"""
     section = section.strip().upper()
@@ -200,10 +253,13 @@ def update_category_in_db(db: Session, user_id: int, section: str,
             c.section = new_name
             
         # Actualizar histórico de Gastos
-        db.query(Expense).filter(
+        affected = db.query(Expense).filter(
             Expense.user_id == user_id,
             Expense.section == section
-        ).update({"section": new_name})
+        )
+        sync_service.record_changes(db, user_id, "expense", [row[0] for row in affected.with_entities(Expense.id)])
+        affected.update({"section": new_name, "section_key": lookup_key(new_name)})
+        rollup_service.move_category(db, user_id, section, new_name)
         
         db.commit()
         return True
@@ -213,11 +269,7 @@ def update_category_in_db(db: Session, user_id: int, section: str,
         if not category: return False
         
         # Buscar objeto original
-        cat_obj = db.query(Category).filter(
-            Category.user_id == user_id,
-            Category.section.ilike(section),
-            Category.name.ilike(category)
-        ).first()
+        cat_obj = find_category(db, user_id, section, category)
         
         if not cat_obj: return False
         
@@ -229,11 +281,14 @@ def update_category_in_db(db: Session, user_id: int, section: str,
         if new_name:
             cat_obj.name = new_name
             # Actualizar gastos históricos
-            db.query(Expense).filter(
+            affected = db.query(Expense).filter(
                 Expense.user_id == user_id,
                 Expense.section == original_section,
                 Expense.category == original_name
-            ).update({"category": new_name})
+            )
+            sync_service.record_changes(db, user_id, "expense", [row[0] for row in affected.with_entities(Expense.id)])
+            affected.update({"category": new_name, "category_key": lookup_key(new_name)})
+            rollup_service.move_category(db, user_id, original_section, original_section, original_name, new_name)
             # Actualizamos original_name para las siguientes operaciones
             original_name = new_name
             
@@ -245,11 +300,14 @@ def update_category_in_db(db: Session, user_id: int, section: str,
         if new_section:
             cat_obj.section = new_section
             # Actualizar gastos históricos
-            db.query(Expense).filter(
+            affected = db.query(Expense).filter(
                 Expense.user_id == user_id,
                 Expense.section == original_section,
                 Expense.category == original_name
-            ).update({"section": new_section})
+            )
+            sync_service.record_changes(db, user_id, "expense", [row[0] for row in affected.with_entities(Expense.id)])
+            affected.update({"section": new_section, "section_key": lookup_key(new_section)})
+            rollup_service.move_category(db, user_id, original_section, new_section, original_name, original_name)
 
         db.commit()
         return True
@@ -258,20 +316,12 @@ def update_category_in_db(db: Session, user_id: int, section: str,
 def delete_category_from_db(db: Session, user_id: int, section: str, category: str) -> bool:
     """Elimina una categoría de la base de datos"""
     # Verificar que no tenga gastos asociados
-    has_expenses = db.query(Expense).filter(
-        Expense.user_id == user_id,
-        Expense.section.ilike(section),
-        Expense.category.ilike(category)
-    ).first()
+    has_expenses = filter_expenses_by_key(db.query(Expense.id), user_id, section, category).first()
     
     if has_expenses:
         return False
     
-    cat = db.query(Category).filter(
-        Category.user_id == user_id,
-        Category.section.ilike(section),
-        Category.name.ilike(category)
-    ).first()
+    cat = find_category(db, user_id, section, category)
     
     if cat:
         db.delete(cat)
@@ -0,0 +1,198 @@
+"""
+Ingesta de correos de Nexo en segundo plano.
+
+Antes el chat llamaba a sync_emails_with_nexo dentro del request cada vez que el
+mensaje mencionaba "correo", "compra", etc.: varios segundos de Gmail antes de que
+Lúcio empezara a responder. Ahora un worker mantiene EmailLog al día cada
+GMAIL_SYNC_INTERVAL_MINUTES, o antes si llega un /webhooks/gmail-push; el chat
+solo lee lo ya ingerido y, como mucho, pide un sync con request_sync().
+
+Un solo sync por usuario a la vez: antes de sincronizar se toma un lease en
+gmail_sync_state.locked_until con un UPDATE condicional (seguro con varias
+instancias, igual que claim_batch en sheets_outbox). Si el sync muere, el lease
+vence a los GMAIL_SYNC_LEASE_SECONDS. El vencimiento que escribió acquire() identifica
+al dueño: renew() y release() solo tocan la fila si sigue siendo ese, y el sync
+renueva antes de confirmar; si otro ya tomó el usuario, descarta su trabajo.
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.sync import GmailSyncState
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+_requested: Set[int] = set()
+_stats: Dict[str, int] = {"runs": 0, "new_emails": 0, "partial": 0, "busy": 0, "lease_lost": 0, "errors": 0, "requested": 0}
+
+
+def request_sync(user_id: int):
+    """Pide un sync para el usuario sin esperar (webhook, chat). Se junta con pedidos repetidos."""
+    with _lock:
+        _requested.add(user_id)
+        _stats["requested"] += 1
+    _wake.set()
+
+
+def acquire(db: Session, user_id: int) -> Optional[datetime]:
+    """Toma el lease del usuario: retorna su vencimiento (el token del dueño) o None si otro sync lo tiene."""
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=settings.GMAIL_SYNC_LEASE_SECONDS)
+    if db.get(GmailSyncState, user_id) is None:
+        db.add(GmailSyncState(user_id=user_id))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback() # otro proceso creó la fila primero
+    taken = db.execute(
+        update(GmailSyncState)
+        .where(GmailSyncState.user_id == user_id,
+               or_(GmailSyncState.locked_until.is_(None), GmailSyncState.locked_until < now))
+        .values(locked_until=expires)
+    ).rowcount == 1
+    db.commit()
+    return expires if taken else None
+
+
+def renew(db: Session, user_id: int, expires: datetime) -> Optional[datetime]:
+    """
+    Extiende un lease propio sin confirmar (va en la transacción del llamador). Retorna
+    el nuevo vencimiento, o None si ya venció y otro sync tomó el usuario.
+    """
+    now = datetime.utcnow()
+    new_expires = now + timedelta(seconds=settings.GMAIL_SYNC_LEASE_SECONDS)
+    renewed = db.execute(
+        update(GmailSyncState)
+        .where(GmailSyncState.user_id == user_id, GmailSyncState.locked_until == expires)
+        .values(locked_until=new_expires)
+    ).rowcount == 1
+    return new_expires if renewed else None
+
+
+def release(db: Session, user_id: int, expires: datetime):
+    """Libera el lease solo si sigue siendo el nuestro."""
+    db.execute(
+        update(GmailSyncState)
+        .where(GmailSyncState.user_id == user_id, GmailSyncState.locked_until == expires)
+        .values(locked_until=None)
+    )
+    db.commit()
+
+
+class LeaseLost(Exception):
+    """El lease venció y otro sync tomó el usuario: no se confirma nada."""
+
+
+class _Lease:
+    """Callable que sync_emails_with_nexo invoca antes de confirmar: renueva o lanza LeaseLost."""
+
+    def __init__(self, user_id: int, expires: datetime):
+        self.user_id = user_id
+        self.expires = expires
+
+    def __call__(self, db: Session):
+        renewed = renew(db, self.user_id, self.expires)
+        if renewed is None:
+            raise LeaseLost(f"Lease de Gmail del usuario {self.user_id} tomado por otro sync")
+        self.expires = renewed
+
+
+def sync_user(db: Session, user_id: int) -> Optional[dict]:
+    """Sincroniza un usuario con lease. None si ya había un sync en curso."""
+    from app.services.gmail_service import sync_emails_with_nexo
+    expires = acquire(db, user_id)
+    if expires is None:
+        with _lock:
+            _stats["busy"] += 1
+        return None
+    lease = _Lease(user_id, expires)
+    try:
+        result = sync_emails_with_nexo(db, user_id, limit=settings.GMAIL_SYNC_FULL_LIMIT, lease=lease)
+        with _lock:
+            _stats["runs"] += 1
+            _stats["new_emails"] += result.get("new_emails_processed", 0)
+            if result.get("status") == "partial":
+                _stats["partial"] += 1 # quedaron mensajes en pending_ids para el próximo sync
+        return result
+    except LeaseLost as e:
+        print(f"ERROR [EMAIL INGEST] {e}; sync descartado")
+        db.rollback()
+        with _lock:
+            _stats["lease_lost"] += 1
+        return None
+    except Exception as e:
+        print(f"ERROR [EMAIL INGEST] Sync de usuario {user_id} falló: {e}")
+        db.rollback()
+        with _lock:
+            _stats["errors"] += 1
+        return None
+    finally:
+        release(db, user_id, lease.expires)
+
+
+def due_users(db: Session) -> Set[int]:
+    """Usuarios ya sincronizados alguna vez cuyo último sync es más viejo que el intervalo."""
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.GMAIL_SYNC_INTERVAL_MINUTES)
+    return {r[0] for r in db.query(GmailSyncState.user_id).filter(
+        or_(GmailSyncState.last_sync_at.is_(None), GmailSyncState.last_sync_at < cutoff)
+    ).all()}
+
+
+def _run():
+    from app.database import SessionLocal
+    from app.services.gmail_service import gmail_configured
+    while not _stop.is_set():
+        _wake.wait(settings.GMAIL_SYNC_INTERVAL_MINUTES * 60)
+        if _stop.is_set():
+            break
+        _wake.clear()
+        with _lock:
+            requested = set(_requested)
+            _requested.clear()
+        if not gmail_configured():
+            continue
+
+        db = SessionLocal()
+        try:
+            for user_id in sorted(requested | due_users(db)):
+                if _stop.is_set():
+                    break
+                sync_user(db, user_id)
+        except Exception as e:
+            print(f"ERROR [EMAIL INGEST] Worker iteration failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+
+def start_worker():
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="email-ingest", daemon=True)
+    _thread.start()
+    _wake.set() # primera vuelta al arrancar: no esperar un intervalo completo
+    print("DEBUG [EMAIL INGEST] Worker started.")
+
+
+def stop_worker(timeout: float = 5.0):
+    _stop.set()
+    _wake.set()
+    if _thread:
+        _thread.join(timeout)
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        s = dict(_stats)
+        s["pending_requests"] = len(_requested)
+    s["worker_alive"] = bool(_thread and _thread.is_alive())
+    return s
@@ -1,6 +1,9 @@
 import os.path
 import base64
+import json
+import random
 import re
+import time
 from typing import List, Optional
 from datetime import date, datetime
 from sqlalchemy.orm import Session
@@ -9,7 +12,10 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from app.models.finance import Expense, EmailLog
-from app.services.sheets_service import sync_expense_to_sheet
+from app.models.sync import GmailSyncState
+from app.core.config import settings
+from app.core.normalize import lookup_key, parse_amount
+from app.services import rollup_service, sheets_outbox
 from app.services.ai_service import analyze_single_email
 
 # If modifying these scopes, delete the file token_gmail.json.
@@ -18,6 +24,13 @@ SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
 CREDENTIALS_FILE = 'gmail_credentials.json'
 TOKEN_FILE = 'gmail_token.json'
 
+# Asuntos de correos bancarios que Nexo guarda en EmailLog
+NEXO_SUBJECT_KEYWORDS = ["compra", "transferencia", "notificación", "comprobante", "pago"]
+
+def gmail_configured() -> bool:
+    """Hay token guardado: se puede sincronizar sin el flujo interactivo de OAuth."""
+    return os.path.exists(TOKEN_FILE)
+
 def get_gmail_service():
     """Shows basic usage of the Gmail API.
     Lists the user's Gmail labels.
@@ -46,14 +59,72 @@ def get_gmail_service():
     service = build('gmail', 'v1', credentials=creds)
     return service
 
-def parse_amount(text):
-    if not text: return 0
-    try:
-        # Quitar todo lo que no sea dígito
-        clean = re.sub(r'[^\d]', '', text)
-        return int(clean)
-    except:
-        return 0
+def _retry_wait(errors: list, attempt: int) -> float:
+    """Espera antes de reintentar: Retry-After si Gmail lo indicó, si no backoff exponencial."""
+    hinted = []
+    for e in errors:
+        try:
+            hinted.append(float(getattr(e, 'resp', {}).get('retry-after')))
+        except (TypeError, ValueError):
+            pass
+    if hinted:
+        return min(max(hinted), settings.GMAIL_RETRY_MAX_WAIT_SECONDS)
+    delay = settings.GMAIL_RETRY_BASE_SECONDS * (2 ** attempt)
+    return min(delay * random.uniform(0.8, 1.2), settings.GMAIL_RETRY_MAX_WAIT_SECONDS)
+
+def _is_retryable(exception) -> bool:
+    status = getattr(getattr(exception, 'resp', None), 'status', None)
+    return status is None or status in (408, 429) or status >= 500
+
+def fetch_messages(service, message_ids: List[str], format: str = 'full', metadata_headers: List[str] = None):
+    """
+    Descarga varios mensajes con requests batch de Gmail (hasta GMAIL_BATCH_SIZE por ida)
+    en vez de un messages().get por correo. Los que fallan con 429/5xx dentro del batch
+    se reintentan tras una espera (Retry-After o backoff), hasta GMAIL_FETCH_ATTEMPTS.
+    Retorna ({id: mensaje}, ids_que_siguen_fallando); los que ya no existen (404) no
+    están en ninguno de los dos.
+    """
+    found = {}
+    failed = []
+    pending = list(dict.fromkeys(message_ids))
+    for attempt in range(settings.GMAIL_FETCH_ATTEMPTS):
+        failed, errors = [], []
+        for start in range(0, len(pending), settings.GMAIL_BATCH_SIZE):
+            chunk = pending[start:start + settings.GMAIL_BATCH_SIZE]
+
+            def callback(request_id, response, exception):
+                if exception is None:
+                    found[request_id] = response
+                elif _is_retryable(exception):
+                    failed.append(request_id)
+                    errors.append(exception)
+                else:
+                    print(f"DEBUG [GMAIL] Message {request_id} skipped: {exception}")
+
+            batch = service.new_batch_http_request(callback=callback)
+            for msg_id in chunk:
+                params = {'userId': 'me', 'id': msg_id, 'format': format}
+                if metadata_headers:
+                    params['metadataHeaders'] = metadata_headers
+                batch.add(service.users().messages().get(**params), request_id=msg_id)
+            batch.execute()
+        if not failed or attempt == settings.GMAIL_FETCH_ATTEMPTS - 1:
+            break
+        wait = _retry_wait(errors, attempt)
+        print(f"DEBUG [GMAIL] {len(failed)} messages failed in batch, retrying in {wait:.1f}s...")
+        time.sleep(wait)
+        pending = failed
+    if failed:
+        print(f"ERROR [GMAIL] Could not fetch {len(failed)} messages: {failed[:5]}")
+    return found, failed
+
+def mark_as_read(service, message_ids: List[str]):
+    """Quita UNREAD a todos los mensajes en una sola llamada (batchModify, hasta 1000 ids)."""
+    ids = list(dict.fromkeys(message_ids))
+    for start in range(0, len(ids), 1000):
+        service.users().messages().batchModify(
+            userId='me', body={'ids': ids[start:start + 1000], 'removeLabelIds': ['UNREAD']}
+        ).execute()
 
 def get_email_body(payload):
     """
@@ -233,9 +304,12 @@ def process_recent_emails(db: Session, user_id: int, user_name: str, limit=10):
 
     processed_count = 0
     new_expenses = []
+    read_ids = []
 
+    details, _ = fetch_messages(service, [m['id'] for m in messages])
     for msg in messages:
-        msg_detail = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
+        msg_detail = details.get(msg['id'])
+        if msg_detail is None: continue
         
         headers = msg_detail['payload']['headers']
         subject = next((h['value'] for h in headers if h['name'] == 'Subject'), "Sin Asunto")
@@ -282,56 +356,139 @@ def process_recent_emails(db: Session, user_id: int, user_name: str, limit=10):
             # For now, let's assume 'category' handles it or we pass it to sheet sync separately
             
             db.add(new_expense)
-            db.commit()
-            db.refresh(new_expense)
-            
-            # Sync to Sheets
-            try:
-                # We need to pass section to sync if possible. 
-                # If sync_expense_to_sheet logic relies on expense object having .section attribute or not.
-                sync_expense_to_sheet(new_expense, user_name, section=section)
-            except Exception as e:
-                print(f"Sync error for gmail expense: {e}")
+            rollup_service.add_expense(db, new_expense)
+            db.flush()
+            # Sync to Sheets (queued, same transaction)
+            sheets_outbox.queue_expense_append(db, new_expense, user_name, section=section)
 
             processed_count += 1
             new_expenses.append(f"{concept} (${amount})")
-
-            # Mark as read (remove UNREAD label)
-            service.users().messages().modify(userId='me', id=msg['id'], body={'removeLabelIds': ['UNREAD']}).execute()
+            read_ids.append(msg['id'])
         
         else:
             # If we couldn't parse it, maybe mark as read anyway to avoid loop? 
             # Or leave it unread (better for debugging).
             pass
 
+    db.commit()
+    # Mark as read (remove UNREAD label) only after the expenses are saved
+    if read_ids:
+        mark_as_read(service, read_ids)
+
     return {
         "status": "success", 
         "processed": processed_count, 
         "details": new_expenses
     }
 
-def sync_emails_with_nexo(db: Session, user_id: int, limit=15):
+def _is_bank_subject(subject: str) -> bool:
+    key = lookup_key(subject or "")
+    return any(lookup_key(k) in key for k in NEXO_SUBJECT_KEYWORDS)
+
+def _history_added_ids(service, start_history_id: str):
+    """
+    IDs de mensajes agregados desde start_history_id (users.history.list) y el historyId
+    desde el cual seguir la próxima vez. Sobre GMAIL_HISTORY_MAX_MESSAGES se corta al
+    final de un registro de historial y se retorna el id de ese registro (no el historyId
+    actual del buzón): el resto se pide en la siguiente vuelta, no se pierde.
+    None si Gmail ya no tiene ese historial (404: hay que hacer un resync completo).
+    """
+    from googleapiclient.errors import HttpError
+    ids = []
+    page_token = None
+    latest = start_history_id
+    try:
+        while True:
+            params = {'userId': 'me', 'startHistoryId': start_history_id, 'historyTypes': ['messageAdded']}
+            if page_token: params['pageToken'] = page_token
+            resp = service.users().history().list(**params).execute()
+            for h in resp.get('history', []):
+                for added in h.get('messagesAdded', []):
+                    msg = added.get('message', {})
+                    if 'DRAFT' in msg.get('labelIds', []) or 'SENT' in msg.get('labelIds', []): continue
+                    ids.append(msg['id'])
+                latest = h.get('id', latest)
+                if len(ids) >= settings.GMAIL_HISTORY_MAX_MESSAGES:
+                    # Truncado: se retoma después del último registro procesado
+                    return list(dict.fromkeys(ids)), latest
+            page_token = resp.get('nextPageToken')
+            if not page_token:
+                latest = resp.get('historyId', latest)
+                break
+    except HttpError as e:
+        if getattr(e, 'resp', None) is not None and e.resp.status == 404:
+            return None
+        raise
+    return list(dict.fromkeys(ids)), latest
+
+def sync_emails_with_nexo(db: Session, user_id: int, limit=15, lease=None):
     """
     Nexo sincroniza los correos (leídos y no leídos), los entiende y los guarda.
+    Incremental: con el historyId guardado solo se piden los mensajes nuevos
+    (users.history.list). Sin estado, o si Gmail ya expiró ese historial, resync
+    completo con la búsqueda por asunto (los últimos `limit`).
+
+    El historyId avanza aunque algunos mensajes no se hayan podido descargar: esos
+    ids quedan en state.pending_ids y se piden de nuevo en el próximo sync (el
+    resultado viene con status "partial").
+
+    `lease` (email_ingest) se llama con la sesión después de las descargas y antes del
+    commit: renueva el lease del usuario o lanza si otro sync ya lo tomó.
     """
     service = get_gmail_service()
     if not service:
         return {"status": "error", "message": "Gmail no disponible"}
 
-    # Buscamos correos bancarios sin filtrar por unread para tener historial
-    query = '(subject:"compra" OR subject:"transferencia" OR subject:"notificación" OR subject:"comprobante" OR subject:"pago")'
-    results = service.users().messages().list(userId='me', q=query, maxResults=limit).execute()
-    messages = results.get('messages', [])
+    state = db.get(GmailSyncState, user_id)
+    if state is None:
+        state = GmailSyncState(user_id=user_id)
+        db.add(state)
+
+    candidate_ids = None
+    mode = "incremental"
+    if state.history_id:
+        added = _history_added_ids(service, state.history_id)
+        if added is not None:
+            candidate_ids, new_history_id = added
+
+    if candidate_ids is None:
+        mode = "full"
+        # historyId antes de listar: lo que llegue durante el resync se verá en la próxima vuelta
+        new_history_id = service.users().getProfile(userId='me').execute().get('historyId')
+        # Buscamos correos bancarios sin filtrar por unread para tener historial
+        query = "(" + " OR ".join(f'subject:"{k}"' for k in NEXO_SUBJECT_KEYWORDS) + ")"
+        results = service.users().messages().list(userId='me', q=query, maxResults=limit).execute()
+        candidate_ids = [m['id'] for m in results.get('messages', [])]
+
+    # Los que fallaron la vez anterior ya no aparecen en el historial: se reintentan aquí
+    pending = json.loads(state.pending_ids) if state.pending_ids else []
+    candidate_ids = list(dict.fromkeys(pending + candidate_ids))
 
     new_logs = 0
     hoy = date.today()
     
-    for msg in messages:
-        # Evitar duplicados
-        exists = db.query(EmailLog).filter(EmailLog.gmail_id == msg['id']).first()
-        if exists: continue
+    # Evitar duplicados (una sola consulta para todos los IDs)
+    existing = set()
+    if candidate_ids:
+        existing = {r[0] for r in db.query(EmailLog.gmail_id).filter(EmailLog.gmail_id.in_(candidate_ids)).all()}
+    new_ids = [i for i in candidate_ids if i not in existing]
+    failed = []
+    if mode == "incremental" and new_ids:
+        # El historial trae todos los correos nuevos: primero solo el asunto (format=metadata)
+        # y el cuerpo completo únicamente de los bancarios
+        headers_only, failed = fetch_messages(service, new_ids, format='metadata', metadata_headers=['Subject'])
+        new_ids = [
+            i for i in new_ids if i in headers_only and _is_bank_subject(next(
+                (h['value'] for h in headers_only[i].get('payload', {}).get('headers', []) if h['name'] == 'Subject'), ""))
+        ]
+    details, failed_full = fetch_messages(service, new_ids)
+    failed += failed_full
+    if lease:
+        lease(db) # las descargas pueden tardar: renovar antes de procesar
 
-        msg_detail = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
+    for msg_id in new_ids:
+        msg_detail = details.get(msg_id)
+        if msg_detail is None: continue
         
         # Detectar si está NO LEIDO en Gmail
         labels = msg_detail.get('labelIds', [])
@@ -375,7 +532,7 @@ def sync_emails_with_nexo(db: Session, user_id: int, limit=15):
         # Guardamos en el historial
         log = EmailLog(
             user_id=user_id,
-            gmail_id=msg['id'],
+            gmail_id=msg_id,
             subject=subject,
             sender=sender,
             date=obj_date,
@@ -387,5 +544,16 @@ def sync_emails_with_nexo(db: Session, user_id: int, limit=15):
         db.add(log)
         new_logs += 1
 
+    now = datetime.utcnow()
+    if new_history_id:
+        state.history_id = str(new_history_id)
+    state.pending_ids = json.dumps(failed) if failed else None
+    if lease:
+        lease(db) # en la misma transacción que los EmailLog: si otro tomó el usuario, no se confirma
+    state.last_sync_at = now
+    if mode == "full":
+        state.last_full_sync_at = now
     db.commit()
-    return {"status": "success", "new_emails_processed": new_logs}
+    if failed:
+        return {"status": "partial", "new_emails_processed": new_logs, "mode": mode, "failed": len(failed)}
+    return {"status": "success", "new_emails_processed": new_logs, "mode": mode}
@@ -0,0 +1,53 @@
+"""
+Preprocesamiento de fotos de boletas.
+
+Las fotos del teléfono llegan a resolución completa (3-12 MB) con EXIF (orientación,
+GPS). Para el OCR de Miguel basta una imagen enderezada, en escala de grises y con
+el lado mayor en OCR_IMAGE_MAX_SIDE px: el payload a Gemini baja a decenas de KB.
+Para mostrar la boleta se guarda además una miniatura en color, también sin EXIF.
+
+Pillow es CPU: desde código async se llama con run_in_threadpool. Si Pillow no está
+instalado o la imagen no se puede decodificar, se usan los bytes originales.
+"""
+import io
+from typing import Optional
+
+from app.core.config import settings
+
+
+def _open(data: bytes):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+    try:
+        img = Image.open(io.BytesIO(data))
+        # Aplica la orientación EXIF antes de descartarla
+        return ImageOps.exif_transpose(img)
+    except Exception as e:
+        print(f"DEBUG [IMAGE] No se pudo decodificar la imagen: {e}")
+        return None
+
+
+def _to_jpeg(img, max_side: int, quality: int) -> bytes:
+    img.thumbnail((max_side, max_side))
+    out = io.BytesIO()
+    # Sin exif=...: Pillow no copia los metadatos al re-codificar
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def prepare_for_ocr(data: bytes) -> bytes:
+    """Enderezada, escala de grises, reducida y en JPEG. Si no se puede procesar, el original."""
+    img = _open(data)
+    if img is None:
+        return data
+    return _to_jpeg(img.convert("L"), settings.OCR_IMAGE_MAX_SIDE, settings.OCR_JPEG_QUALITY)
+
+
+def make_thumbnail(data: bytes) -> Optional[bytes]:
+    """Miniatura en color para mostrar la boleta (None si no se puede generar)."""
+    img = _open(data)
+    if img is None:
+        return None
+    return _to_jpeg(img.convert("RGB"), settings.RECEIPT_THUMB_MAX_SIDE, settings.RECEIPT_THUMB_QUALITY)
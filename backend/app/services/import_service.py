@@ -0,0 +1,238 @@
+"""
+Importación masiva de gastos desde la hoja 'Gastos' (sync-force y restauración con BD vacía).
+
+Corre en un hilo aparte, fuera de la request: el endpoint crea un ImportJob y retorna
+su id; el cliente consulta el progreso en GET /expenses/import-jobs/{id}.
+
+La hoja se lee por tramos de SHEETS_IMPORT_CHUNK_ROWS filas (memoria acotada). Cada
+tramo se parsea en bloque con pandas (fechas y montos vectorizados) y se inserta con
+un solo INSERT ... RETURNING executemany; luego se indexan las filas (sheet_index) y
+se confirma, así el progreso es visible y un error no pierde lo ya importado. Si el
+job falla a mitad de camino, igual se rehacen rollups y versión de sync para que
+reflejen lo que quedó en la BD (y los clientes hagan un reset).
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.normalize import lookup_key
+from app.models.finance import Expense
+from app.models.sync import ImportJob
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y")
+ACTIVE_STATUSES = ("pending", "running")
+RESTORE_COOLDOWN = timedelta(minutes=10)
+
+
+def iter_sheet_chunks(ws, chunk_rows: int) -> Iterator[Tuple[int, List[list]]]:
+    """(fila inicial, filas) por tramos, sin descargar la hoja completa."""
+    start = 2
+    while True:
+        end = start + chunk_rows - 1
+        rows = ws.get(f"A{start}:{_last_col(ws)}{end}")
+        if not rows:
+            return
+        yield start, [list(r) for r in rows]
+        start = end + 1
+
+
+def _last_col(ws) -> str:
+    from app.services.sheets_service import EXPENSE_ID_COL
+    return chr(ord("A") + max(EXPENSE_ID_COL, min(ws.col_count, 26)) - 1)
+
+
+def parse_chunk(rows: List[list], start_row: int, cols: Dict[str, int]):
+    """
+    Parseo vectorizado de un tramo. Retorna (registros, filas_de_la_hoja, omitidas).
+    Mismas reglas que get_all_expenses_from_sheet: fecha en DATE_FORMATS, monto sin $ . ,
+    """
+    import pandas as pd
+
+    width = max(cols.values()) + 1
+    frame = pd.DataFrame([r + [""] * (width - len(r)) for r in rows]).iloc[:, :width]
+    frame.index = range(start_row, start_row + len(rows))
+
+    def column(key, default=None):
+        idx = cols[key]
+        if idx == -1:
+            return pd.Series(default, index=frame.index, dtype=object)
+        return frame[idx].astype(str)
+
+    raw_date = column("date", "").str.strip()
+    parsed = pd.Series(pd.NaT, index=frame.index)
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(raw_date[missing], format=fmt, errors="coerce")
+
+    amount = pd.to_numeric(
+        column("amount", "").str.replace(r"[$.,]", "", regex=True).str.strip(),
+        errors="coerce",
+    )
+    valid = parsed.notna() & amount.notna() & (raw_date != "")
+
+    frame = pd.DataFrame({
+        "date": parsed.dt.date,
+        "concept": column("concept", ""),
+        "category": column("category", "General"),
+        "section": column("section", "OTROS"),
+        "amount": amount,
+        "payment_method": column("payment_method", "N/A"),
+        "image_url": column("image_url", None),
+    })[valid]
+    frame["amount"] = frame["amount"].astype("int64")
+    frame["image_url"] = frame["image_url"].where(frame["image_url"].fillna("") != "", None)
+
+    records = frame.to_dict("records")
+    for r in records:
+        r["amount"] = int(r["amount"])
+    return records, [int(i) for i in frame.index], int((~valid).sum())
+
+
+def insert_chunk(db: Session, user_id: int, records: List[dict]) -> List[int]:
+    """INSERT executemany con RETURNING en el orden de los parámetros."""
+    if not records:
+        return []
+    now = datetime.utcnow()
+    params = [{
+        **r,
+        "user_id": user_id,
+        "created_at": now,
+        "section_key": lookup_key(r["section"]),
+        "category_key": lookup_key(r["category"] or "General"),
+    } for r in records]
+    stmt = insert(Expense).returning(Expense.id, sort_by_parameter_order=True)
+    return list(db.execute(stmt, params).scalars())
+
+
+def _refresh_derived(db: Session, job: ImportJob):
+    """Los INSERT masivos no pasan por el flush: rollups y versión de sync se rehacen aquí."""
+    from app.services import rollup_service, sync_service
+    scope = None if job.kind == "sync_force" else job.user_id
+    rollup_service.rebuild_rollups(db, scope)
+    sync_service.mark_reset(db, scope)
+
+
+def run_import(job_id: int):
+    from app.database import SessionLocal
+    from app.services import sync_service, sheet_index, sheets_outbox
+    from app.services.sheets_service import get_sheet, expense_columns
+
+    db = SessionLocal()
+    try:
+        job = db.get(ImportJob, job_id)
+        job.status = "running"
+        db.commit()
+
+        # Primero el acceso a la hoja: sin él no se borra nada
+        sheet = get_sheet()
+        if not sheet:
+            raise RuntimeError("No hay acceso a Google Sheets")
+        try:
+            ws = sheet.worksheet("Gastos")
+        except Exception:
+            ws = None
+        cols = expense_columns(ws.row_values(1)) if ws else None
+
+        if job.kind == "sync_force":
+            # Reemplaza todo (igual que el sync-force anterior): se borran los gastos locales
+            db.query(Expense).delete()
+            sheet_index.clear(db)
+            sync_service.mark_reset(db)
+            db.commit()
+            print("DEBUG [IMPORT] Local expenses cleared.")
+
+        if cols is not None:
+            job.total_rows = max(ws.row_count - 1, 0)
+            db.commit()
+            for start_row, rows in iter_sheet_chunks(ws, settings.SHEETS_IMPORT_CHUNK_ROWS):
+                records, sheet_rows, skipped = parse_chunk(rows, start_row, cols)
+                ids = insert_chunk(db, job.user_id, records)
+                sheet_index.set_rows(db, dict(zip(ids, sheet_rows)))
+                # Los IDs locales son nuevos: la columna ID de la hoja se reescribe vía la cola
+                if ids:
+                    sheets_outbox.enqueue(db, "expense_ids_rewrite", {
+                        "ids_by_row": {str(row): eid for row, eid in zip(sheet_rows, ids)}
+                    })
+                job.processed_rows += len(rows)
+                job.imported += len(ids)
+                job.skipped += skipped
+                db.commit()
+                print(f"DEBUG [IMPORT] Job {job.id}: {job.processed_rows}/{job.total_rows} rows, {job.imported} imported.")
+
+        _refresh_derived(db, job)
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        print(f"DEBUG [IMPORT] Job {job.id} done: {job.imported} expenses restored from Sheets.")
+    except Exception as e:
+        print(f"ERROR [IMPORT] Job {job_id} failed: {e}")
+        db.rollback()
+        job = db.get(ImportJob, job_id)
+        if job:
+            # Lo ya importado (o el borrado de sync_force) quedó confirmado: los rollups
+            # y la versión de sync tienen que reflejarlo aunque el job haya fallado
+            try:
+                _refresh_derived(db, job)
+                db.commit()
+            except Exception as refresh_error:
+                print(f"ERROR [IMPORT] Job {job_id}: rollups/sync not refreshed: {refresh_error}")
+                db.rollback()
+            job.status = "error"
+            job.error = str(e)[:1000]
+            job.finished_at = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+
+
+def start_import(db: Session, user_id: int, kind: str) -> ImportJob:
+    """Crea el job (o retorna el que ya está en curso para el usuario) y lo lanza en un hilo."""
+    active = db.query(ImportJob).filter(
+        ImportJob.user_id == user_id, ImportJob.status.in_(ACTIVE_STATUSES)
+    ).order_by(ImportJob.id.desc()).first()
+    if active:
+        return active
+    job = ImportJob(user_id=user_id, kind=kind, status="pending", processed_rows=0, imported=0, skipped=0)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    threading.Thread(target=run_import, args=(job.id,), name=f"import-{job.id}", daemon=True).start()
+    return job
+
+
+def start_restore_if_needed(db: Session, user_id: int) -> Optional[ImportJob]:
+    """
+    Restauración con BD vacía (GET /expenses/). Con una hoja vacía no se reintenta en
+    cada request: espera RESTORE_COOLDOWN desde el último intento terminado.
+    """
+    last = db.query(ImportJob).filter(ImportJob.user_id == user_id).order_by(ImportJob.id.desc()).first()
+    if last and last.status in ACTIVE_STATUSES:
+        return last
+    if last and last.finished_at and datetime.utcnow() - last.finished_at < RESTORE_COOLDOWN:
+        return None
+    return start_import(db, user_id, "restore")
+
+
+def job_status(job: ImportJob) -> dict:
+    progress = None
+    if job.status == "done":
+        progress = 1.0
+    elif job.total_rows:
+        progress = round(min(job.processed_rows / job.total_rows, 1.0), 3)
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows,
+        "imported": job.imported,
+        "skipped": job.skipped,
+        "progress": progress,
+        "error": job.error,
+    }
@@ -0,0 +1,172 @@
+"""
+Intérprete local de mensajes simples del chat ("gasté 5000 en uber", "borra el gasto 123").
+
+Estos mensajes caben en las intenciones que routers/agent.py ya ejecuta (CREATE,
+DELETE, UPDATE, DELETE_COMMITMENT, MARK_PAID_COMMITMENT), así que no necesitan una
+vuelta completa a GPT-4o. Las reglas exigen que el mensaje calce entero con una
+gramática conocida y, para gastos, que el texto sea el nombre de una categoría
+única del usuario (más, como mucho, palabras de relleno de _FILLER_WORDS). Medio de
+pago, fecha o gasto compartido ("con débito", "ayer", "a medias") los resuelve Lúcio:
+ante cualquier duda retornan None y el mensaje sigue hacia el modelo.
+
+scripts/bench_fast_intent.py mide precisión y latencia contra un corpus etiquetado.
+"""
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.normalize import lookup_key, parse_amount
+from app.models.budget import Category
+
+PLACEHOLDER = "_TEMP_PLACEHOLDER_"
+
+_AMOUNT = r"\$?\s*(?P<amount>\d{1,3}(?:[.,]\d{3})+|\d+)(?:\s*(?P<mult>mil|lucas?|k)\b)?(?:\s*pesos)?"
+_ID = r"(?:n(?:ro|umero|°|º)?\.?\s*|id\s*|#\s*)?(?P<id>\d+)"
+_SPEND_VERB = r"(?:me\s+)?(?:gaste|pague|compre)"
+
+_CREATE_RULES = [
+    # "gasté 5000 en uber", "5.000 en uber", "pagué 12 lucas de luz"
+    ("create_amount_first", re.compile(rf"^(?:{_SPEND_VERB}\s+)?{_AMOUNT}\s+(?:en|de|por|para)\s+(?P<what>.+)$")),
+    # "gasté en uber 5000"
+    ("create_amount_last", re.compile(rf"^{_SPEND_VERB}\s+(?:en|por)\s+(?P<what>.+?)\s+{_AMOUNT}$")),
+    # "uber 5000" (solo si el texto es exactamente una categoría, ver _match_category)
+    ("create_bare", re.compile(rf"^(?P<what>[a-zñ ]+?)\s+{_AMOUNT}$")),
+]
+
+_ID_RULES = [
+    ("delete", "DELETE", re.compile(
+        rf"^(?:borra|borrar|elimina|eliminar|quita|quitar|anula|anular)\s+(?:el\s+)?gasto\s+{_ID}$")),
+    ("delete_commitment", "DELETE_COMMITMENT", re.compile(
+        rf"^(?:borra|borrar|elimina|eliminar)\s+(?:el\s+)?compromiso\s+{_ID}$")),
+    ("mark_paid", "MARK_PAID_COMMITMENT", re.compile(
+        rf"^(?:(?:marca|marcar)\s+(?:como\s+pagado\s+)?(?:el\s+)?compromiso\s+{_ID}(?:\s+como\s+pagado)?"
+        rf"|(?:ya\s+)?pague\s+(?:el\s+)?compromiso\s+{_ID.replace('?P<id>', '?P<id2>')})$")),
+    ("update_amount", "UPDATE", re.compile(
+        rf"^(?:cambia|cambiar|corrige|corregir|edita|editar|actualiza|actualizar)\s+(?:el\s+)?(?:monto\s+del\s+)?"
+        rf"gasto\s+{_ID}\s+(?:a|por|en)\s+{_AMOUNT}$")),
+]
+
+# Palabras que pueden acompañar a la categoría sin cambiar el gasto ("uber al trabajo")
+_FILLER_WORDS = {"AL", "A", "EL", "LA", "LOS", "LAS", "DEL", "DE", "MI", "HOY", "TRABAJO", "OFICINA"}
+
+# Cambian medio de pago, fecha o monto del gasto: el registro rápido los perdería
+_DEFER_WORDS = {
+    "DEBITO", "CREDITO", "TARJETA", "TRANSFERENCIA", "TRANSFERI", "CUOTA", "CUOTAS",
+    "AYER", "ANTEAYER", "ANTIER", "HACE", "PASADO", "PASADA", "SEMANA", "DIA", "DIAS",
+    "LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO", "DOMINGO",
+    "MEDIAS", "MITAD", "ENTRE", "DIVIDIDO", "CON",
+}
+
+_lock = threading.Lock()
+_stats: Dict[str, int] = {"fast_path": 0, "fallback": 0}
+
+
+def _fold(text: str) -> str:
+    """Minúsculas y sin acentos, carácter por carácter (mismas posiciones que el original)."""
+    return "".join(unicodedata.normalize("NFKD", c)[0].lower() if c.strip() else " " for c in text)
+
+
+def _clean(message: str) -> str:
+    return re.sub(r"\s+", " ", message.strip()).rstrip(".!")
+
+
+def _amount(match) -> int:
+    value = parse_amount(match.group("amount"))
+    if match.group("mult"):
+        value *= 1000
+    return value
+
+
+def _match_category(what: str, categories: Sequence[Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+    """(sección, nombre) de la única categoría que nombra el texto, o None."""
+    key = lookup_key(what)
+    real = [(s, n) for s, n in categories if n != PLACEHOLDER]
+
+    exact = [(s, n) for s, n in real if lookup_key(n) == key]
+    if exact:
+        return exact[0] if len(exact) == 1 else None
+
+    # "uber al trabajo" -> Uber: el nombre completo y el resto solo palabras de relleno
+    words = f" {re.sub(r'[^A-Z0-9Ñ]+', ' ', key)} "
+    contained = [(s, n) for s, n in real if f" {lookup_key(n)} " in words]
+    names = {lookup_key(n) for _, n in contained}
+    if len(contained) != 1 or len(names) != 1:
+        return None
+    rest = words.replace(f" {lookup_key(contained[0][1])} ", " ", 1).split()
+    return contained[0] if all(w in _FILLER_WORDS for w in rest) else None
+
+
+def parse(message: str, categories: Sequence[Tuple[str, str]]) -> Optional[dict]:
+    """Acción en el formato de Lúcio si el mensaje calza con una regla segura; si no, None."""
+    text = _clean(message or "")
+    if not text or "?" in text or len(text) > 120:
+        return None
+    folded = _fold(text)
+
+    for rule, intent, pattern in _ID_RULES:
+        m = pattern.match(folded)
+        if not m:
+            continue
+        target_id = int(m.group("id") or m.groupdict().get("id2"))
+        if intent == "DELETE":
+            return {"intent": intent, "target_id": target_id, "response_text": f"Gasto {target_id} eliminado.", "rule": rule}
+        if intent == "DELETE_COMMITMENT":
+            return {"intent": intent, "target_id": target_id, "response_text": f"Compromiso {target_id} eliminado.", "rule": rule}
+        if intent == "MARK_PAID_COMMITMENT":
+            return {"intent": intent, "target_id": target_id, "response_text": f"Compromiso {target_id} marcado como pagado.", "rule": rule}
+        amount = _amount(m)
+        if amount <= 0:
+            return None
+        return {"intent": intent, "target_id": target_id, "amount": amount,
+                "response_text": f"Gasto {target_id} actualizado a ${amount:,}.", "rule": rule}
+
+    if _DEFER_WORDS.intersection(re.sub(r"[^A-Z0-9Ñ]+", " ", lookup_key(text)).split()):
+        return None
+    for rule, pattern in _CREATE_RULES:
+        m = pattern.match(folded)
+        if not m:
+            continue
+        amount = _amount(m)
+        start, end = m.span("what")
+        what = text[start:end].strip()
+        match = _match_category(what, categories)
+        if amount <= 0 or not match:
+            return None
+        if rule == "create_bare" and lookup_key(what) != lookup_key(match[1]):
+            return None
+        section, name = match
+        return {
+            "intent": "CREATE",
+            "amount": amount,
+            "category": name,
+            "section": section,
+            "concept": what[:1].upper() + what[1:],
+            "payment_method": "Efectivo",
+            "response_text": f"Listo, registré ${amount:,} en {name} ({section}).",
+            "rule": rule,
+        }
+    return None
+
+
+def user_categories(db: Session, user_id: int) -> List[Tuple[str, str]]:
+    return [tuple(r) for r in db.query(Category.section, Category.name).filter(Category.user_id == user_id).all()]
+
+
+def try_fast_path(db: Session, user_id: int, message: str) -> Optional[dict]:
+    """Respuesta lista para agent.py (mismo formato que Lúcio) o None para ir al modelo."""
+    action = parse(message, user_categories(db, user_id))
+    with _lock:
+        _stats["fast_path" if action else "fallback"] += 1
+    if not action:
+        return None
+    action.pop("rule", None)
+    # Sin response_text global: agent.py responde con el resultado real de la acción
+    return {"intent": "MULTI_ACTION", "response_text": "", "actions": [action]}
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
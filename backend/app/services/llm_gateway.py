@@ -0,0 +1,152 @@
+"""
+Acceso asíncrono a los modelos (OpenAI para Lúcio, Gemini para Miguel, Faro y Nexo).
+
+/agent/chat es async: una llamada bloqueante al modelo congelaba el event loop y
+todos los chats del worker esperaban a que terminara. Aquí se usan AsyncOpenAI y
+generate_content_async, así mientras un modelo responde el loop atiende otras requests.
+
+Los clientes se crean una vez por proceso y se reutilizan (conexiones HTTP/gRPC en
+pool, sin handshake TLS por mensaje). Cada llamada lleva su propio timeout.
+"""
+import asyncio
+import os
+import threading
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.core.config import settings
+
+GEMINI_MODEL = "gemini-flash-latest"
+OPENAI_MODEL = "gpt-4o"
+
+_openai_client = None
+_gemini_configured_key: Optional[str] = None
+_gemini_models: Dict[str, object] = {}
+
+# Tokens enviados a OpenAI por turno (cached = prefijo reutilizado por el prompt caching)
+_usage_lock = threading.Lock()
+_usage: Dict[str, int] = {"calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0}
+
+
+def _timeout(timeout: Optional[float]) -> float:
+    return timeout if timeout is not None else settings.LLM_TIMEOUT_SECONDS
+
+
+def get_openai():
+    """AsyncOpenAI compartido. None si no hay OPENAI_API_KEY."""
+    global _openai_client
+    if _openai_client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI(
+            api_key=api_key,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+        )
+    return _openai_client
+
+
+def get_gemini(model_name: str = GEMINI_MODEL):
+    """GenerativeModel cacheado por nombre (guarda sus clientes sync/async). None sin GEMINI_API_KEY."""
+    global _gemini_configured_key
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    import google.generativeai as genai
+    if api_key != _gemini_configured_key:
+        genai.configure(api_key=api_key)
+        _gemini_configured_key = api_key
+        _gemini_models.clear()
+    model = _gemini_models.get(model_name)
+    if model is None:
+        model = _gemini_models[model_name] = genai.GenerativeModel(model_name)
+    return model
+
+
+def _record_usage(usage):
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    with _usage_lock:
+        _usage["calls"] += 1
+        _usage["prompt_tokens"] += usage.prompt_tokens or 0
+        _usage["cached_prompt_tokens"] += (getattr(details, "cached_tokens", None) or 0) if details else 0
+        _usage["completion_tokens"] += usage.completion_tokens or 0
+
+
+def usage_stats() -> Dict[str, float]:
+    with _usage_lock:
+        s = dict(_usage)
+    calls = s["calls"] or 1
+    s["prompt_tokens_per_call"] = round(s["prompt_tokens"] / calls, 1)
+    # Lo que realmente se cobra a precio completo: antes del caching era igual a prompt_tokens_per_call
+    s["uncached_prompt_tokens_per_call"] = round((s["prompt_tokens"] - s["cached_prompt_tokens"]) / calls, 1)
+    return s
+
+
+async def openai_chat(messages: List[dict], model: str = OPENAI_MODEL, json_mode: bool = False,
+                      timeout: Optional[float] = None) -> str:
+    client = get_openai()
+    if client is None:
+        raise RuntimeError("No hay API Key de OpenAI configurada.")
+    kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+    response = await client.chat.completions.create(
+        model=model, messages=messages, timeout=_timeout(timeout), **kwargs
+    )
+    _record_usage(response.usage)
+    return response.choices[0].message.content.strip()
+
+
+async def openai_chat_stream(messages: List[dict], model: str = OPENAI_MODEL, json_mode: bool = False,
+                             timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """Como openai_chat, pero entrega el texto por fragmentos a medida que se genera."""
+    client = get_openai()
+    if client is None:
+        raise RuntimeError("No hay API Key de OpenAI configurada.")
+    kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+    stream = await client.chat.completions.create(
+        model=model, messages=messages, timeout=_timeout(timeout), stream=True,
+        stream_options={"include_usage": True}, **kwargs
+    )
+    async for chunk in stream:
+        if getattr(chunk, "usage", None):
+            _record_usage(chunk.usage) # último chunk, sin choices
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def gemini_generate(contents, generation_config: Optional[dict] = None,
+                          model_name: str = GEMINI_MODEL, timeout: Optional[float] = None) -> str:
+    model = get_gemini(model_name)
+    if model is None:
+        raise RuntimeError("No hay API Key de Gemini configurada.")
+    seconds = _timeout(timeout)
+    # request_options corta la llamada gRPC; wait_for cubre reintentos internos del SDK
+    response = await asyncio.wait_for(
+        model.generate_content_async(
+            contents, generation_config=generation_config, request_options={"timeout": seconds}
+        ),
+        timeout=seconds + 5,
+    )
+    return response.text
+
+
+def gemini_generate_sync(contents, generation_config: Optional[dict] = None,
+                         model_name: str = GEMINI_MODEL, timeout: Optional[float] = None) -> str:
+    """Para código que ya corre fuera del event loop (sincronización de correos en hilos)."""
+    model = get_gemini(model_name)
+    if model is None:
+        raise RuntimeError("No hay API Key de Gemini configurada.")
+    response = model.generate_content(
+        contents, generation_config=generation_config, request_options={"timeout": _timeout(timeout)}
+    )
+    return response.text
+
+
+async def aclose():
+    """Cierra el pool HTTP de OpenAI (shutdown de la app)."""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
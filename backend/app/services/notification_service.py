@@ -1,6 +1,5 @@
 import os
 import json
-from pywebpush import webpush, WebPushException
 from sqlalchemy.orm import Session
 from app.models.finance import PushSubscription
 
@@ -20,6 +19,8 @@ def send_push_notification(subscription_info, data_dict):
         print("ERROR: VAPID keys not configured. skipping notification.")
         return False
 
+    # pywebpush (y cryptography) se cargan recién al primer envío
+    from pywebpush import webpush, WebPushException
     try:
         response = webpush(
             subscription_info=subscription_info,
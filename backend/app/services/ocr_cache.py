@@ -0,0 +1,108 @@
+"""
+Cache de resultados de Miguel (OCR de boletas) por contenido de la imagen.
+
+La misma foto suele llegar dos veces: reintento tras un error de red, doble toque
+en enviar, o reenvío en el turno siguiente. La clave es el SHA-256 de la imagen
+más un hash de la instrucción (mensaje del usuario y carpetas), porque Miguel
+también divide montos según lo que se le pide. Las entradas viven OCR_CACHE_TTL_SECONDS
+y el cache guarda como máximo OCR_CACHE_MAX_ENTRIES (se descarta la menos usada).
+
+Si dos requests piden la misma boleta a la vez, la segunda espera el resultado de
+la primera en vez de llamar otra vez a Gemini.
+"""
+import asyncio
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.normalize import lookup_key
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+_inflight: Dict[str, asyncio.Future] = {}
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "shared_inflight": 0, "evictions": 0, "expired": 0}
+
+
+def image_hash(image_data: bytes) -> str:
+    return hashlib.sha256(image_data).hexdigest()
+
+
+def cache_key(image_data: bytes, user_message: str, sections_list: str) -> str:
+    instruction = f"{lookup_key(user_message or '')}\n{sections_list or ''}"
+    return f"{image_hash(image_data)}:{hashlib.sha256(instruction.encode('utf-8')).hexdigest()[:16]}"
+
+
+def get(key: str) -> Optional[List[dict]]:
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        expires_at, actions = entry
+        if expires_at <= now:
+            del _entries[key]
+            _stats["expired"] += 1
+            return None
+        _entries.move_to_end(key)
+        return actions
+
+
+def put(key: str, actions: List[dict]):
+    with _lock:
+        _entries[key] = (time.monotonic() + settings.OCR_CACHE_TTL_SECONDS, actions)
+        _entries.move_to_end(key)
+        while len(_entries) > settings.OCR_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+async def get_or_compute(key: str, compute: Callable[[], Awaitable[Optional[List[dict]]]]) -> Optional[List[dict]]:
+    """Resultado cacheado, el de una llamada en curso con la misma clave, o compute(). None no se cachea."""
+    cached = get(key)
+    if cached is not None:
+        with _lock:
+            _stats["hits"] += 1
+        return copy.deepcopy(cached)
+
+    waiting = _inflight.get(key)
+    if waiting is not None:
+        with _lock:
+            _stats["shared_inflight"] += 1
+        result = await asyncio.shield(waiting)
+        return copy.deepcopy(result)
+
+    with _lock:
+        _stats["misses"] += 1
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await compute()
+        if result is not None:
+            put(key, copy.deepcopy(result))
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        if isinstance(e, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(e)
+            future.exception() # ya entregada a quien espere; evita el aviso "never retrieved"
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        s = dict(_stats)
+        s["entries"] = len(_entries)
+    return s
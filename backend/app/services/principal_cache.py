@@ -0,0 +1,124 @@
+"""
+Cache del usuario autenticado (deps.get_current_user).
+
+Cada request autenticado hacía jwt.decode + SELECT del usuario por email. El
+resultado se guarda como un Principal inmutable con clave (sub, exp) del token,
+durante PRINCIPAL_CACHE_TTL_SECONDS como máximo y nunca más allá del exp.
+
+Invalidación explícita: si en una transacción cambia el rol, is_active, el email o
+el nombre de un User (o se borra), al hacer commit se sacan del cache sus entradas.
+Cada invalidación sube la generación: una búsqueda que empezó antes no puede
+volver a guardar el dato viejo. Los UPDATE masivos (query(User).update) no pasan
+por el ORM: después de uno, llamar a clear().
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import User
+
+# Columnas que cambian lo que ve get_current_user
+WATCHED = ("email", "role", "is_active", "tecnico_nombre")
+
+_lock = threading.Lock()
+_entries: "OrderedDict[Tuple[str, Any], Tuple[float, Any]]" = OrderedDict()
+_generation = 0
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0, "stale_puts": 0}
+
+
+def generation() -> int:
+    return _generation
+
+
+def get(sub: str, exp) -> Optional[Any]:
+    now = time.time()
+    key = (sub, exp)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                del _entries[key]
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return entry[1]
+
+
+def put(sub: str, exp, principal, seen_generation: int):
+    """Guarda el principal si no hubo invalidaciones desde que se leyó (seen_generation)."""
+    expires_at = time.time() + settings.PRINCIPAL_CACHE_TTL_SECONDS
+    if isinstance(exp, (int, float)):
+        expires_at = min(expires_at, exp)
+    with _lock:
+        if seen_generation != _generation:
+            _stats["stale_puts"] += 1
+            return
+        _entries[(sub, exp)] = (expires_at, principal)
+        _entries.move_to_end((sub, exp))
+        while len(_entries) > settings.PRINCIPAL_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def invalidate(email: str):
+    """Saca todos los tokens del usuario (cualquier exp)."""
+    global _generation
+    with _lock:
+        _generation += 1
+        for key in [k for k in _entries if k[0] == email]:
+            del _entries[key]
+        _stats["invalidations"] += 1
+
+
+def clear():
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        s = dict(_stats)
+        s["entries"] = len(_entries)
+    return s
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    emails = session.info.setdefault("principal_cache_stale", set())
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            emails.add(obj.email)
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        changed = False
+        for attr in WATCHED:
+            history = state.attrs[attr].history
+            if history.has_changes():
+                changed = True
+                if attr == "email":
+                    emails.update(e for e in history.deleted if e)
+        if changed:
+            emails.add(obj.email)
+    if not emails:
+        session.info.pop("principal_cache_stale", None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for email in session.info.pop("principal_cache_stale", ()):
+        invalidate(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop("principal_cache_stale", None)
@@ -0,0 +1,110 @@
+"""
+Contexto de datos que Lúcio recibe en cada turno (categorías, últimos gastos,
+compromisos y correos), cacheado por usuario.
+
+Antes cada mensaje del chat hacía 4 consultas y volvía a renderizar el bloque
+completo. La clave del cache es la versión de cambios del usuario (sync_service,
+sube con cada escritura de gastos/categorías/presupuestos/compromisos) más una
+huella barata de EmailLog y la fecha del día: mientras no cambien, se reutiliza
+el texto tal cual. Así el prompt también queda idéntico entre turnos, lo que
+aprovecha el prompt caching del proveedor.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.models.budget import Category
+from app.models.finance import Commitment, EmailLog, Expense
+from app.services import sync_service
+
+MAX_USERS = 256
+
+
+@dataclass(frozen=True)
+class ContextSnapshot:
+    sections_list: str
+    text: str # bloque de contexto listo para el prompt
+
+
+_lock = threading.Lock()
+_cache: "OrderedDict[int, Tuple[tuple, ContextSnapshot]]" = OrderedDict()
+_stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+
+def _cache_key(db: Session, user_id: int) -> tuple:
+    emails = db.query(
+        func.max(EmailLog.id),
+        func.count(EmailLog.id),
+        func.sum(case((EmailLog.processed == True, 1), else_=0)),
+    ).filter(EmailLog.user_id == user_id).one()
+    return (sync_service.get_version(db, user_id), tuple(emails), date.today())
+
+
+def _build(db: Session, user_id: int) -> ContextSnapshot:
+    categories = db.query(Category).filter(Category.user_id == user_id).all()
+    sections = set([c.section for c in categories])
+    sections_list = ", ".join(sections)
+    cat_context = "\n".join([f"- [{c.section}] -> {c.name} (Presupuesto: ${c.budget:,})" for c in categories])
+
+    recent_expenses = db.query(Expense).filter(Expense.user_id == user_id).order_by(Expense.id.desc()).limit(15).all()
+    expense_context = "\n".join([f" - ID: {e.id} | {e.date} | ${e.amount} | {e.concept} | [{e.section}] {e.category}" for e in recent_expenses])
+
+    commitments = db.query(Commitment).filter(Commitment.user_id == user_id).order_by(Commitment.id.desc()).limit(10).all()
+    comm_context = "\n".join([f" - ID: {c.id} | {'DEBO' if c.type == 'DEBT' else 'ME DEBEN'} | ${c.total_amount} | {c.title} | Estado: {c.status}" for c in commitments])
+
+    emails = db.query(EmailLog).filter(EmailLog.user_id == user_id).order_by(EmailLog.date.desc()).limit(15).all()
+    hoy_dt = datetime.now().date()
+    email_context = "\n".join([
+        f" - [{e.date}] {'(NUEVO - HOY - PENDIENTE)' if (not e.processed and e.date == hoy_dt) else ''} {e.sender}: {e.subject} ({e.summary})"
+        for e in emails
+    ])
+
+    text = f"""### CONTEXTO DE DATOS:
+SECCIONES: [{sections_list}]
+
+### INFORMACIÓN DE TU EQUIPO (CONTEXTO):
+- **DATOS DE GASTOS (Faro):** {expense_context if expense_context else "Sin gastos registrados."}
+- **DATOS DE CATEGORÍAS/PRESUPUESTO:** {cat_context}
+- **REGISTRO DE CORREOS BANCARIOS (Nexo):** {email_context if email_context else "Sin correos recientes."}
+- **COMPROMISOS/DEUDAS:** {comm_context if comm_context else "Sin compromisos."}
+"""
+    return ContextSnapshot(sections_list=sections_list, text=text)
+
+
+def get_context(db: Session, user_id: int) -> ContextSnapshot:
+    key = _cache_key(db, user_id)
+    with _lock:
+        cached = _cache.get(user_id)
+        if cached is not None and cached[0] == key:
+            _cache.move_to_end(user_id)
+            _stats["hits"] += 1
+            return cached[1]
+        _stats["misses"] += 1
+
+    snapshot = _build(db, user_id)
+    with _lock:
+        _cache[user_id] = (key, snapshot)
+        _cache.move_to_end(user_id)
+        while len(_cache) > MAX_USERS:
+            _cache.popitem(last=False)
+    return snapshot
+
+
+def invalidate(user_id: int = None):
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        s = dict(_stats)
+        s["cached_users"] = len(_cache)
+    return s
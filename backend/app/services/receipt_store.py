@@ -0,0 +1,230 @@
+"""
+Almacén de boletas direccionado por contenido.
+
+Antes cada upload se copiaba entero a uploads/receipts/{tecnico}_{timestamp}_{nombre},
+sin límite de tamaño y con una copia nueva por cada reenvío de la misma foto. Aquí
+el upload se copia por bloques a un temporal calculando el SHA-256 al vuelo (corta
+al pasar RECEIPT_MAX_BYTES), y se guarda con el hash como clave: una boleta repetida
+no ocupa espacio de nuevo.
+
+El backend es intercambiable (RECEIPT_STORAGE_BACKEND): "local" guarda en
+RECEIPT_STORAGE_DIR; "s3" usa cualquier servicio compatible con S3 (MinIO, R2, ...)
+y necesita boto3 instalado. routers/receipts.py los sirve con ETag y Range, solo
+al usuario dueño del gasto.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from app.core.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+THUMB_SUFFIX = ".thumb"
+_KEY_RE = re.compile(r"^[0-9a-f]{64}(\.thumb)?$")
+
+_MAGIC = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"%PDF", "application/pdf"),
+]
+
+
+class ReceiptTooLarge(Exception):
+    pass
+
+
+def sniff_content_type(head: bytes) -> str:
+    for magic, content_type in _MAGIC:
+        if head.startswith(magic):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"):
+        return "image/heic"
+    return "application/octet-stream"
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(_KEY_RE.match(key))
+
+
+class LocalReceiptBackend:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # Subcarpeta por los 2 primeros caracteres para no tener miles de archivos en un directorio
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def temp_dir(self) -> str:
+        return self.root # mismo filesystem: os.replace es atómico
+
+    def put_file(self, key: str, path: str, content_type: str):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str):
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self.put_file(key, tmp, content_type)
+
+    def read_bytes(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def stat(self, key: str) -> Optional[Tuple[int, str]]:
+        """(tamaño, content-type) o None si no existe."""
+        try:
+            with open(self._path(key), "rb") as f:
+                head = f.read(16)
+                size = os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            return None
+        return size, sniff_content_type(head)
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        """Bytes [start, end] (ambos incluidos) por bloques."""
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+class S3ReceiptBackend:
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None):
+        import boto3 # opcional: solo con RECEIPT_STORAGE_BACKEND=s3
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3", endpoint_url=endpoint_url or None, region_name=region or None,
+            aws_access_key_id=access_key or None, aws_secret_access_key=secret_key or None,
+        )
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def temp_dir(self) -> Optional[str]:
+        return None
+
+    def put_file(self, key: str, path: str, content_type: str):
+        try:
+            self.client.upload_file(path, self.bucket, key, ExtraArgs={"ContentType": content_type})
+        finally:
+            os.unlink(path)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type)
+
+    def read_bytes(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def stat(self, key: str) -> Optional[Tuple[int, str]]:
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError:
+            return None
+        return head["ContentLength"], head.get("ContentType") or "application/octet-stream"
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        body = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}")["Body"]
+        for chunk in body.iter_chunks(CHUNK_SIZE):
+            yield chunk
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if settings.RECEIPT_STORAGE_BACKEND == "s3":
+            _backend = S3ReceiptBackend(
+                settings.RECEIPT_S3_BUCKET, settings.RECEIPT_S3_ENDPOINT_URL, settings.RECEIPT_S3_REGION,
+                settings.RECEIPT_S3_ACCESS_KEY, settings.RECEIPT_S3_SECRET_KEY,
+            )
+        else:
+            _backend = LocalReceiptBackend(settings.RECEIPT_STORAGE_DIR)
+    return _backend
+
+
+@dataclass(frozen=True)
+class StoredReceipt:
+    key: str
+    size: int
+    content_type: str
+    deduplicated: bool
+
+    @property
+    def url(self) -> str:
+        return receipt_url(self.key)
+
+
+def receipt_url(key: str) -> str:
+    """Ruta guardada en Expense.image_url (routers/receipts.py la sirve solo al dueño)."""
+    return f"{settings.API_V1_STR}/receipts/{key}"
+
+
+def store_upload(fileobj: BinaryIO) -> StoredReceipt:
+    """
+    Copia el upload por bloques a un temporal calculando el SHA-256 y lo guarda con
+    el hash como clave. Si ya existía, descarta la copia. ReceiptTooLarge si excede el límite.
+    """
+    backend = get_backend()
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    fd, tmp_path = tempfile.mkstemp(dir=backend.temp_dir(), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.RECEIPT_MAX_BYTES:
+                    raise ReceiptTooLarge(f"La imagen supera {settings.RECEIPT_MAX_BYTES // (1024 * 1024)} MB")
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                digest.update(chunk)
+                out.write(chunk)
+
+        key = digest.hexdigest()
+        content_type = sniff_content_type(head)
+        if backend.exists(key):
+            os.unlink(tmp_path)
+            return StoredReceipt(key, size, content_type, deduplicated=True)
+
+        backend.put_file(key, tmp_path, content_type)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    _store_thumbnail(backend, key)
+    return StoredReceipt(key, size, content_type, deduplicated=False)
+
+
+def _store_thumbnail(backend, key: str):
+    from app.services import image_service
+    try:
+        thumbnail = image_service.make_thumbnail(backend.read_bytes(key))
+        if thumbnail:
+            backend.put_bytes(key + THUMB_SUFFIX, thumbnail, "image/jpeg")
+    except Exception as e:
+        print(f"DEBUG [RECEIPTS] No se pudo generar la miniatura de {key}: {e}")
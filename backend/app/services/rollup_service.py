@@ -0,0 +1,199 @@
+"""
+Rollups mensuales de gastos (usuario / mes / sección / categoría).
+Se actualizan dentro de la misma transacción que el gasto: el caller hace el commit.
+"""
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Optional, Dict, List
+from app.models.finance import Expense, ExpenseRollup
+
+DEFAULT_SECTION = "OTROS"
+
+
+def month_key(value: Optional[date] = None) -> str:
+    """Convierte una fecha al formato de mes usado en Budget/ExpenseRollup ("2026-02")"""
+    return (value or date.today()).strftime("%Y-%m")
+
+
+def _rollup_filter(query, user_id: int, month: str, section: str, category: str):
+    return query.filter(
+        ExpenseRollup.user_id == user_id,
+        ExpenseRollup.month == month,
+        ExpenseRollup.section == section,
+        ExpenseRollup.category == category
+    )
+
+
+def apply_delta(db: Session, user_id: int, expense_date: Optional[date], section: Optional[str],
+                category: str, amount: int, count: int = 1):
+    """
+    Suma (o resta, con valores negativos) un gasto al rollup de su mes.
+    Usa UPDATE ... SET total = total + x para no perder incrementos concurrentes.
+    """
+    month = month_key(expense_date)
+    section = section or DEFAULT_SECTION
+    values = {
+        ExpenseRollup.total: ExpenseRollup.total + amount,
+        ExpenseRollup.count: ExpenseRollup.count + count
+    }
+
+    updated = _rollup_filter(db.query(ExpenseRollup), user_id, month, section, category).update(values, synchronize_session=False)
+    if not updated:
+        try:
+            with db.begin_nested():
+                db.add(ExpenseRollup(user_id=user_id, month=month, section=section,
+                                     category=category, total=amount, count=count))
+        except IntegrityError:
+            # Otra transacción creó la fila primero: reintentar como incremento
+            _rollup_filter(db.query(ExpenseRollup), user_id, month, section, category).update(values, synchronize_session=False)
+
+    if count < 0:
+        _rollup_filter(db.query(ExpenseRollup), user_id, month, section, category).filter(
+            ExpenseRollup.count <= 0
+        ).delete(synchronize_session=False)
+
+
+def add_expense(db: Session, expense: Expense):
+    """Registra un gasto nuevo (o la versión nueva de un gasto editado) en el rollup"""
+    apply_delta(db, expense.user_id, expense.date, expense.section, expense.category, expense.amount, 1)
+
+
+def remove_expense(db: Session, expense: Expense):
+    """Descuenta un gasto del rollup. Llamar ANTES de borrarlo o modificarlo."""
+    apply_delta(db, expense.user_id, expense.date, expense.section, expense.category, -expense.amount, -1)
+
+
+def move_category(db: Session, user_id: int, old_section: str, new_section: str,
+                  old_category: Optional[str] = None, new_category: Optional[str] = None):
+    """
+    Re-asigna los rollups cuando se renombra/mueve una categoría, o se renombra
+    una sección completa (old_category=None).
+    """
+    if old_section == DEFAULT_SECTION:
+        # Gastos con sección vacía también caen en "OTROS": no se pueden mover por clave
+        rebuild_rollups(db, user_id)
+        return
+
+    query = db.query(ExpenseRollup).filter(
+        ExpenseRollup.user_id == user_id,
+        ExpenseRollup.section == old_section
+    )
+    if old_category is not None:
+        query = query.filter(ExpenseRollup.category == old_category)
+
+    rows = [(r.month, r.category, r.total, r.count) for r in query.all()]
+    query.delete(synchronize_session=False)
+
+    for month, category, total, count in rows:
+        target_category = new_category if (old_category is not None and new_category) else category
+        _add_month_totals(db, user_id, month, new_section, target_category, total, count)
+
+
+def _add_month_totals(db: Session, user_id: int, month: str, section: str, category: str, total: int, count: int):
+    updated = _rollup_filter(db.query(ExpenseRollup), user_id, month, section, category).update({
+        ExpenseRollup.total: ExpenseRollup.total + total,
+        ExpenseRollup.count: ExpenseRollup.count + count
+    }, synchronize_session=False)
+    if not updated:
+        db.add(ExpenseRollup(user_id=user_id, month=month, section=section, category=category, total=total, count=count))
+        db.flush()
+
+
+def compute_rollups_from_expenses(db: Session, user_id: Optional[int] = None) -> Dict[tuple, List[int]]:
+    """
+    Recalcula los totales desde la tabla `expenses`.
+    Agrupa por día en SQL (portable SQLite/Postgres) y consolida por mes aquí.
+    Retorna {(user_id, month, section, category): [total, count]}
+    """
+    query = db.query(
+        Expense.user_id,
+        Expense.date,
+        Expense.section,
+        Expense.category,
+        func.sum(Expense.amount),
+        func.count(Expense.id)
+    )
+    if user_id is not None:
+        query = query.filter(Expense.user_id == user_id)
+    query = query.group_by(Expense.user_id, Expense.date, Expense.section, Expense.category)
+
+    result = {}
+    for uid, exp_date, section, category, total, count in query.all():
+        key = (uid, month_key(exp_date), section or DEFAULT_SECTION, category)
+        acc = result.setdefault(key, [0, 0])
+        acc[0] += int(total or 0)
+        acc[1] += int(count or 0)
+    return result
+
+
+def rebuild_rollups(db: Session, user_id: Optional[int] = None) -> int:
+    """Borra y recalcula los rollups (de un usuario o de todos). Retorna filas creadas."""
+    delete_query = db.query(ExpenseRollup)
+    if user_id is not None:
+        delete_query = delete_query.filter(ExpenseRollup.user_id == user_id)
+    delete_query.delete(synchronize_session=False)
+
+    computed = compute_rollups_from_expenses(db, user_id)
+    db.bulk_insert_mappings(ExpenseRollup, [
+        {"user_id": uid, "month": month, "section": section, "category": category, "total": total, "count": count}
+        for (uid, month, section, category), (total, count) in computed.items()
+    ])
+    return len(computed)
+
+
+def check_rollups(db: Session, user_id: Optional[int] = None) -> List[Dict]:
+    """
+    Compara los rollups guardados contra la tabla `expenses`.
+    Retorna la lista de diferencias (vacía si todo cuadra).
+    """
+    expected = compute_rollups_from_expenses(db, user_id)
+
+    query = db.query(
+        ExpenseRollup.user_id, ExpenseRollup.month, ExpenseRollup.section,
+        ExpenseRollup.category, ExpenseRollup.total, ExpenseRollup.count
+    )
+    if user_id is not None:
+        query = query.filter(ExpenseRollup.user_id == user_id)
+    stored = {(uid, month, section, category): [total, count]
+              for uid, month, section, category, total, count in query.all()
+              if count}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        exp_vals = expected.get(key, [0, 0])
+        got_vals = stored.get(key, [0, 0])
+        if exp_vals != got_vals:
+            uid, month, section, category = key
+            mismatches.append({
+                "user_id": uid, "month": month, "section": section, "category": category,
+                "expected_total": exp_vals[0], "stored_total": got_vals[0],
+                "expected_count": exp_vals[1], "stored_count": got_vals[1]
+            })
+    return mismatches
+
+
+def ensure_rollups(db: Session) -> bool:
+    """Construye los rollups la primera vez (tabla nueva sobre una BD con gastos)"""
+    if db.query(ExpenseRollup.id).first() is not None:
+        return False
+    if db.query(Expense.id).first() is None:
+        return False
+    rebuild_rollups(db)
+    db.commit()
+    return True
+
+
+def get_month_spending(db: Session, user_id: int, month: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """Gasto del mes por sección/categoría: {section: {category: total}}"""
+    month = month or month_key()
+    rows = db.query(ExpenseRollup.section, ExpenseRollup.category, ExpenseRollup.total).filter(
+        ExpenseRollup.user_id == user_id,
+        ExpenseRollup.month == month
+    ).all()
+
+    result = {}
+    for section, category, total in rows:
+        result.setdefault(section, {})[category] = total
+    return result
@@ -1,31 +1,17 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import os
-import json
 import logging
 from datetime import datetime
 from app.core.points_calculator import calculate_final_score
+from app.services import sheets_client
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def get_sheet_client():
-    creds_json = os.getenv("GOOGLE_SHEETS_CREDENTIALS_JSON")
-    if not creds_json:
-        logger.error("No creds found.")
-        return None
-    
+    # Cliente compartido del proceso (autoriza una sola vez, ver sheets_client.py)
     try:
-        creds_json = creds_json.strip()
-        if creds_json.startswith("'") or creds_json.startswith('"'):
-            creds_json = creds_json[1:-1]
-        
-        creds_dict = json.loads(creds_json)
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        client = gspread.authorize(creds)
-        return client
+        return sheets_client.get_client()
     except Exception as e:
         logger.error(f"Auth failed: {e}")
         return None
@@ -53,7 +39,7 @@ def update_scores_in_sheet():
 
     sheet_id = os.getenv("GOOGLE_SHEET_ID")
     try:
-        sheet = client.open_by_key(sheet_id)
+        sheet = sheets_client.open_spreadsheet(sheet_id)
     except Exception as e:
         logger.error(f">>> [SCORES] Sheet open failed: {e}")
         return
@@ -0,0 +1,140 @@
+"""
+Índice local expense_id -> fila de la hoja 'Gastos'.
+
+Cada fila sincronizada lleva el Expense.id en la columna I. Con el índice, editar o
+borrar un gasto es una escritura a un rango puntual en vez de descargar la hoja entera
+y buscar por fecha+concepto+monto (que además es ambiguo con gastos duplicados).
+
+Lo mantiene el worker de sheets_outbox: append_rows registra las filas nuevas y cada
+borrado corre las filas de abajo. Si alguien edita la hoja a mano, reconcile() lo
+reconstruye leyendo solo la columna de IDs (el worker lo hace solo al detectar una
+diferencia y periódicamente; también scripts/reconcile_sheet_index.py).
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+
+from app.models.sync import ExpenseSheetRow
+
+_RANGE_START_ROW = re.compile(r"![A-Z]+(\d+)")
+_id_column_ready = set()
+
+
+def ensure_id_column(ws):
+    """Agrega la columna 'ID' a hojas creadas antes de que existiera (una vez por proceso)."""
+    from app.services.sheets_service import EXPENSE_ID_COL
+    if ws.id in _id_column_ready:
+        return
+    if ws.col_count < EXPENSE_ID_COL:
+        ws.add_cols(EXPENSE_ID_COL - ws.col_count)
+    if not ws.cell(1, EXPENSE_ID_COL).value:
+        ws.update_cell(1, EXPENSE_ID_COL, "ID")
+    _id_column_ready.add(ws.id)
+
+
+def parse_id(value) -> Optional[int]:
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_rows(db: Session, expense_ids: Iterable[int]) -> Dict[int, int]:
+    ids = list(set(expense_ids))
+    if not ids:
+        return {}
+    return dict(db.query(ExpenseSheetRow.expense_id, ExpenseSheetRow.sheet_row)
+                .filter(ExpenseSheetRow.expense_id.in_(ids)).all())
+
+
+def set_rows(db: Session, rows_by_id: Dict[int, int]):
+    if not rows_by_id:
+        return
+    db.execute(delete(ExpenseSheetRow).where(ExpenseSheetRow.expense_id.in_(list(rows_by_id))))
+    db.execute(insert(ExpenseSheetRow), [
+        {"expense_id": eid, "sheet_row": row} for eid, row in rows_by_id.items()
+    ])
+
+
+def record_appended(db: Session, response: dict, expense_ids: List[Optional[int]]):
+    """Registra las filas devueltas por append_rows ('Gastos!A10:I12' -> 10, 11, 12)."""
+    updated_range = ((response or {}).get("updates") or {}).get("updatedRange", "")
+    m = _RANGE_START_ROW.search(updated_range)
+    if not m:
+        return False
+    start = int(m.group(1))
+    set_rows(db, {eid: start + i for i, eid in enumerate(expense_ids) if eid})
+    return True
+
+
+def record_deleted(db: Session, sheet_rows: Iterable[int]):
+    """Quita las filas borradas y corre hacia arriba las que estaban debajo."""
+    for row in sorted(set(sheet_rows), reverse=True):
+        db.execute(delete(ExpenseSheetRow).where(ExpenseSheetRow.sheet_row == row))
+        db.execute(
+            update(ExpenseSheetRow)
+            .where(ExpenseSheetRow.sheet_row > row)
+            .values(sheet_row=ExpenseSheetRow.sheet_row - 1)
+        )
+
+
+def clear(db: Session):
+    db.execute(delete(ExpenseSheetRow))
+
+
+def verify(ws, rows_by_id: Dict[int, int]) -> Dict[int, int]:
+    """Confirma con una sola lectura (celdas de ID puntuales) que el índice sigue vigente."""
+    from app.services.sheets_service import EXPENSE_ID_COL
+    if not rows_by_id:
+        return {}
+    col = chr(ord("A") + EXPENSE_ID_COL - 1)
+    items = list(rows_by_id.items())
+    values = ws.batch_get([f"{col}{row}" for _, row in items])
+    verified = {}
+    for (eid, row), cell in zip(items, values):
+        found = cell[0][0] if cell and cell[0] else None
+        if parse_id(found) == eid:
+            verified[eid] = row
+    return verified
+
+
+def reconcile(db: Session, ws) -> dict:
+    """Reconstruye el índice desde la columna de IDs de la hoja."""
+    from app.services.sheets_service import EXPENSE_ID_COL
+    ids = ws.col_values(EXPENSE_ID_COL)
+    rows_by_id: Dict[int, int] = {}
+    without_id = 0
+    for row, value in enumerate(ids[1:], start=2):
+        eid = parse_id(value)
+        if eid is None:
+            without_id += 1
+        else:
+            rows_by_id[eid] = row # Si un ID se repite gana la fila más nueva
+    clear(db)
+    if rows_by_id:
+        db.execute(insert(ExpenseSheetRow), [
+            {"expense_id": eid, "sheet_row": row} for eid, row in rows_by_id.items()
+        ])
+    print(f"DEBUG [SHEET INDEX] Reconciled {len(rows_by_id)} rows ({without_id} without ID).")
+    return {"indexed": len(rows_by_id), "without_id": without_id}
+
+
+def reconcile_from_sheet(db: Session) -> Optional[dict]:
+    """Abre 'Gastos', reconstruye el índice y confirma. None si no hay acceso a Sheets."""
+    import gspread
+    from app.services.sheets_service import get_sheet
+    sheet = get_sheet()
+    if not sheet:
+        return None
+    try:
+        ws = sheet.worksheet("Gastos")
+    except gspread.WorksheetNotFound:
+        clear(db)
+        db.commit()
+        return {"indexed": 0, "without_id": 0}
+    ensure_id_column(ws)
+    result = reconcile(db, ws)
+    db.commit()
+    return result
@@ -0,0 +1,179 @@
+"""
+Cliente de Google Sheets compartido por todo el proceso.
+
+Antes cada llamada a get_sheet() parseaba las credenciales, autorizaba y abría el
+spreadsheet (2+ idas a Google), y cada sheet.worksheet(título) volvía a pedir la
+metadata. Aquí se autoriza una sola vez: la sesión de gspread (google-auth) renueva
+el token sola cuando expira. Los Spreadsheet y Worksheet se guardan por clave/título.
+
+Es seguro entre hilos (worker de la cola, BackgroundTasks, requests): la creación de
+handles va bajo un lock. stats() muestra cuántas idas se ahorraron.
+"""
+import base64
+import json
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, Optional
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    import gspread # se importa recién al autorizar (get_client): pesa ~100 ms al arrancar
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+
+def load_credentials_dict() -> Optional[dict]:
+    """Credenciales del service account desde GOOGLE_SHEETS_CREDENTIALS_JSON (JSON o Base64)."""
+    creds_json = settings.GOOGLE_SHEETS_CREDENTIALS_JSON or os.getenv("GOOGLE_SHEETS_CREDENTIALS_JSON", "")
+    if not creds_json:
+        print("ERROR [SHEETS] No se encontraron credenciales en GOOGLE_SHEETS_CREDENTIALS_JSON")
+        return None
+
+    creds_json = creds_json.strip()
+    if creds_json.startswith("'") or creds_json.startswith('"'):
+        creds_json = creds_json[1:-1]
+
+    # Try Base64 decoding (Robust way for Cloud Env)
+    try:
+        if not creds_json.strip().startswith('{'):
+            decoded = base64.b64decode(creds_json).decode('utf-8')
+            if decoded.strip().startswith('{'):
+                creds_json = decoded
+                print("DEBUG [SHEETS] Base64 credentials detected and decoded.")
+    except Exception:
+        pass # Not base64, continue normal flow
+
+    creds_dict = json.loads(creds_json)
+
+    # FIX: Handle escaped newlines in private_key (common in Railway/Heroku)
+    if "private_key" in creds_dict:
+        creds_dict["private_key"] = creds_dict["private_key"].replace("\\n", "\n")
+    return creds_dict
+
+
+class CachedSpreadsheet:
+    """
+    Envuelve un gspread.Spreadsheet y cachea sus Worksheet por título.
+    Todo lo demás (batch_update, id, ...) se delega al spreadsheet real.
+    """
+
+    def __init__(self, manager: "SheetsClientManager", spreadsheet: "gspread.Spreadsheet"):
+        self._manager = manager
+        self._spreadsheet = spreadsheet
+        self._worksheets: Dict[str, "gspread.Worksheet"] = {}
+
+    def __getattr__(self, name):
+        return getattr(self._spreadsheet, name)
+
+    def worksheet(self, title: str) -> "gspread.Worksheet":
+        with self._manager._lock:
+            ws = self._worksheets.get(title)
+            if ws is not None:
+                self._manager._count("worksheet_hits")
+                return ws
+        # Fuera del lock: la ida a Google no bloquea a otros hilos. WorksheetNotFound no se cachea.
+        ws = self._spreadsheet.worksheet(title)
+        self._manager._count("worksheet_fetches")
+        with self._manager._lock:
+            return self._worksheets.setdefault(title, ws)
+
+    def add_worksheet(self, title: str, rows: int, cols: int, **kwargs) -> "gspread.Worksheet":
+        ws = self._spreadsheet.add_worksheet(title=title, rows=rows, cols=cols, **kwargs)
+        with self._manager._lock:
+            self._worksheets[title] = ws
+        return ws
+
+    def del_worksheet(self, worksheet):
+        self._spreadsheet.del_worksheet(worksheet)
+        self.forget(worksheet.title)
+
+    def forget(self, title: Optional[str] = None):
+        """Descarta el handle de una hoja (o de todas) para volver a pedirlo a Google."""
+        with self._manager._lock:
+            if title is None:
+                self._worksheets.clear()
+            else:
+                self._worksheets.pop(title, None)
+
+
+class SheetsClientManager:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._client: Optional["gspread.Client"] = None
+        self._spreadsheets: Dict[str, CachedSpreadsheet] = {}
+        self._stats: Dict[str, int] = {
+            "auth_calls": 0, "auth_hits": 0,
+            "open_calls": 0, "open_hits": 0,
+            "worksheet_fetches": 0, "worksheet_hits": 0,
+        }
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def get_client(self) -> Optional["gspread.Client"]:
+        with self._lock:
+            if self._client is not None:
+                self._stats["auth_hits"] += 1
+                return self._client
+            creds_dict = load_credentials_dict()
+            if not creds_dict:
+                return None
+            import gspread
+            from oauth2client.service_account import ServiceAccountCredentials
+            creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, SCOPE)
+            self._client = gspread.authorize(creds)
+            self._stats["auth_calls"] += 1
+            return self._client
+
+    def open(self, key: Optional[str] = None) -> Optional[CachedSpreadsheet]:
+        key = key or settings.GOOGLE_SHEET_ID
+        with self._lock:
+            cached = self._spreadsheets.get(key)
+            if cached is not None:
+                self._stats["open_hits"] += 1
+                return cached
+            client = self.get_client()
+            if client is None:
+                return None
+            cached = CachedSpreadsheet(self, client.open_by_key(key))
+            self._spreadsheets[key] = cached
+            self._stats["open_calls"] += 1
+            return cached
+
+    def forget_worksheets(self):
+        """Tras un error de la API los handles pueden estar obsoletos (hoja renombrada/borrada)."""
+        with self._lock:
+            spreadsheets = list(self._spreadsheets.values())
+        for s in spreadsheets:
+            s.forget()
+
+    def reset(self):
+        """Descarta cliente y handles; la próxima llamada vuelve a autorizar."""
+        with self._lock:
+            self._client = None
+            self._spreadsheets.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            s = dict(self._stats)
+        # Cada hit es una ida a Google que no se hizo
+        s["auth_round_trips_saved"] = s["auth_hits"]
+        s["metadata_round_trips_saved"] = s["open_hits"] + s["worksheet_hits"]
+        return s
+
+
+manager = SheetsClientManager()
+
+
+def get_client() -> Optional["gspread.Client"]:
+    return manager.get_client()
+
+
+def open_spreadsheet(key: Optional[str] = None) -> Optional[CachedSpreadsheet]:
+    return manager.open(key)
+
+
+def stats() -> Dict[str, int]:
+    return manager.stats()
@@ -0,0 +1,626 @@
+"""
+Cola durable de escrituras hacia Google Sheets (write-behind).
+
+Los endpoints ya no llaman a Google en la request: encolan la mutación en
+`sheets_outbox` dentro de la misma transacción que el cambio en la base de datos
+(queue_*). Un worker en segundo plano toma los pendientes, fusiona las operaciones
+sobre la misma entidad y los envía agrupados por hoja: una lectura como máximo,
+`batch_update` para las ediciones, un único `batchUpdate` estructural para los
+borrados y `append_rows` para las filas nuevas.
+
+Errores: 429 pausa al worker (respeta Retry-After) sin gastar intentos; otros
+errores se reintentan con backoff exponencial hasta SHEETS_OUTBOX_MAX_ATTEMPTS y
+luego quedan en estado 'failed' para revisión manual. Lo que viene después de una
+escritura ya hecha (índice local de filas) no puede hacer fallar el lote: reintentarlo
+duplicaría los append; el índice se repara con un reconcile.
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, update, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.sync import SheetsOutbox
+
+# Operaciones por hoja
+EXPENSE_OPS = {"expense_append", "expense_update", "expense_delete", "expenses_clear", "expense_ids_rewrite"}
+COMMITMENT_OPS = {"commitment_upsert", "commitment_delete"}
+CATEGORY_OPS = {"category_add", "category_update", "category_delete"}
+CONFIG_OPS = {"budget_update"}
+
+# Un worker que murió con filas tomadas las libera pasado este tiempo
+STALE_CLAIM = timedelta(minutes=5)
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 15 * 60
+
+
+class PermanentError(Exception):
+    """Error que no se arregla reintentando (rango inválido, permisos...)"""
+
+
+def sheets_configured() -> bool:
+    return bool(settings.GOOGLE_SHEETS_CREDENTIALS_JSON or os.getenv("GOOGLE_SHEETS_CREDENTIALS_JSON"))
+
+
+# --- Encolado (request path) ---
+
+def enqueue(db: Session, op: str, payload: dict, entity_key: Optional[str] = None):
+    """Agrega una mutación a la cola. Se confirma con el commit del llamador."""
+    if not sheets_configured():
+        return None
+    item = SheetsOutbox(
+        op=op,
+        entity_key=entity_key,
+        payload=json.dumps(payload, default=str),
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(item)
+    db.info["sheets_outbox_dirty"] = True
+    return item
+
+
+def queue_expense_append(db: Session, expense, tech_name: str, section=None):
+    from app.services.sheets_service import build_expense_row
+    key = f"expense:{expense.id}" if getattr(expense, "id", None) else None
+    enqueue(db, "expense_append", {"row": build_expense_row(expense, tech_name, section)}, key)
+
+
+def queue_expense_update(db: Session, expense_id: int, old_data: dict, new_data: dict, tech_name: str):
+    from app.services.sheets_service import build_expense_row, expense_match_key
+    enqueue(db, "expense_update", {
+        "match": list(expense_match_key(old_data, tech_name)),
+        "row": build_expense_row({**new_data, "id": expense_id}, tech_name),
+    }, f"expense:{expense_id}")
+
+
+def queue_expense_delete(db: Session, expense_id: int, expense_data: dict, tech_name: str):
+    from app.services.sheets_service import expense_match_key
+    enqueue(db, "expense_delete", {"match": list(expense_match_key(expense_data, tech_name))}, f"expense:{expense_id}")
+
+
+def queue_expenses_clear(db: Session):
+    enqueue(db, "expenses_clear", {})
+
+
+def queue_commitment_upsert(db: Session, commitment, user_name: str):
+    from app.services.sheets_service import build_commitment_row
+    enqueue(db, "commitment_upsert", {"id": commitment.id, "row": build_commitment_row(commitment, user_name)},
+            f"commitment:{commitment.id}")
+
+
+def queue_commitment_delete(db: Session, commitment_id: int):
+    enqueue(db, "commitment_delete", {"id": commitment_id}, f"commitment:{commitment_id}")
+
+
+def queue_category_add(db: Session, section: str, category: str, budget: int = 0):
+    enqueue(db, "category_add", {"section": section, "category": category, "budget": budget})
+
+
+def queue_category_update(db: Session, section: str, category: str, new_budget: int, new_cat: str = None):
+    enqueue(db, "category_update", {"section": section, "category": category, "budget": new_budget, "new_category": new_cat})
+
+
+def queue_category_delete(db: Session, section: str, category: str):
+    enqueue(db, "category_delete", {"section": section, "category": category})
+
+
+def queue_budget_update(db: Session, new_budget: int):
+    enqueue(db, "budget_update", {"budget": new_budget})
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop("sheets_outbox_dirty", False):
+        _wake.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop("sheets_outbox_dirty", None)
+
+
+# --- Fusión de operaciones ---
+
+def coalesce_expense_ops(items: List[dict]) -> List[dict]:
+    """
+    Fusiona operaciones sobre el mismo gasto (entity_key), respetando el orden:
+    append+update -> append con la fila final, append+delete -> nada,
+    update+update -> un update (match original, fila final), update+delete -> delete.
+    Un 'expenses_clear' descarta todo lo anterior.
+    """
+    last_clear = max((i for i, it in enumerate(items) if it["op"] == "expenses_clear"), default=-1)
+    result: List[dict] = [items[last_clear]] if last_clear >= 0 else []
+    by_key: Dict[str, dict] = {}
+
+    for it in items[last_clear + 1:]:
+        key = it.get("entity_key")
+        prev = by_key.get(key) if key else None
+        op, p = it["op"], it["payload"]
+
+        if prev is None:
+            merged = {"op": op, "entity_key": key, "payload": dict(p)}
+            result.append(merged)
+            if key:
+                by_key[key] = merged
+            continue
+
+        prev_op, prev_p = prev["op"], prev["payload"]
+        if op == "expense_update":
+            if prev_op in ("expense_append", "expense_update"):
+                prev_p["row"] = p["row"]
+            # update sobre un gasto ya borrado: se ignora
+        elif op == "expense_delete":
+            if prev_op == "expense_append":
+                result.remove(prev)
+                del by_key[key]
+            elif prev_op == "expense_update":
+                prev["op"] = "expense_delete"
+                prev["payload"] = {"match": prev_p["match"]}
+        else:
+            # Un nuevo append con la misma clave no debería ocurrir; se encola tal cual
+            merged = {"op": op, "entity_key": key, "payload": dict(p)}
+            result.append(merged)
+            by_key[key] = merged
+    return result
+
+
+def coalesce_commitment_ops(items: List[dict]) -> List[dict]:
+    """Por compromiso gana la última operación (upsert o delete)."""
+    latest: Dict[str, dict] = {}
+    for it in items:
+        latest.pop(it["entity_key"], None)
+        latest[it["entity_key"]] = it
+    return list(latest.values())
+
+
+# --- Envío a Sheets (una ida por hoja) ---
+
+def _delete_rows_request(ws, rows):
+    """Requests de deleteDimension, de abajo hacia arriba para no correr índices."""
+    return [
+        {"deleteDimension": {"range": {
+            "sheetId": ws.id, "dimension": "ROWS", "startIndex": r - 1, "endIndex": r
+        }}}
+        for r in sorted(set(rows), reverse=True)
+    ]
+
+
+def _apply_worksheet_changes(sheet, ws, updates, deletes, appends):
+    """Retorna la respuesta de append_rows (trae el rango donde quedaron las filas)."""
+    if updates:
+        ws.batch_update(updates)
+    if deletes:
+        sheet.batch_update({"requests": _delete_rows_request(ws, deletes)})
+    if appends:
+        return ws.append_rows(appends)
+    return None
+
+
+def _expense_id(op: dict) -> Optional[int]:
+    key = op.get("entity_key") or ""
+    return int(key.split(":", 1)[1]) if key.startswith("expense:") else None
+
+
+def flush_expenses(db: Session, sheet, items: List[dict]):
+    """
+    Ediciones y borrados van a la fila del índice local (sheet_index), verificada con una
+    lectura puntual de las celdas de ID. Solo las filas antiguas sin ID caen al escaneo
+    completo por fecha+concepto+monto.
+
+    Retorna la actualización del índice posterior a la escritura, para que process_batch
+    la corra después de dar el lote por enviado (ver _index_after_write).
+    """
+    from app.services import sheet_index
+    from app.services.sheets_service import (
+        EXPENSE_HEADERS, EXPENSE_ID_COL, get_or_create_worksheet, find_expense_row
+    )
+    ops = coalesce_expense_ops(items)
+    if not ops:
+        return
+    ws = get_or_create_worksheet(sheet, "Gastos", EXPENSE_HEADERS)
+    sheet_index.ensure_id_column(ws)
+
+    if ops[0]["op"] == "expenses_clear":
+        ws.clear()
+        ws.append_row(EXPENSE_HEADERS)
+        sheet_index.clear(db)
+        ops = ops[1:]
+
+    id_col = chr(ord("A") + EXPENSE_ID_COL - 1)
+    for o in [o for o in ops if o["op"] == "expense_ids_rewrite"]:
+        ids_by_row = {int(r): eid for r, eid in o["payload"]["ids_by_row"].items()}
+        first, last = min(ids_by_row), max(ids_by_row)
+        ws.update(f"{id_col}{first}:{id_col}{last}", [[ids_by_row.get(r, "")] for r in range(first, last + 1)])
+        sheet_index.set_rows(db, {eid: r for r, eid in ids_by_row.items()})
+    ops = [o for o in ops if o["op"] != "expense_ids_rewrite"]
+
+    targets = [o for o in ops if o["op"] in ("expense_update", "expense_delete")]
+    rows_by_id = sheet_index.verify(ws, sheet_index.get_rows(db, filter(None, map(_expense_id, targets))))
+    if any(_expense_id(o) not in rows_by_id for o in targets):
+        # Índice incompleto o desactualizado (edición manual): se reconstruye desde la columna de IDs
+        sheet_index.reconcile(db, ws)
+        rows_by_id = sheet_index.get_rows(db, filter(None, map(_expense_id, targets)))
+
+    all_values = None
+    used = set(rows_by_id.values())
+    updates, deletes, appends, appended_ids = [], [], [], []
+    for o in ops:
+        p = o["payload"]
+        if o["op"] == "expense_append":
+            appends.append(p["row"])
+            appended_ids.append(_expense_id(o))
+            continue
+
+        row_num = rows_by_id.get(_expense_id(o), -1)
+        if row_num == -1:
+            # Fila antigua sin ID: búsqueda por campos (una sola descarga por lote)
+            if all_values is None:
+                all_values = ws.get_all_values()
+            row_num = find_expense_row(all_values, p["match"], exclude=used)
+            if row_num == -1:
+                print(f"DEBUG [SHEETS OUTBOX] No matching expense row for {o['op']} {o.get('entity_key')}")
+                continue
+            used.add(row_num)
+        if o["op"] == "expense_update":
+            updates.append({"range": f"A{row_num}:{id_col}{row_num}", "values": [p["row"]]})
+        else:
+            deletes.append(row_num)
+
+    response = _apply_worksheet_changes(sheet, ws, updates, deletes, appends)
+
+    def update_index(db: Session):
+        # Filas antiguas que recibieron su ID en esta edición
+        sheet_index.set_rows(db, {
+            sheet_index.parse_id(u["values"][0][EXPENSE_ID_COL - 1]): int(u["range"].split(":")[0][1:])
+            for u in updates if sheet_index.parse_id(u["values"][0][EXPENSE_ID_COL - 1])
+        })
+        if deletes:
+            sheet_index.record_deleted(db, deletes)
+        if appends and not sheet_index.record_appended(db, response, appended_ids):
+            sheet_index.reconcile(db, ws)
+
+    return update_index
+
+
+def flush_commitments(db: Session, sheet, items: List[dict]):
+    from app.services.sheets_service import COMMITMENT_HEADERS, get_or_create_worksheet
+    ops = coalesce_commitment_ops(items)
+    ws = get_or_create_worksheet(sheet, "Compromisos", COMMITMENT_HEADERS)
+    ids = ws.col_values(1)
+    row_by_id = {str(v).strip(): i + 1 for i, v in enumerate(ids) if i > 0}
+
+    updates, deletes, appends = [], [], []
+    for o in ops:
+        p = o["payload"]
+        row_num = row_by_id.get(str(p["id"]))
+        if o["op"] == "commitment_upsert":
+            if row_num:
+                updates.append({"range": f"A{row_num}:I{row_num}", "values": [p["row"]]})
+            else:
+                appends.append(p["row"])
+        elif row_num:
+            deletes.append(row_num)
+
+    _apply_worksheet_changes(sheet, ws, updates, deletes, appends)
+
+
+def _find_col(headers, names):
+    for c in names:
+        if c in headers:
+            return headers.index(c)
+    return -1
+
+
+def flush_categories(db: Session, sheet, items: List[dict]):
+    """
+    Aplica las operaciones en orden sobre una copia en memoria de 'Presupuesto'
+    y envía solo el resultado. Los renombres se propagan a 'Gastos' al final.
+    """
+    import gspread
+    from app.services.sheets_service import rename_category_in_expenses_sheet
+
+    try:
+        ws = sheet.worksheet("Presupuesto")
+    except gspread.WorksheetNotFound:
+        ws = sheet.add_worksheet(title="Presupuesto", rows=100, cols=3)
+        ws.append_row(["Sección", "Categoría", "Presupuesto"])
+
+    only_adds = all(it["op"] == "category_add" for it in items)
+    all_rows = [] if only_adds else ws.get_all_values()
+    headers = [h.strip().lower() for h in all_rows[0]] if all_rows else ["sección", "categoría", "presupuesto"]
+    sec_col = _find_col(headers, ["sección", "seccion", "section"])
+    cat_col = _find_col(headers, ["categoría", "categoria", "category"])
+    bud_col = _find_col(headers, ["presupuesto", "budget"])
+    if min(sec_col, cat_col, bud_col) == -1:
+        raise PermanentError(f"'Presupuesto' columns not found (sec={sec_col}, cat={cat_col}, bud={bud_col})")
+    width = max(len(headers), sec_col + 1, cat_col + 1, bud_col + 1)
+
+    # entries: {"row": int|None (1-based en la hoja), "values": [...], "dirty": bool, "deleted": bool}
+    entries = [
+        {"row": i, "values": list(r) + [""] * (width - len(r)), "dirty": False, "deleted": False}
+        for i, r in enumerate(all_rows[1:], start=2)
+    ]
+    renames = []
+
+    def find(section, category):
+        target = (section.strip().lower(), category.strip().lower())
+        for e in entries:
+            v = e["values"]
+            if not e["deleted"] and (str(v[sec_col]).strip().lower(), str(v[cat_col]).strip().lower()) == target:
+                return e
+        return None
+
+    for it in items:
+        p = it["payload"]
+        if it["op"] == "category_add":
+            values = [""] * width
+            values[sec_col], values[cat_col], values[bud_col] = p["section"], p["category"], p.get("budget", 0)
+            entries.append({"row": None, "values": values, "dirty": True, "deleted": False})
+        elif it["op"] == "category_delete":
+            e = find(p["section"], p["category"])
+            if e:
+                e["deleted"] = True
+        else:
+            e = find(p["section"], p["category"])
+            if not e:
+                print(f"DEBUG [SHEETS OUTBOX] Category {p['section']}/{p['category']} not found for update")
+                continue
+            e["values"][bud_col] = p["budget"]
+            new_cat = str(p["new_category"]).strip() if p.get("new_category") else None
+            if new_cat and new_cat.lower() != p["category"].strip().lower():
+                e["values"][cat_col] = new_cat
+                renames.append((p["section"], p["category"], new_cat))
+            e["dirty"] = True
+
+    updates, deletes, appends = [], [], []
+    for e in entries:
+        if e["row"] is None:
+            if not e["deleted"]:
+                appends.append(e["values"])
+        elif e["deleted"]:
+            deletes.append(e["row"])
+        elif e["dirty"]:
+            updates.append({"range": f"A{e['row']}", "values": [e["values"]]})
+
+    _apply_worksheet_changes(sheet, ws, updates, deletes, appends)
+
+    for section, old_cat, new_cat in renames:
+        rename_category_in_expenses_sheet(sheet, section, old_cat, new_cat)
+
+
+def flush_config(db: Session, sheet, items: List[dict]):
+    from app.services.sheets_service import update_monthly_budget
+    # Solo importa el último valor
+    update_monthly_budget(items[-1]["payload"]["budget"])
+
+
+FLUSHERS = [
+    (EXPENSE_OPS, flush_expenses),
+    (COMMITMENT_OPS, flush_commitments),
+    (CATEGORY_OPS, flush_categories),
+    (CONFIG_OPS, flush_config),
+]
+
+
+# --- Worker ---
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_paused_until = 0.0
+_reconcile_requested = False
+
+
+def _retry_after(error) -> Optional[float]:
+    """Segundos de espera si el error es un 429 de la API de Google; None si no."""
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) != 429:
+        return None
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return 60.0
+
+
+def _is_permanent(error) -> bool:
+    if isinstance(error, PermanentError):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+def _backoff_seconds(attempts: int) -> float:
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_batch(db: Session, limit: int) -> List[SheetsOutbox]:
+    """Toma hasta `limit` filas vencidas; seguro con varios workers (UPDATE condicional)."""
+    now = datetime.utcnow()
+    db.execute(
+        update(SheetsOutbox)
+        .where(SheetsOutbox.status == "processing", SheetsOutbox.claimed_at < now - STALE_CLAIM)
+        .values(status="pending", claim=None)
+    )
+    ids = [r[0] for r in db.query(SheetsOutbox.id).filter(
+        SheetsOutbox.status == "pending",
+        or_(SheetsOutbox.next_attempt_at.is_(None), SheetsOutbox.next_attempt_at <= now),
+    ).order_by(SheetsOutbox.id).limit(limit).all()]
+    if not ids:
+        db.commit()
+        return []
+
+    token = uuid.uuid4().hex
+    db.execute(
+        update(SheetsOutbox)
+        .where(SheetsOutbox.id.in_(ids), SheetsOutbox.status == "pending")
+        .values(status="processing", claim=token, claimed_at=now)
+    )
+    db.commit()
+    return db.query(SheetsOutbox).filter(SheetsOutbox.claim == token).order_by(SheetsOutbox.id).all()
+
+
+def _finish(db: Session, rows: List[SheetsOutbox], error: Exception = None):
+    if error is None:
+        for row in rows:
+            db.delete(row)
+        return
+
+    retry_after = _retry_after(error)
+    now = datetime.utcnow()
+    for row in rows:
+        row.claim = None
+        row.last_error = str(error)[:1000]
+        if retry_after is not None:
+            # La cuota no es culpa de la operación: no consume intentos
+            row.status = "pending"
+            row.next_attempt_at = now + timedelta(seconds=retry_after)
+            continue
+        row.attempts = (row.attempts or 0) + 1
+        if _is_permanent(error) or row.attempts >= settings.SHEETS_OUTBOX_MAX_ATTEMPTS:
+            row.status = "failed"
+        else:
+            row.status = "pending"
+            row.next_attempt_at = now + timedelta(seconds=_backoff_seconds(row.attempts))
+
+
+def _index_after_write(db: Session, update_index, name: str):
+    """
+    Bookkeeping del índice local una vez que las filas ya están en Sheets y el lote
+    quedó confirmado como enviado. Si falla no se reintenta el lote (el append se
+    duplicaría en la hoja): se descarta y se pide un reconcile en la próxima vuelta.
+    """
+    global _reconcile_requested
+    try:
+        update_index(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        _reconcile_requested = True
+        print(f"ERROR [SHEETS OUTBOX] {name}: index update failed, reconcile scheduled: {e}")
+
+
+def process_batch(db: Session, limit: Optional[int] = None) -> int:
+    """Procesa un lote de la cola. Retorna cuántas filas se tomaron."""
+    global _paused_until
+    from app.services import sheets_client
+    from app.services.sheets_service import get_sheet
+
+    rows = claim_batch(db, limit or settings.SHEETS_OUTBOX_BATCH_SIZE)
+    if not rows:
+        return 0
+
+    sheet = get_sheet()
+    for ops, flusher in FLUSHERS:
+        group = [r for r in rows if r.op in ops]
+        if not group:
+            continue
+        items = [{"op": r.op, "entity_key": r.entity_key, "payload": json.loads(r.payload)} for r in group]
+        update_index = None
+        try:
+            if sheet is None:
+                raise RuntimeError("Could not open the spreadsheet")
+            update_index = flusher(db, sheet, items)
+            _finish(db, group)
+            print(f"DEBUG [SHEETS OUTBOX] {flusher.__name__}: {len(group)} ops flushed.")
+        except Exception as e:
+            # Descarta cambios a medias del índice; se repara con reconcile()
+            db.rollback()
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                _paused_until = time.monotonic() + retry_after
+            else:
+                # El handle cacheado puede estar obsoleto (hoja borrada o renombrada)
+                sheets_client.manager.forget_worksheets()
+            print(f"ERROR [SHEETS OUTBOX] {flusher.__name__} failed: {e}")
+            _finish(db, group, e)
+        db.commit()
+        if update_index is not None:
+            _index_after_write(db, update_index, flusher.__name__)
+
+    unknown = [r for r in rows if not any(r.op in ops for ops, _ in FLUSHERS)]
+    if unknown:
+        _finish(db, unknown, PermanentError("Unknown outbox op"))
+        db.commit()
+    return len(rows)
+
+
+def _reconcile_if_due(last: float) -> float:
+    """
+    Reconstruye periódicamente el índice de filas de 'Gastos' (ediciones manuales), o
+    antes si un lote enviado no pudo actualizarlo (_index_after_write).
+    """
+    global _reconcile_requested
+    from app.database import SessionLocal
+    from app.services import sheet_index
+    interval = settings.SHEETS_INDEX_RECONCILE_MINUTES * 60
+    due = interval and time.monotonic() - last >= interval
+    if not sheets_configured() or not (due or _reconcile_requested):
+        return last
+    _reconcile_requested = False
+    db = SessionLocal()
+    try:
+        sheet_index.reconcile_from_sheet(db)
+    except Exception as e:
+        print(f"ERROR [SHEETS OUTBOX] Index reconcile failed: {e}")
+        _reconcile_requested = True
+        db.rollback()
+    finally:
+        db.close()
+    return time.monotonic()
+
+
+def _run():
+    from app.database import SessionLocal
+    last_reconcile = 0.0
+    while not _stop.is_set():
+        _wake.wait(settings.SHEETS_OUTBOX_POLL_SECONDS)
+        if _stop.is_set():
+            break
+        if _wake.is_set():
+            _wake.clear()
+            # Ventana corta para juntar ráfagas (varios gastos seguidos) en un solo envío
+            _stop.wait(settings.SHEETS_OUTBOX_COALESCE_SECONDS)
+
+        pause = _paused_until - time.monotonic()
+        if pause > 0:
+            _stop.wait(pause)
+            continue
+
+        last_reconcile = _reconcile_if_due(last_reconcile)
+
+        db = SessionLocal()
+        try:
+            while not _stop.is_set() and process_batch(db) and _paused_until <= time.monotonic():
+                pass
+        except Exception as e:
+            print(f"ERROR [SHEETS OUTBOX] Worker iteration failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+
+def start_worker():
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="sheets-outbox", daemon=True)
+    _thread.start()
+    print("DEBUG [SHEETS OUTBOX] Worker started.")
+
+
+def stop_worker(timeout: float = 5.0):
+    _stop.set()
+    _wake.set()
+    if _thread:
+        _thread.join(timeout)
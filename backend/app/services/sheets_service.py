@@ -1,49 +1,14 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from app.core.config import settings
+from app.services import sheets_client
 from datetime import date
-import json
 
 def get_sheet():
+    """Spreadsheet de finanzas (cliente y handles cacheados, ver sheets_client.py)."""
     try:
-        creds_json = settings.GOOGLE_SHEETS_CREDENTIALS_JSON
-        if not creds_json:
-            import os
-            creds_json = os.getenv("GOOGLE_SHEETS_CREDENTIALS_JSON", "")
-            
-        if not creds_json:
-            print("ERROR [SHEETS] No se encontraron credenciales en GOOGLE_SHEETS_CREDENTIALS_JSON")
-            return None
-        
-        creds_json = creds_json.strip()
-        if creds_json.startswith("'") or creds_json.startswith('"'):
-            creds_json = creds_json[1:-1]
-        
-        # Try Base64 decoding (Robust way for Cloud Env)
-        import base64
-        import binascii
-        try:
-            # Check if it looks like base64 (no { at start)
-            if not creds_json.strip().startswith('{'):
-                decoded = base64.b64decode(creds_json).decode('utf-8')
-                if decoded.strip().startswith('{'):
-                    creds_json = decoded
-                    print("DEBUG [SHEETS] Base64 credentials detected and decoded.")
-        except Exception:
-            pass # Not base64, continue normal flow
-        
-        creds_dict = json.loads(creds_json)
-        
-        # FIX: Handle escaped newlines in private_key (common in Railway/Heroku)
-        if "private_key" in creds_dict:
-            creds_dict["private_key"] = creds_dict["private_key"].replace("\\n", "\n")
-
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        client = gspread.authorize(creds)
-        return client.open_by_key(settings.GOOGLE_SHEET_ID)
+        return sheets_client.open_spreadsheet(settings.GOOGLE_SHEET_ID)
     except Exception as e:
         print(f"ERROR [SHEETS] Falló la autenticación: {e}")
+        sheets_client.manager.reset()
         return None
 
 def normalize_sheet_date(date_val):
@@ -67,34 +32,86 @@ def normalize_amount(amt_val):
 
 
 
+EXPENSE_HEADERS = ["Fecha", "Concepto", "Sección", "Categoría", "Monto", "Método Pago", "Usuario", "Imagen URL", "ID"]
+EXPENSE_ID_COL = 9 # Columna I: Expense.id local (índice en sheet_index.py)
+COMMITMENT_HEADERS = ["ID", "Fecha Creación", "Título", "Tipo", "Monto Total", "Monto Pagado", "Vencimiento", "Estado", "Usuario"]
+
+def get_or_create_worksheet(sheet, title, headers):
+    """Returns the worksheet, creating it with its header row if missing."""
+    import gspread # diferido: solo se carga al hablar con Sheets
+    try:
+        return sheet.worksheet(title)
+    except gspread.WorksheetNotFound:
+        ws = sheet.add_worksheet(title=title, rows=1000, cols=len(headers))
+        ws.append_row(headers)
+        return ws
+
+def build_expense_row(expense, tech_name, section=None):
+    """Row for the 'Gastos' sheet (last column is the local Expense.id). Accepts SQLAlchemy objects or dicts."""
+    is_dict = isinstance(expense, dict)
+    get = (lambda k: expense.get(k)) if is_dict else (lambda k: getattr(expense, k, None))
+    return [
+        str(get("date")),
+        get("concept"),
+        section or get("section") or "OTROS",
+        get("category"),
+        get("amount"),
+        get("payment_method") or "N/A",
+        tech_name,
+        get("image_url") or "",
+        get("id") or ""
+    ]
+
+def build_commitment_row(commitment, user_name):
+    """Row for the 'Compromisos' sheet: ID, Created, Title, Type, Total, Paid, Due, Status, User"""
+    return [
+        str(commitment.id),
+        str(commitment.created_at.date()) if commitment.created_at else "",
+        commitment.title,
+        commitment.type, # DEBT / LOAN
+        commitment.total_amount,
+        commitment.paid_amount,
+        str(commitment.due_date) if commitment.due_date else "",
+        commitment.status,
+        user_name
+    ]
+
+def expense_match_key(expense_data: dict, tech_name: str):
+    """Fields used to find an expense in 'Gastos' (there are no IDs in the sheet)."""
+    return (
+        normalize_sheet_date(expense_data.get("date")),
+        str(expense_data.get("concept")).strip().lower(),
+        normalize_amount(expense_data.get("amount")),
+        str(tech_name).strip().lower()
+    )
+
+def find_expense_row(all_values, match, exclude=()):
+    """1-based row of the newest expense matching `match`, or -1. Rows in `exclude` are skipped."""
+    for i in range(len(all_values) - 1, 0, -1):
+        row = all_values[i]
+        if len(row) >= 7 and (i + 1) not in exclude:
+            r_match = (
+                normalize_sheet_date(row[0]),
+                str(row[1]).strip().lower(),
+                normalize_amount(row[4]),
+                str(row[6]).strip().lower()
+            )
+            if r_match == tuple(match):
+                return i + 1
+    return -1
+
 def sync_expense_to_sheet(expense, tech_name, section=None):
     """Appends an expense row to the 'Gastos' sheet."""
     # Support both SQLAlchemy objects and dictionaries (for background tasks)
-    is_dict = isinstance(expense, dict)
-    concept = expense["concept"] if is_dict else expense.concept
+    concept = expense["concept"] if isinstance(expense, dict) else expense.concept
     
     print(f"\n>>> [SHEETS START] Syncing expense {concept}...")
     try:
         sheet = get_sheet()
         if not sheet: return
 
-        try:
-            ws = sheet.worksheet("Gastos")
-        except gspread.WorksheetNotFound:
-            ws = sheet.add_worksheet(title="Gastos", rows=1000, cols=8)
-            ws.append_row(["Fecha", "Concepto", "Sección", "Categoría", "Monto", "Método Pago", "Usuario", "Imagen URL"])
-
-        new_row = [
-            str(expense["date"]) if is_dict else str(expense.date),
-            concept,
-            section or "OTROS",
-            expense["category"] if is_dict else expense.category,
-            expense["amount"] if is_dict else expense.amount,
-            (expense["payment_method"] or "N/A") if is_dict else (expense.payment_method or "N/A"),
-            tech_name,
-            (expense["image_url"] or "") if is_dict else (expense.image_url or "")
-        ]
-        ws.append_row(new_row)
+        ws = get_or_create_worksheet(sheet, "Gastos", EXPENSE_HEADERS)
+        ws.append_row(build_expense_row(expense, tech_name, section))
         print(f"DEBUG [SHEETS] Expense appended to 'Gastos'.")
     except Exception as e:
         print(f"ERROR [SHEETS] Expense sync failed: {e}")
@@ -205,6 +222,7 @@ def add_category_to_sheet(section: str, category: str, budget: int = 0):
     try:
         sheet = get_sheet()
         if not sheet: return False
+        import gspread
         
         try:
             ws = sheet.worksheet("Presupuesto")
@@ -371,25 +389,8 @@ def sync_commitment_to_sheet(commitment, user_name="Carlos"):
         sheet = get_sheet()
         if not sheet: return
 
-        try:
-            ws = sheet.worksheet("Compromisos")
-        except gspread.WorksheetNotFound:
-            ws = sheet.add_worksheet(title="Compromisos", rows=1000, cols=9)
-            ws.append_row(["ID", "Fecha Creación", "Título", "Tipo", "Monto Total", "Monto Pagado", "Vencimiento", "Estado", "Usuario"])
-
-        # Prepare row data
-        # ID, Created, Title, Type, Total, Paid, Due, Status, User
-        row_data = [
-            str(commitment.id),
-            str(commitment.created_at.date()) if commitment.created_at else "",
-            commitment.title,
-            commitment.type, # DEBT / LOAN
-            commitment.total_amount,
-            commitment.paid_amount,
-            str(commitment.due_date) if commitment.due_date else "",
-            commitment.status,
-            user_name
-        ]
+        ws = get_or_create_worksheet(sheet, "Compromisos", COMMITMENT_HEADERS)
+        row_data = build_commitment_row(commitment, user_name)
 
         # Find if ID exists (Column 1)
         found_cell = None
@@ -457,26 +458,7 @@ def delete_expense_from_sheet(expense_data: dict, tech_name: str):
         all_values = ws.get_all_values()
         if not all_values: return
 
-        target_date = normalize_sheet_date(expense_data.get("date"))
-        target_concept = str(expense_data.get("concept")).strip().lower()
-        target_amount = normalize_amount(expense_data.get("amount"))
-        target_user = str(tech_name).strip().lower()
-
-        found_row = -1
-        for i in range(len(all_values) - 1, 0, -1):
-            row = all_values[i]
-            if len(row) >= 7:
-                r_date = normalize_sheet_date(row[0])
-                r_concept = str(row[1]).strip().lower()
-                r_amount = normalize_amount(row[4])
-                r_user = str(row[6]).strip().lower()
-
-                if (r_date == target_date and 
-                    r_concept == target_concept and 
-                    r_amount == target_amount and 
-                    r_user == target_user):
-                    found_row = i + 1
-                    break
+        found_row = find_expense_row(all_values, expense_match_key(expense_data, tech_name))
         
         if found_row != -1:
             ws.delete_rows(found_row)
@@ -495,6 +477,7 @@ def update_monthly_budget(new_budget: int):
     try:
         sheet = get_sheet()
         if not sheet: return False
+        import gspread
 
         try:
             ws = sheet.worksheet("Config")
@@ -552,6 +535,30 @@ def get_categorization_rules():
         print(f"ERROR [SHEETS] Failed to fetch rules: {e}")
         return {}
 
+def expense_columns(header_row):
+    """Column index per field of the 'Gastos' header (-1 if missing). None without Fecha/Concepto."""
+    headers = [h.strip().lower() for h in header_row]
+    if "fecha" not in headers or "concepto" not in headers:
+        return None
+
+    def find(*names):
+        # The last alias present wins (same precedence as before)
+        idx = -1
+        for n in names:
+            if n in headers: idx = headers.index(n)
+        return idx
+
+    return {
+        "date": headers.index("fecha"),
+        "concept": headers.index("concepto"),
+        "category": find("categoría", "categoria", "category"),
+        "section": find("sección", "seccion"),
+        "amount": find("monto", "amount"),
+        "payment_method": find("método pago", "payment"),
+        "image_url": find("imagen url"),
+        "id": find("id"),
+    }
+
 def get_all_expenses_from_sheet():
     """
     Fetches all expenses from the 'Gastos' sheet to populate the local DB.
@@ -569,36 +576,13 @@ def get_all_expenses_from_sheet():
         all_rows = ws.get_all_values()
         if not all_rows: return []
         
-        headers = [h.strip().lower() for h in all_rows[0]]
-        
-        # Mappings
-        try:
-            col_date = headers.index("fecha")
-            col_concept = headers.index("concepto")
-            col_category = -1
-            if "categoría" in headers: col_category = headers.index("categoría")
-            if "categoria" in headers: col_category = headers.index("categoria")
-            if "category" in headers: col_category = headers.index("category")
-            
-            col_section = -1
-            if "sección" in headers: col_section = headers.index("sección")
-            if "seccion" in headers: col_section = headers.index("seccion")
-            
-            col_amount = -1
-            if "monto" in headers: col_amount = headers.index("monto")
-            if "amount" in headers: col_amount = headers.index("amount")
-            
-            col_method = -1
-            if "método pago" in headers: col_method = headers.index("método pago")
-            if "payment" in headers: col_method = headers.index("payment")
-            
-            col_img = -1
-            if "imagen url" in headers: col_img = headers.index("imagen url")
-        except ValueError:
-            return []
+        cols = expense_columns(all_rows[0])
+        if cols is None: return []
+        col_date, col_concept, col_category, col_section = cols["date"], cols["concept"], cols["category"], cols["section"]
+        col_amount, col_method, col_img, col_id = cols["amount"], cols["payment_method"], cols["image_url"], cols["id"]
 
         expenses = []
-        for row in all_rows[1:]:
+        for row_num, row in enumerate(all_rows[1:], start=2):
             try:
                 # Basic validation
                 if len(row) <= col_amount: continue
@@ -631,7 +615,9 @@ def get_all_expenses_from_sheet():
                     "section": row[col_section] if col_section != -1 else "OTROS",
                     "amount": final_amount,
                     "payment_method": row[col_method] if col_method != -1 else "N/A",
-                    "image_url": row[col_img] if col_img != -1 and len(row) > col_img else None
+                    "image_url": row[col_img] if col_img != -1 and len(row) > col_img else None,
+                    "sheet_id": row[col_id] if col_id != -1 and len(row) > col_id else None,
+                    "sheet_row": row_num
                 })
             except Exception as e:
                 # print(f"Skipping row error: {e}")
@@ -707,41 +693,11 @@ def update_expense_in_sheet(old_data: dict, new_data: dict, tech_name: str):
         all_values = ws.get_all_values()
         if not all_values: return False
 
-        # Match criteria
-        target_date = normalize_sheet_date(old_data.get("date"))
-        target_concept = str(old_data.get("concept")).strip().lower()
-        target_amount = normalize_amount(old_data.get("amount"))
-        target_user = str(tech_name).strip().lower()
-
-        found_row = -1
-        for i in range(len(all_values) - 1, 0, -1):
-            row = all_values[i]
-            if len(row) >= 7:
-                r_date = normalize_sheet_date(row[0])
-                r_concept = str(row[1]).strip().lower()
-                r_amount = normalize_amount(row[4])
-                r_user = str(row[6]).strip().lower()
-
-                if (r_date == target_date and 
-                    r_concept == target_concept and 
-                    r_amount == target_amount and 
-                    r_user == target_user):
-                    found_row = i + 1
-                    break
+        found_row = find_expense_row(all_values, expense_match_key(old_data, tech_name))
         
         if found_row != -1:
-            # Prepare new row
-            new_row = [
-                str(new_data.get("date")),
-                new_data.get("concept"),
-                new_data.get("section", "OTROS"),
-                new_data.get("category"),
-                new_data.get("amount"),
-                new_data.get("payment_method") or "N/A",
-                tech_name,
-                new_data.get("image_url") or ""
-            ]
-            cell_range = f"A{found_row}:H{found_row}"
+            new_row = build_expense_row(new_data, tech_name)
+            cell_range = f"A{found_row}:I{found_row}"
             ws.update(cell_range, [new_row])
             print(f"DEBUG [SHEETS] Updated expense row {found_row} in Sheets.")
             return True
@@ -761,12 +717,13 @@ def clear_expenses_sheet():
     try:
         sheet = get_sheet()
         if not sheet: return False
+        import gspread
         
         try:
             ws = sheet.worksheet("Gastos")
             ws.clear()
             # Re-add header
-            ws.append_row(["Fecha", "Concepto", "Sección", "Categoría", "Monto", "Método Pago", "Usuario", "Imagen URL"])
+            ws.append_row(EXPENSE_HEADERS)
             print("DEBUG [SHEETS] 'Gastos' sheet cleared and header restored.")
             return True
         except gspread.WorksheetNotFound:
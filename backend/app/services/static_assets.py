@@ -0,0 +1,124 @@
+"""
+Assets estáticos de la PWA con huella de contenido (ver scripts/build_static.py).
+
+dist/ contiene copias con el hash en el nombre y sus versiones .br/.gz: nunca cambian,
+así que se sirven con Cache-Control immutable y el navegador no vuelve a pedirlas.
+El HTML y sw.js, en cambio, se revalidan siempre (no-cache + ETag, 304 si no cambió):
+son los que apuntan a las versiones nuevas.
+
+Sin dist/assets.json (desarrollo local, sin build) el HTML queda tal cual y apunta
+a los archivos originales de /static.
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+STATIC_DIR = "app/static"
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST = "assets.json"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# /static/app.js?v=4.0.10 -> grupo 1: app.js
+_ASSET_REF = re.compile(r"/static/([\w.-]+\.(?:js|css))(?:\?v=[^\"']*)?")
+
+_lock = threading.Lock()
+_manifest: Optional[Dict[str, str]] = None
+_pages: Dict[str, Tuple[bytes, str]] = {}
+
+
+def manifest() -> Dict[str, str]:
+    global _manifest
+    with _lock:
+        if _manifest is None:
+            try:
+                with open(os.path.join(DIST_DIR, MANIFEST)) as f:
+                    _manifest = json.load(f)
+            except (FileNotFoundError, ValueError):
+                _manifest = {}
+        return _manifest
+
+
+def asset_url(name: str) -> str:
+    """URL pública del asset: la versión con huella si hay build, si no la original."""
+    return f"/static/{manifest().get(name, name)}"
+
+
+def _rewrite(html: str) -> str:
+    assets = manifest()
+    return _ASSET_REF.sub(lambda m: f"/static/{assets[m.group(1)]}" if m.group(1) in assets else m.group(0), html)
+
+
+def _render(filename: str) -> Tuple[bytes, str]:
+    with _lock:
+        cached = _pages.get(filename)
+    if cached is not None:
+        return cached
+    path = os.path.join(STATIC_DIR, filename)
+    with open(path, "rb") as f:
+        body = f.read()
+    if filename.endswith(".html"):
+        body = _rewrite(body.decode("utf-8")).encode("utf-8")
+    rendered = (body, f'"{hashlib.sha256(body).hexdigest()[:16]}"')
+    with _lock:
+        _pages[filename] = rendered
+    return rendered
+
+
+def revalidated_response(filename: str, request: Request) -> Response:
+    """HTML / sw.js: siempre se revalida, pero responde 304 sin cuerpo si no cambió."""
+    body, etag = _render(filename)
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE}
+    if etag in (request.headers.get("if-none-match") or ""):
+        return Response(status_code=304, headers=headers)
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def reload():
+    """Vuelve a leer dist/assets.json y el HTML (después de correr el build con la app arriba)."""
+    global _manifest
+    with _lock:
+        _manifest = None
+        _pages.clear()
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    Sirve dist/ con Cache-Control immutable y, si el cliente lo acepta, la versión
+    .br o .gz ya comprimida en el build (sin comprimir en cada request).
+    """
+
+    ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+    async def get_response(self, path: str, scope) -> Response:
+        accepted = Headers(scope=scope).get("accept-encoding", "")
+        response = None
+        for encoding, suffix in self.ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                response = await super().get_response(path + suffix, scope)
+            except HTTPException:
+                continue
+            response.headers["Content-Encoding"] = encoding
+            if response.status_code == 200:
+                response.headers["Content-Type"] = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            break
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
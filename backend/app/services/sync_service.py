@@ -0,0 +1,230 @@
+"""
+Sincronización incremental para la PWA ("cambios desde la versión N").
+
+Cada usuario tiene una versión monótona en `sync_versions`. Las escrituras ORM de
+gastos, categorías, presupuestos y compromisos se registran solas (evento after_flush),
+en la misma transacción. Las operaciones masivas (query.update / query.delete) no pasan
+por el flush: hay que llamar a record_changes() o mark_reset() explícitamente.
+
+La bitácora se poda (prune_change_log): se borran las entradas de más de
+CHANGE_LOG_RETENTION_DAYS y `sync_versions.min_version` guarda hasta qué versión se
+borró. Un cliente con `since` anterior a eso recibe un snapshot completo.
+"""
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, select, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional, Dict, List, Iterable
+from app.core.config import settings
+from app.models.finance import Expense, Commitment
+from app.models.budget import Budget, Category
+from app.models.sync import SyncVersion, ChangeLog
+
+# entidad (nombre en la API) -> modelo
+ENTITIES = {
+    "expense": Expense,
+    "category": Category,
+    "budget": Budget,
+    "commitment": Commitment,
+}
+_ENTITY_BY_MODEL = {model: name for name, model in ENTITIES.items()}
+
+# Columnas internas que no se envían al cliente
+_INTERNAL_COLUMNS = {"section_key", "name_key", "category_key"}
+
+RESET_ENTITY = "*"
+
+
+def _bump_version(connection, user_id: int) -> int:
+    """Incrementa y retorna la versión del usuario (UPDATE atómico, INSERT la primera vez)"""
+    table = SyncVersion.__table__
+    updated = connection.execute(
+        update(table).where(table.c.user_id == user_id).values(version=table.c.version + 1)
+    ).rowcount
+    if not updated:
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(table).values(user_id=user_id, version=1))
+        except IntegrityError:
+            # Otra transacción creó la fila primero
+            connection.execute(
+                update(table).where(table.c.user_id == user_id).values(version=table.c.version + 1)
+            )
+    return connection.execute(select(table.c.version).where(table.c.user_id == user_id)).scalar()
+
+
+def _write_changes(connection, user_id: int, entries: Iterable[tuple]):
+    """entries: (entity, entity_id, op). Todas comparten una versión nueva."""
+    entries = list(entries)
+    if not entries:
+        return
+    version = _bump_version(connection, user_id)
+    connection.execute(insert(ChangeLog.__table__), [
+        {"user_id": user_id, "version": version, "entity": entity, "entity_id": entity_id, "op": op}
+        for entity, entity_id, op in entries
+    ])
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    """Registra los objetos insertados/modificados/borrados en este flush"""
+    pending: Dict[int, Dict[tuple, str]] = {}
+
+    def collect(objects, op, only_modified=False):
+        for obj in objects:
+            entity = _ENTITY_BY_MODEL.get(type(obj))
+            if entity is None or obj.user_id is None:
+                continue
+            if only_modified and not session.is_modified(obj, include_collections=False):
+                continue
+            pending.setdefault(obj.user_id, {})[(entity, obj.id)] = op
+
+    collect(session.new, "upsert")
+    collect(session.dirty, "upsert", only_modified=True)
+    collect(session.deleted, "delete")
+
+    if not pending:
+        return
+    connection = session.connection()
+    for user_id, changes in pending.items():
+        _write_changes(connection, user_id, [(entity, entity_id, op) for (entity, entity_id), op in changes.items()])
+
+
+def record_changes(db: Session, user_id: int, entity: str, ids: Iterable[int], op: str = "upsert"):
+    """Registra cambios hechos con operaciones masivas (query.update/delete)"""
+    _write_changes(db.connection(), user_id, [(entity, entity_id, op) for entity_id in ids])
+
+
+def mark_reset(db: Session, user_id: Optional[int] = None):
+    """
+    Fuerza a los clientes a descargar un snapshot completo (borrados/importaciones masivas).
+    Sin user_id marca a todos los usuarios que ya tienen versión.
+    """
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = [row[0] for row in db.query(SyncVersion.user_id).all()]
+    connection = db.connection()
+    for uid in user_ids:
+        _write_changes(connection, uid, [(RESET_ENTITY, None, "reset")])
+
+
+def get_version(db: Session, user_id: int) -> int:
+    row = db.query(SyncVersion.version).filter(SyncVersion.user_id == user_id).first()
+    return row[0] if row else 0
+
+
+def prune_change_log(db: Session, older_than: datetime) -> int:
+    """
+    Borra, por usuario, las versiones registradas antes de `older_than` y sube su
+    min_version hasta la última borrada. Retorna filas borradas; el llamador confirma.
+    """
+    cutoffs = db.query(ChangeLog.user_id, func.max(ChangeLog.version)).filter(
+        ChangeLog.created_at < older_than
+    ).group_by(ChangeLog.user_id).all()
+    deleted = 0
+    for user_id, cutoff in cutoffs:
+        deleted += db.query(ChangeLog).filter(
+            ChangeLog.user_id == user_id, ChangeLog.version <= cutoff
+        ).delete(synchronize_session=False)
+        db.query(SyncVersion).filter(
+            SyncVersion.user_id == user_id, SyncVersion.min_version < cutoff
+        ).update({SyncVersion.min_version: cutoff}, synchronize_session=False)
+    return deleted
+
+
+def serialize(obj) -> Dict:
+    return {
+        attr.key: getattr(obj, attr.key)
+        for attr in obj.__mapper__.column_attrs
+        if attr.key not in _INTERNAL_COLUMNS
+    }
+
+
+def _snapshot(db: Session, user_id: int) -> Dict[str, Dict[str, List]]:
+    return {
+        entity: {"upserts": [serialize(o) for o in db.query(model).filter(model.user_id == user_id).all()], "deletes": []}
+        for entity, model in ENTITIES.items()
+    }
+
+
+def get_changes(db: Session, user_id: int, since: int = 0) -> Dict:
+    """
+    Cambios del usuario posteriores a `since`.
+    Retorna snapshot completo (full=True) si since=0, si el cliente viene de otra BD,
+    si su versión ya se podó de la bitácora o si hubo un reset después de ella.
+    """
+    row = db.query(SyncVersion.version, SyncVersion.min_version).filter(SyncVersion.user_id == user_id).first()
+    version, min_version = row if row else (0, 0)
+
+    needs_full = since <= 0 or since > version or since < min_version or db.query(ChangeLog.id).filter(
+        ChangeLog.user_id == user_id,
+        ChangeLog.version > since,
+        ChangeLog.op == "reset"
+    ).first() is not None
+
+    if needs_full:
+        return {"version": version, "full": True, "changes": _snapshot(db, user_id)}
+
+    rows = db.query(ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op).filter(
+        ChangeLog.user_id == user_id,
+        ChangeLog.version > since
+    ).order_by(ChangeLog.id).all()
+
+    # Solo importa la última operación de cada fila
+    latest: Dict[str, Dict[int, str]] = {}
+    for entity, entity_id, op in rows:
+        if entity in ENTITIES:
+            latest.setdefault(entity, {})[entity_id] = op
+
+    changes = {}
+    for entity, ops in latest.items():
+        model = ENTITIES[entity]
+        upsert_ids = [i for i, op in ops.items() if op == "upsert"]
+        found = db.query(model).filter(model.user_id == user_id, model.id.in_(upsert_ids)).all() if upsert_ids else []
+        found_ids = {o.id for o in found}
+        # Una fila actualizada y luego borrada en otra transacción llega como tombstone
+        deletes = [i for i, op in ops.items() if op == "delete" or i not in found_ids]
+        changes[entity] = {"upserts": [serialize(o) for o in found], "deletes": sorted(deletes)}
+
+    return {"version": version, "full": False, "changes": changes}
+
+
+# --- Retención (worker en segundo plano) ---
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _run_retention():
+    from app.database import SessionLocal
+    while not _stop.is_set():
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS)
+            deleted = prune_change_log(db, cutoff)
+            db.commit()
+            if deleted:
+                print(f"DEBUG [SYNC] Pruned {deleted} change_log rows older than {cutoff:%Y-%m-%d}.")
+        except Exception as e:
+            print(f"ERROR [SYNC] change_log prune failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+        _stop.wait(settings.CHANGE_LOG_PRUNE_INTERVAL_MINUTES * 60)
+
+
+def start_retention_worker():
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run_retention, name="change-log-retention", daemon=True)
+    _thread.start()
+
+
+def stop_retention_worker(timeout: float = 5.0):
+    _stop.set()
+    if _thread:
+        _thread.join(timeout)
@@ -252,6 +252,9 @@ function formatDate(dateStr) {
 }
 
 function logout() {
+    if ('serviceWorker' in navigator && navigator.serviceWorker.controller) {
+        navigator.serviceWorker.controller.postMessage({ type: 'CLEAR_MIRROR' });
+    }
     window.location.href = '/';
 }
 
@@ -59,6 +59,19 @@ class FinanceApp {
         return headers;
     }
 
+    // Pide al Service Worker que actualice el espejo IndexedDB con /sync/changes (solo deltas)
+    syncMirror() {
+        const token = this.token || localStorage.getItem('auth_token');
+        if (!token || !('serviceWorker' in navigator) || !navigator.serviceWorker.controller) return;
+        navigator.serviceWorker.controller.postMessage({ type: 'SYNC_MIRROR', token, apiBase: CONFIG.API_BASE });
+    }
+
+    // Cierre de sesión: el Service Worker borra el espejo IndexedDB de la cuenta
+    clearMirror() {
+        if (!('serviceWorker' in navigator) || !navigator.serviceWorker.controller) return;
+        navigator.serviceWorker.controller.postMessage({ type: 'CLEAR_MIRROR' });
+    }
+
     init() {
         this.setupNavigation();
         this.setupModal();
@@ -941,20 +954,50 @@ class FinanceApp {
     async loadExpenses() {
         console.log('[DEBUG] Loading expenses...');
         try {
-            const response = await fetch(`${CONFIG.API_BASE}/expenses/?_t=${Date.now()}`, {
-                headers: this.getHeaders()
+            // Sin cache-buster: el navegador revalida con If-None-Match y el backend responde 304 si no hubo cambios
+            const response = await fetch(`${CONFIG.API_BASE}/expenses/`, {
+                headers: this.getHeaders(),
+                cache: 'no-cache'
             });
             if (response.ok) {
                 const expenses = await response.json();
                 console.log(`[DEBUG] Received ${expenses.length} expenses`);
                 this.allExpenses = expenses;
                 this.renderExpenses(expenses, this.expensePage);
+                this.syncMirror();
+
+                // BD vacía: el backend restaura desde Sheets en segundo plano
+                const importJob = response.headers.get('X-Import-Job');
+                if (importJob) this.waitForImport(importJob);
             }
         } catch (error) {
             console.error('Error loading expenses:', error);
         }
     }
 
+    async waitForImport(jobId) {
+        if (this.importPolling) return;
+        this.importPolling = true;
+        try {
+            while (true) {
+                await new Promise(r => setTimeout(r, 2000));
+                const res = await fetch(`${CONFIG.API_BASE}/expenses/import-jobs/${jobId}`, { headers: this.getHeaders() });
+                if (!res.ok) break;
+                const job = await res.json();
+                console.log(`[DEBUG] Import job ${jobId}: ${job.status} ${job.processed_rows}/${job.total_rows || '?'}`);
+                if (job.status === 'done') {
+                    if (job.imported > 0) await this.refreshData();
+                    break;
+                }
+                if (job.status === 'error') break;
+            }
+        } catch (error) {
+            console.error('Error polling import job:', error);
+        } finally {
+            this.importPolling = false;
+        }
+    }
+
     renderExpenses(expenses, page = 1) {
         const list = document.getElementById('expense-list');
         if (!list) {
@@ -1483,6 +1526,7 @@ class FinanceApp {
                     // Redirect to login
                     this.token = null;
                     localStorage.removeItem('auth_token');
+                    this.clearMirror();
                     this.showLogin();
                 } else {
                     alert(`❌ Error: ${data.detail || 'Fallo en la sincronización'}`);
@@ -95,13 +95,44 @@
                     this.activePendingId = null;
                 }
 
-                console.log("[DEBUG] Sending request to:", `${apiBase}/agent/chat`);
-                const response = await fetch(`${apiBase}/agent/chat`, {
+                const headers = { 'Authorization': `Bearer ${this.token || localStorage.getItem('auth_token')}` };
+                const canStream = typeof TextDecoder !== 'undefined' && typeof ReadableStream !== 'undefined';
+                const endpoint = canStream ? `${apiBase}/agent/chat/stream` : `${apiBase}/agent/chat`;
+
+                console.log("[DEBUG] Sending request to:", endpoint);
+                const response = await fetch(endpoint, {
                     method: 'POST',
-                    headers: { 'Authorization': `Bearer ${this.token || localStorage.getItem('auth_token')}` },
+                    headers: headers,
                     body: formData
                 });
 
+                if (response.ok && canStream && response.body) {
+                    // Lúcio responde por SSE: el texto se pinta a medida que llega
+                    let botDiv = null;
+                    let streamedText = '';
+                    const data = await this.readChatStream(response, (text) => {
+                        if (!botDiv) {
+                            if (thinkingDiv && thinkingDiv.parentNode) thinkingDiv.parentNode.removeChild(thinkingDiv);
+                            botDiv = this.addChatMessage('', 'bot');
+                        }
+                        streamedText += text;
+                        this.setChatBubbleText(botDiv, streamedText);
+                    });
+
+                    if (thinkingDiv && thinkingDiv.parentNode) thinkingDiv.parentNode.removeChild(thinkingDiv);
+                    if (!data) {
+                        if (!botDiv) botDiv = this.addChatMessage('', 'bot');
+                        this.setChatBubbleText(botDiv, 'Lúcio tuvo un problema procesando eso. Intenta de nuevo por favor.');
+                        return;
+                    }
+                    console.log("[DEBUG] Agent Response Success:", data);
+                    // El mensaje final (tras ejecutar las acciones) reemplaza lo transmitido
+                    if (botDiv) this.setChatBubbleText(botDiv, data.message);
+                    else this.addChatMessage(data.message, 'bot');
+                    this.handleChatResult(data);
+                    return;
+                }
+
                 // Remove thinking
                 if (thinkingDiv && thinkingDiv.parentNode) {
                     thinkingDiv.parentNode.removeChild(thinkingDiv);
@@ -111,17 +142,7 @@
                     const data = await response.json();
                     console.log("[DEBUG] Agent Response Success:", data);
                     this.addChatMessage(data.message, 'bot');
-
-                    if (data.action_taken || (data.intent && data.intent !== 'TALK')) {
-                        console.log(`[DEBUG] Action detected. Refreshing...`);
-                        const refresh = () => this.refreshData && this.refreshData();
-                        refresh();
-                        setTimeout(refresh, 1000);
-
-                        if (data.expense_data) {
-                            setTimeout(() => this.addReceiptCard(data.expense_data), 200);
-                        }
-                    }
+                    this.handleChatResult(data);
                 } else {
                     const errTxt = await response.text();
                     console.error("[DEBUG] Server rejected request:", response.status, errTxt);
@@ -134,6 +155,60 @@
             }
         },
 
+        handleChatResult: function (data) {
+            if (data.action_taken || (data.intent && data.intent !== 'TALK')) {
+                console.log(`[DEBUG] Action detected. Refreshing...`);
+                const refresh = () => this.refreshData && this.refreshData();
+                refresh();
+                setTimeout(refresh, 1000);
+
+                if (data.expense_data) {
+                    setTimeout(() => this.addReceiptCard(data.expense_data), 200);
+                }
+            }
+        },
+
+        readChatStream: async function (response, onToken) {
+            // Lee los eventos SSE de /agent/chat/stream. Retorna el payload de 'done' (o null).
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let result = null;
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                let sep;
+                while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                    const frame = buffer.slice(0, sep);
+                    buffer = buffer.slice(sep + 2);
+
+                    let event = 'message';
+                    let data = '';
+                    frame.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) event = line.slice(6).trim();
+                        else if (line.startsWith('data:')) data += line.slice(5).trim();
+                    });
+                    if (!data) continue;
+
+                    const payload = JSON.parse(data);
+                    if (event === 'token') onToken(payload.text);
+                    else if (event === 'done') result = payload;
+                    else if (event === 'error') console.error("[DEBUG] Stream error:", payload.message);
+                }
+            }
+            return result;
+        },
+
+        setChatBubbleText: function (msgDiv, text) {
+            const bubble = msgDiv && msgDiv.querySelector('.bubble');
+            if (bubble) bubble.innerHTML = (text || '').replace(/\n/g, '<br>');
+            const container = document.getElementById('chat-messages');
+            if (container) container.scrollTop = container.scrollHeight;
+        },
+
         addChatMessage: function (text, sender, isThinking = false) {
             const container = document.getElementById('chat-messages');
             if (!container) return null;
@@ -1,4 +1,4 @@
-const CACHE_NAME = 'cerebro-cache-v4.0.6';
+const CACHE_NAME = 'cerebro-cache-v4.0.8';
 const ASSETS = [
     '/',
     '/index.html',
@@ -47,6 +47,20 @@ self.addEventListener('fetch', (event) => {
     // Skip non-GET requests
     if (event.request.method !== 'GET') return;
 
+    // /static/dist/ lleva el hash del contenido en el nombre: nunca cambia, CACHE FIRST
+    if (new URL(event.request.url).pathname.startsWith('/static/dist/')) {
+        event.respondWith(
+            caches.match(event.request).then((cached) => cached || fetch(event.request).then((networkResponse) => {
+                if (networkResponse && networkResponse.status === 200) {
+                    const responseClone = networkResponse.clone();
+                    caches.open(CACHE_NAME).then((cache) => cache.put(event.request, responseClone));
+                }
+                return networkResponse;
+            }))
+        );
+        return;
+    }
+
     event.respondWith(
         fetch(event.request)
             .then((networkResponse) => {
@@ -98,3 +112,122 @@ self.addEventListener('notificationclick', (event) => {
         })
     );
 });
+
+// --- Espejo IndexedDB: se mantiene al día con /api/v1/sync/changes?since=N ---
+// Una base por usuario: las versiones son por usuario, y un `since` de otra cuenta
+// podría caer dentro del rango válido de la nueva y mezclar los datos de ambas.
+const MIRROR_PREFIX = 'cerebro-mirror';
+const MIRROR_STORES = ['expense', 'category', 'budget', 'commitment'];
+let mirrorSyncing = null;
+
+function tokenSubject(token) {
+    try {
+        const part = token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/');
+        return JSON.parse(atob(part)).sub || null;
+    } catch (e) {
+        return null;
+    }
+}
+
+function mirrorName(subject) {
+    return `${MIRROR_PREFIX}-${encodeURIComponent(subject)}`;
+}
+
+function deleteDatabase(name) {
+    return new Promise((resolve) => {
+        const req = indexedDB.deleteDatabase(name);
+        req.onsuccess = req.onerror = req.onblocked = () => resolve();
+    });
+}
+
+// Borra los espejos de otros usuarios (y la base compartida antigua); sin `keep`, todos
+async function clearMirrors(keep) {
+    const names = new Set([MIRROR_PREFIX]);
+    if (indexedDB.databases) {
+        (await indexedDB.databases()).forEach(({ name }) => {
+            if (name && name.startsWith(MIRROR_PREFIX)) names.add(name);
+        });
+    }
+    names.delete(keep);
+    await Promise.all([...names].map(deleteDatabase));
+}
+
+function openMirror(name) {
+    return new Promise((resolve, reject) => {
+        const req = indexedDB.open(name, 1);
+        req.onupgradeneeded = () => {
+            const db = req.result;
+            MIRROR_STORES.forEach((name) => db.createObjectStore(name, { keyPath: 'id' }));
+            db.createObjectStore('meta');
+        };
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => reject(req.error);
+    });
+}
+
+function mirrorTx(db, stores, mode, fn) {
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(stores, mode);
+        const result = fn(tx);
+        tx.oncomplete = () => resolve(result);
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+async function syncMirror(apiBase, token) {
+    const subject = tokenSubject(token);
+    if (!subject) throw new Error('token sin usuario');
+    // Cambio de usuario en el dispositivo: el espejo nuevo parte vacío (since=0, snapshot completo)
+    await clearMirrors(mirrorName(subject));
+    const db = await openMirror(mirrorName(subject));
+    const since = await mirrorTx(db, ['meta'], 'readonly', (tx) => {
+        const req = tx.objectStore('meta').get('version');
+        return req;
+    }).then((req) => req.result || 0);
+
+    const response = await fetch(`${apiBase}/sync/changes?since=${since}`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+        cache: 'no-store'
+    });
+    if (!response.ok) throw new Error(`sync/changes ${response.status}`);
+    const payload = await response.json();
+
+    await mirrorTx(db, [...MIRROR_STORES, 'meta'], 'readwrite', (tx) => {
+        MIRROR_STORES.forEach((name) => {
+            const store = tx.objectStore(name);
+            const changes = payload.changes[name];
+            if (payload.full) store.clear();
+            if (!changes) return;
+            changes.upserts.forEach((row) => store.put(row));
+            changes.deletes.forEach((id) => store.delete(id));
+        });
+        tx.objectStore('meta').put(payload.version, 'version');
+    });
+    db.close();
+    return payload;
+}
+
+self.addEventListener('message', (event) => {
+    const data = event.data || {};
+    if (data.type === 'CLEAR_MIRROR') {
+        // Cierre de sesión: no dejar datos de la cuenta en el dispositivo
+        event.waitUntil(Promise.resolve(mirrorSyncing).catch(() => {}).then(() => clearMirrors()));
+        return;
+    }
+    if (data.type !== 'SYNC_MIRROR' || !data.token) return;
+
+    // Un solo sync a la vez; los mensajes que llegan mientras tanto reutilizan el mismo
+    if (!mirrorSyncing) {
+        mirrorSyncing = syncMirror(data.apiBase || '/api/v1', data.token)
+            .finally(() => { mirrorSyncing = null; });
+    }
+    event.waitUntil(
+        mirrorSyncing
+            .then((payload) => {
+                if (event.source) {
+                    event.source.postMessage({ type: 'MIRROR_SYNCED', version: payload.version, full: payload.full });
+                }
+            })
+            .catch((e) => console.warn('[SW] Mirror sync failed', e))
+    );
+});
@@ -0,0 +1,193 @@
+"""baseline: esquema creado antes por Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Idempotente: en bases existentes (creadas con create_all) solo crea las tablas que falten.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _create_table(existing, name, *columns, indexes=(), **kw):
+    """Crea la tabla (y sus índices simples) solo si no existe todavía."""
+    if name in existing:
+        return
+    op.create_table(name, *columns, **kw)
+    for column, unique in indexes:
+        op.create_index(f"ix_{name}_{column}", name, [column], unique=unique)
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    _create_table(
+        existing, "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("tecnico_nombre", sa.String(), nullable=False, unique=True),
+        sa.Column("role", sa.Enum("TECH", "ADMIN", name="role")),
+        sa.Column("is_active", sa.Boolean()),
+        indexes=[("id", False), ("email", True)],
+    )
+    _create_table(
+        existing, "failure_reasons",
+        sa.Column("code", sa.String(), primary_key=True),
+        sa.Column("label", sa.String(), nullable=False),
+        sa.Column("active", sa.Boolean()),
+    )
+    _create_table(
+        existing, "activities",
+        sa.Column("ticket_id", sa.String(), primary_key=True),
+        sa.Column("fecha", sa.Date(), nullable=False),
+        sa.Column("tecnico_nombre", sa.String(), sa.ForeignKey("users.tecnico_nombre"), nullable=False),
+        sa.Column("patente", sa.String()),
+        sa.Column("cliente", sa.String()),
+        sa.Column("direccion", sa.String()),
+        sa.Column("tipo_trabajo", sa.String()),
+        sa.Column("prioridad", sa.String()),
+        sa.Column("accesorios", sa.String()),
+        sa.Column("comuna", sa.String()),
+        sa.Column("region", sa.String()),
+        sa.Column("estado", sa.Enum("PENDIENTE", "EN_CURSO", "EXITOSO", "FALLIDO", "REPROGRAMADO", name="activitystate")),
+        sa.Column("hora_inicio", sa.DateTime()),
+        sa.Column("hora_fin", sa.DateTime()),
+        sa.Column("duracion_min", sa.Integer()),
+        sa.Column("resultado_motivo", sa.String(), sa.ForeignKey("failure_reasons.code")),
+        sa.Column("observacion", sa.Text()),
+        sa.Column("updated_at", sa.DateTime()),
+        indexes=[("ticket_id", False), ("fecha", False), ("tecnico_nombre", False), ("estado", False)],
+    )
+    _create_table(
+        existing, "day_signatures",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("tecnico_nombre", sa.String(), sa.ForeignKey("users.tecnico_nombre"), nullable=False),
+        sa.Column("fecha", sa.Date(), nullable=False),
+        sa.Column("signature_ref", sa.String(), nullable=False),
+        sa.Column("timestamp", sa.DateTime()),
+        sa.UniqueConstraint("tecnico_nombre", "fecha", name="_tech_date_uc"),
+        indexes=[("id", False)],
+    )
+    _create_table(
+        existing, "chat_history",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("role", sa.String(), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("timestamp", sa.DateTime()),
+        indexes=[("id", False)],
+    )
+    _create_table(
+        existing, "expenses",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("concept", sa.String(), nullable=False),
+        sa.Column("section", sa.String()),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("date", sa.Date()),
+        sa.Column("payment_method", sa.String()),
+        sa.Column("image_url", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        indexes=[("id", False)],
+    )
+    _create_table(
+        existing, "commitments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("total_amount", sa.Integer(), nullable=False),
+        sa.Column("paid_amount", sa.Integer()),
+        sa.Column("due_date", sa.Date()),
+        sa.Column("status", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        indexes=[("id", False)],
+    )
+    _create_table(
+        existing, "pending_expenses",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("concept", sa.String(), nullable=False),
+        sa.Column("date", sa.Date()),
+        sa.Column("payment_method", sa.String()),
+        sa.Column("raw_email_id", sa.String(), unique=True),
+        sa.Column("status", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        indexes=[("id", False)],
+    )
+    _create_table(
+        existing, "push_subscriptions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("endpoint", sa.String(), nullable=False, unique=True),
+        sa.Column("p256dh", sa.String(), nullable=False),
+        sa.Column("auth", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        indexes=[("id", False)],
+    )
+    _create_table(
+        existing, "email_logs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("gmail_id", sa.String()),
+        sa.Column("subject", sa.String()),
+        sa.Column("sender", sa.String()),
+        sa.Column("date", sa.DateTime()),
+        sa.Column("summary", sa.Text()),
+        sa.Column("category", sa.String()),
+        sa.Column("body_snippet", sa.Text()),
+        sa.Column("processed", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        indexes=[("id", False), ("gmail_id", True)],
+    )
+    _create_table(
+        existing, "expense_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("month", sa.String(), nullable=False),
+        sa.Column("section", sa.String(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("user_id", "month", "section", "category", name="_rollup_user_month_cat_uc"),
+        indexes=[("id", False)],
+    )
+    _create_table(
+        existing, "budgets",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("month", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        indexes=[("id", False)],
+    )
+    _create_table(
+        existing, "categories",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("section", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("budget", sa.Integer()),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        indexes=[("id", False)],
+    )
+    _create_table(
+        existing, "app_config",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("key", sa.String(), nullable=False, unique=True),
+        sa.Column("value", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        indexes=[("id", False)],
+    )
+
+
+def downgrade():
+    # El baseline no se revierte: eliminaría todos los datos.
+    pass
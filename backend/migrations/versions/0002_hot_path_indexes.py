@@ -0,0 +1,37 @@
+"""índices compuestos para los filtros más usados de gastos/categorías
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_expenses_user_date", "expenses", ["user_id", "date"]),
+    ("ix_expenses_user_section_category", "expenses", ["user_id", "section", "category"]),
+    ("ix_expenses_user_id_id", "expenses", ["user_id", "id"]),
+    ("ix_categories_user_section_name", "categories", ["user_id", "section", "name"]),
+    ("ix_budgets_user_month", "budgets", ["user_id", "month"]),
+    ("ix_commitments_user_id_id", "commitments", ["user_id", "id"]),
+    ("ix_email_logs_user_date", "email_logs", ["user_id", "date"]),
+    ("ix_chat_history_user_id_id", "chat_history", ["user_id", "id"]),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        existing = {ix["name"] for ix in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
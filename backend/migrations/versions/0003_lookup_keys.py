@@ -0,0 +1,66 @@
+"""claves normalizadas (section_key, name_key, category_key) para reemplazar ILIKE
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.core.normalize import lookup_key
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# tabla -> {columna_clave: columna_origen}
+KEY_COLUMNS = {
+    "categories": {"section_key": "section", "name_key": "name"},
+    "expenses": {"section_key": "section", "category_key": "category"},
+}
+
+INDEXES = [
+    ("ix_categories_user_keys", "categories", ["user_id", "section_key", "name_key"]),
+    ("ix_expenses_user_keys", "expenses", ["user_id", "section_key", "category_key"]),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    for table, keys in KEY_COLUMNS.items():
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        for key_col in keys:
+            if key_col not in existing:
+                op.add_column(table, sa.Column(key_col, sa.String(), nullable=True))
+
+    # Backfill en Python: quitar acentos no es portable en SQL (SQLite/Postgres)
+    for table, keys in KEY_COLUMNS.items():
+        sources = list(keys.values())
+        tbl = sa.table(table, sa.column("id"), *[sa.column(c) for c in list(keys) + sources])
+        rows = bind.execute(sa.select(tbl.c.id, *[tbl.c[c] for c in sources])).fetchall()
+        params = [
+            {"row_id": row[0], **{key_col: lookup_key(row[1 + i]) for i, key_col in enumerate(keys)}}
+            for row in rows
+        ]
+        if params:
+            bind.execute(
+                tbl.update().where(tbl.c.id == sa.bindparam("row_id")).values(
+                    {key_col: sa.bindparam(key_col) for key_col in keys}
+                ),
+                params
+            )
+
+    for name, table, columns in INDEXES:
+        if name not in {ix["name"] for ix in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _columns in INDEXES:
+        op.drop_index(name, table_name=table)
+    for table, keys in KEY_COLUMNS.items():
+        with op.batch_alter_table(table) as batch:
+            for key_col in keys:
+                batch.drop_column(key_col)
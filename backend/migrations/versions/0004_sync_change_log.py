@@ -0,0 +1,44 @@
+"""versión de cambios por usuario y bitácora para /sync/changes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "sync_versions" not in existing:
+        op.create_table(
+            "sync_versions",
+            sa.Column("user_id", sa.Integer(), primary_key=True),
+            sa.Column("version", sa.Integer(), nullable=False),
+        )
+        # Usuarios existentes parten en la versión 1 (0 = "sin historial", siempre snapshot)
+        op.execute("INSERT INTO sync_versions (user_id, version) SELECT id, 1 FROM users")
+    if "change_log" not in existing:
+        op.create_table(
+            "change_log",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("entity", sa.String(), nullable=False),
+            sa.Column("entity_id", sa.Integer()),
+            sa.Column("op", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_change_log_id", "change_log", ["id"])
+        op.create_index("ix_change_log_user_version", "change_log", ["user_id", "version"])
+
+
+def downgrade():
+    op.drop_table("change_log")
+    op.drop_table("sync_versions")
@@ -0,0 +1,38 @@
+"""cola durable de escrituras hacia Google Sheets
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "sheets_outbox" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "sheets_outbox",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("op", sa.String(), nullable=False),
+        sa.Column("entity_key", sa.String()),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime()),
+        sa.Column("claim", sa.String()),
+        sa.Column("claimed_at", sa.DateTime()),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_sheets_outbox_id", "sheets_outbox", ["id"])
+    op.create_index("ix_sheets_outbox_status_id", "sheets_outbox", ["status", "id"])
+
+
+def downgrade():
+    op.drop_table("sheets_outbox")
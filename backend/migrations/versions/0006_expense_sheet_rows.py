@@ -0,0 +1,28 @@
+"""índice expense_id -> fila de la hoja 'Gastos'
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "expense_sheet_rows" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "expense_sheet_rows",
+        sa.Column("expense_id", sa.Integer(), primary_key=True),
+        sa.Column("sheet_row", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_expense_sheet_rows_row", "expense_sheet_rows", ["sheet_row"])
+
+
+def downgrade():
+    op.drop_table("expense_sheet_rows")
@@ -0,0 +1,29 @@
+"""estado de sincronización incremental de Gmail (historyId por usuario)
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "gmail_sync_state" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "gmail_sync_state",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("history_id", sa.String()),
+        sa.Column("last_sync_at", sa.DateTime()),
+        sa.Column("last_full_sync_at", sa.DateTime()),
+    )
+
+
+def downgrade():
+    op.drop_table("gmail_sync_state")
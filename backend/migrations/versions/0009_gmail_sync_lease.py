@@ -0,0 +1,24 @@
+"""lease por usuario para la ingesta de Gmail en segundo plano
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("gmail_sync_state")}
+    if "locked_until" not in existing:
+        op.add_column("gmail_sync_state", sa.Column("locked_until", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("gmail_sync_state") as batch:
+        batch.drop_column("locked_until")
@@ -0,0 +1,27 @@
+"""retención de change_log: versión mínima disponible por usuario
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "min_version" not in {c["name"] for c in inspector.get_columns("sync_versions")}:
+        op.add_column("sync_versions", sa.Column("min_version", sa.Integer(), nullable=False, server_default="0"))
+    if "ix_change_log_created_at" not in {ix["name"] for ix in inspector.get_indexes("change_log")}:
+        op.create_index("ix_change_log_created_at", "change_log", ["created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_change_log_created_at", table_name="change_log")
+    with op.batch_alter_table("sync_versions") as batch:
+        batch.drop_column("min_version")
@@ -0,0 +1,24 @@
+"""ids de Gmail pendientes de descarga por usuario (se reintentan en el próximo sync)
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("gmail_sync_state")}
+    if "pending_ids" not in existing:
+        op.add_column("gmail_sync_state", sa.Column("pending_ids", sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("gmail_sync_state") as batch:
+        batch.drop_column("pending_ids")
@@ -0,0 +1,159 @@
+"""
+Benchmark del dashboard: hidratación ORM (camino antiguo) vs agregación en SQL vs rollups.
+Usa una base SQLite temporal con gastos sintéticos; no toca sql_app.db.
+
+    python scripts/bench_dashboard.py --expenses 50000
+"""
+import sys
+import os
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+parser = argparse.ArgumentParser(description="Benchmark del endpoint /expenses/dashboard")
+parser.add_argument("--expenses", type=int, default=50000, help="Cantidad de gastos sintéticos")
+parser.add_argument("--runs", type=int, default=5, help="Repeticiones por variante (se reporta la mejor)")
+args = parser.parse_args()
+
+# La BD temporal debe configurarse ANTES de importar app.*
+db_path = os.path.join(tempfile.mkdtemp(), "bench_dashboard.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+os.environ["FINANCE_DATABASE_URL"] = f"sqlite:///{db_path}"
+
+# Add parent directory to path to allow importing app module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import Base, engine, SessionLocal
+from app.models.models import User
+from app.models.finance import Expense
+from app.models.budget import Budget, Category
+from app.services.db_service import get_dashboard_data_from_db, get_categories_with_budget, get_or_create_monthly_budget
+from app.services.rollup_service import rebuild_rollups
+
+SECTIONS = {
+    "CASA": ["Arriendo", "Servicios", "Supermercado"],
+    "FAMILIA": ["Salud", "Educación"],
+    "TRANSPORTE": ["Bencina", "Uber"],
+    "OTROS": ["General"],
+}
+
+
+def legacy_dashboard(db, user_id):
+    """Implementación anterior: carga cada Expense del mes como objeto ORM y suma en Python."""
+    current_month = datetime.now().strftime("%Y-%m")
+    monthly_budget = get_or_create_monthly_budget(db, user_id, current_month)
+    first_day = datetime.now().replace(day=1).date()
+    expenses = db.query(Expense).filter(Expense.user_id == user_id, Expense.date >= first_day).all()
+    total_spent = sum(exp.amount for exp in expenses)
+
+    categories = db.query(Category).filter(Category.user_id == user_id).all()
+    categories_dict = {}
+    for cat in categories:
+        categories_dict.setdefault(cat.section.strip().upper(), []).append({"name": cat.name.strip(), "budget": cat.budget})
+
+    expenses_by_category = {}
+    for exp in expenses:
+        section = exp.section or "OTROS"
+        expenses_by_category.setdefault(section, {})
+        expenses_by_category[section][exp.category] = expenses_by_category[section].get(exp.category, 0) + exp.amount
+
+    categories_output = {}
+    for section, cats in categories_dict.items():
+        subcats = {}
+        for cat_info in cats:
+            if cat_info["name"] == "_TEMP_PLACEHOLDER_": continue
+            subcats[cat_info["name"]] = {"budget": cat_info["budget"], "spent": expenses_by_category.get(section, {}).get(cat_info["name"], 0)}
+        categories_output[section] = {
+            "budget": sum(c["budget"] for c in subcats.values()),
+            "spent": sum(c["spent"] for c in subcats.values()),
+            "categories": subcats
+        }
+
+    return {
+        "monthly_budget": monthly_budget,
+        "total_spent": total_spent,
+        "available_balance": monthly_budget - total_spent,
+        "categories": categories_output
+    }
+
+
+def seed(db, n_expenses):
+    user = User(email="bench@cerebro.com", hashed_password="x", tecnico_nombre="Bench")
+    db.add(user)
+    db.commit()
+
+    for section, names in SECTIONS.items():
+        for name in names:
+            db.add(Category(user_id=user.id, section=section, name=name, budget=100000))
+    db.add(Budget(user_id=user.id, month=datetime.now().strftime("%Y-%m"), amount=2000000))
+    db.commit()
+
+    # Todos los gastos caen en el mes actual (peor caso para el camino antiguo)
+    rng = random.Random(42)
+    pairs = [(s, c) for s, names in SECTIONS.items() for c in names]
+    month_start = date.today().replace(day=1)
+    days = max((date.today() - month_start).days, 0) + 1
+    mappings = []
+    for i in range(n_expenses):
+        section, category = rng.choice(pairs)
+        mappings.append({
+            "user_id": user.id,
+            "amount": rng.randint(500, 80000),
+            "concept": f"Gasto sintético {i}",
+            "section": section,
+            "category": category,
+            "date": month_start + timedelta(days=rng.randrange(days)),
+            "payment_method": "Débito",
+        })
+    db.bulk_insert_mappings(Expense, mappings)
+    rebuild_rollups(db, user.id)
+    db.commit()
+    return user.id
+
+
+def measure(label, fn, runs):
+    timings = []
+    peak = 0
+    result = None
+    for _ in range(runs):
+        db = SessionLocal()
+        try:
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = fn(db)
+            timings.append(time.perf_counter() - start)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        finally:
+            db.close()
+    print(f"{label:<28} best {min(timings) * 1000:9.2f} ms   peak mem {peak / 1024:10.1f} KiB")
+    return result, min(timings)
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f"Seeding {args.expenses} expenses into {db_path} ...")
+        user_id = seed(db, args.expenses)
+    finally:
+        db.close()
+
+    legacy, t_legacy = measure("legacy (ORM hydration)", lambda s: legacy_dashboard(s, user_id), args.runs)
+    live, t_live = measure("SQL GROUP BY", lambda s: get_dashboard_data_from_db(s, user_id, use_rollups=False), args.runs)
+    rolled, t_roll = measure("expense_rollups", lambda s: get_dashboard_data_from_db(s, user_id), args.runs)
+    measure("categories (column select)", lambda s: get_categories_with_budget(s, user_id), args.runs)
+
+    if not (legacy == live == rolled):
+        print("ERROR: dashboard outputs differ between implementations")
+        return 1
+
+    print(f"Speedup GROUP BY: x{t_legacy / t_live:.1f}   rollups: x{t_legacy / t_roll:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
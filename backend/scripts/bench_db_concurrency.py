@@ -0,0 +1,159 @@
+"""
+Benchmark de concurrencia del engine (app/database.py, make_engine).
+
+1) Escritores + lectores sobre SQLite, dos engines sobre archivos temporales:
+   - antes:   create_engine con solo check_same_thread=False (journal DELETE, timeout 5 s)
+   - después: make_engine (WAL, synchronous=NORMAL, busy_timeout, mmap, foreign_keys)
+   Los lectores recorren la tabla completa despacio (como un reporte); en modo
+   DELETE cada lectura mantiene el lock compartido y los commits esperan hasta que
+   vence el timeout: "database is locked". En WAL los escritores no esperan a los lectores.
+
+2) Agotamiento del pool: más hilos que pool_size + max_overflow con un pool_timeout
+   corto. Se ve en pool_stats() (peak_in_use, saturated) y en los TimeoutError.
+
+    python scripts/bench_db_concurrency.py --writers 8 --readers 4 --seconds 10
+"""
+import sys
+import os
+import argparse
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+# Add parent directory to path to allow importing app module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, exc  # noqa: E402
+from app.database import make_engine, pool_stats  # noqa: E402
+
+SEED_ROWS = 20000
+
+
+def setup(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE bench (id INTEGER PRIMARY KEY, k INTEGER, v TEXT)")
+        conn.exec_driver_sql("CREATE TABLE counter (id INTEGER PRIMARY KEY, n INTEGER)")
+        conn.exec_driver_sql("INSERT INTO counter (id, n) VALUES (1, 0)")
+        conn.exec_driver_sql(
+            "INSERT INTO bench (k, v) VALUES (?, ?)",
+            [(i, f"fila {i:06d} " + "x" * 80) for i in range(SEED_ROWS)],
+        )
+
+
+def run_workload(engine, writers, readers, seconds, scan_seconds):
+    stop = threading.Event()
+    lock = threading.Lock()
+    result = {"writes": 0, "write_locked": 0, "write_latency": [], "scans": 0, "read_locked": 0}
+
+    def writer(n):
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql("INSERT INTO bench (k, v) VALUES (?, ?)", (n, "nuevo"))
+                    conn.exec_driver_sql("UPDATE counter SET n = n + 1 WHERE id = 1")
+                with lock:
+                    result["writes"] += 1
+                    result["write_latency"].append((time.perf_counter() - start) * 1000)
+            except exc.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                with lock:
+                    result["write_locked"] += 1
+
+    def reader():
+        batches = SEED_ROWS // 500
+        while not stop.is_set():
+            try:
+                with engine.connect() as conn:
+                    rows = conn.exec_driver_sql("SELECT id, k, v FROM bench ORDER BY id")
+                    for _ in range(batches):
+                        if not rows.fetchmany(500):
+                            break
+                        time.sleep(scan_seconds / batches) # reporte lento: el cursor sigue abierto
+                    rows.close()
+                with lock:
+                    result["scans"] += 1
+            except exc.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                with lock:
+                    result["read_locked"] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return result
+
+
+def run_pool_exhaustion(engine, threads, hold_seconds):
+    timeouts = [0]
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("SELECT 1")
+                time.sleep(hold_seconds)
+        except exc.TimeoutError:
+            with lock:
+                timeouts[0] += 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return timeouts[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concurrencia del engine")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duración de cada corrida")
+    parser.add_argument("--scan-seconds", type=float, default=6.0, help="Lo que tarda cada lectura completa")
+    parser.add_argument("--pool-threads", type=int, default=12, help="Hilos contra un pool de 2 + 2")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        engines = [
+            ("antes", create_engine(f"sqlite:///{tmp_dir}/antes.db", connect_args={"check_same_thread": False})),
+            ("después", make_engine(f"sqlite:///{tmp_dir}/despues.db")),
+        ]
+        print(f"{args.writers} escritores, {args.readers} lectores ({args.scan_seconds:.0f} s por lectura), {args.seconds:.0f} s por corrida")
+        print(f"{'engine':<10}{'escrituras':>11}{'locked':>8}{'p50 ms':>9}{'p95 ms':>9}{'lecturas':>10}{'locked':>8}")
+        locked_after = 0
+        for label, engine in engines:
+            setup(engine)
+            r = run_workload(engine, args.writers, args.readers, args.seconds, args.scan_seconds)
+            latency = sorted(r["write_latency"]) or [0.0]
+            p95 = latency[max(int(len(latency) * 0.95) - 1, 0)]
+            print(f"{label:<10}{r['writes']:>11}{r['write_locked']:>8}{statistics.median(latency):>9.1f}{p95:>9.1f}"
+                  f"{r['scans']:>10}{r['read_locked']:>8}")
+            if label == "después":
+                locked_after = r["write_locked"] + r["read_locked"]
+            engine.dispose()
+
+        small = make_engine(f"sqlite:///{tmp_dir}/pool.db", pool_size=2, max_overflow=2, pool_timeout=0.5)
+        timeouts = run_pool_exhaustion(small, args.pool_threads, hold_seconds=1.0)
+        print(f"\nPool 2 + 2, {args.pool_threads} hilos con la conexión 1 s: {timeouts} TimeoutError")
+        print(f"pool_stats: {pool_stats(small)}")
+        small.dispose()
+        if locked_after:
+            print("  FALLA el engine ajustado tuvo errores 'database is locked'")
+        return 1 if locked_after else 0
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
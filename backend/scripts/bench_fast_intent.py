@@ -0,0 +1,135 @@
+"""
+Benchmark del intérprete local de intenciones (app/services/intent_parser.py).
+
+Corre un corpus etiquetado de mensajes del chat y reporta:
+  - cobertura: mensajes resueltos sin llamar al modelo
+  - precisión: de esos, cuántos producen exactamente la acción esperada
+  - falsos positivos: mensajes que debían ir a Lúcio y el parser respondió igual
+  - latencia por mensaje (µs)
+
+    python scripts/bench_fast_intent.py --runs 200
+"""
+import sys
+import os
+import argparse
+import statistics
+import time
+
+# Add parent directory to path to allow importing app module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.intent_parser import parse
+
+CATEGORIES = [
+    ("TRANSPORTE", "Uber"), ("TRANSPORTE", "Bencina"), ("TRANSPORTE", "Metro"),
+    ("CASA", "Supermercado"), ("CASA", "Luz"), ("CASA", "Agua"), ("CASA", "Arriendo"),
+    ("FAMILIA", "Salud"), ("FAMILIA", "Educación"), ("OCIO", "Café"), ("OCIO", "Cine"),
+    # Mismo nombre en dos carpetas: debe ir a Lúcio para que pregunte
+    ("CASA", "Regalos"), ("FAMILIA", "Regalos"),
+    ("OCIO", "_TEMP_PLACEHOLDER_"),
+]
+
+# (mensaje, acción esperada) — None = debe ir al modelo
+CORPUS = [
+    ("gasté 5000 en uber", {"intent": "CREATE", "amount": 5000, "category": "Uber", "section": "TRANSPORTE"}),
+    ("Gaste 5.000 en Uber", {"intent": "CREATE", "amount": 5000, "category": "Uber", "section": "TRANSPORTE"}),
+    ("gasté $12.780 en supermercado", {"intent": "CREATE", "amount": 12780, "category": "Supermercado", "section": "CASA"}),
+    ("pagué 45.000 de luz", {"intent": "CREATE", "amount": 45000, "category": "Luz", "section": "CASA"}),
+    ("pague 20 lucas de agua", {"intent": "CREATE", "amount": 20000, "category": "Agua", "section": "CASA"}),
+    ("5 mil en café", {"intent": "CREATE", "amount": 5000, "category": "Café", "section": "OCIO"}),
+    ("3500 en metro", {"intent": "CREATE", "amount": 3500, "category": "Metro", "section": "TRANSPORTE"}),
+    ("gasté 15k en bencina", {"intent": "CREATE", "amount": 15000, "category": "Bencina", "section": "TRANSPORTE"}),
+    ("me gasté 8000 en cine", {"intent": "CREATE", "amount": 8000, "category": "Cine", "section": "OCIO"}),
+    ("compré 30.000 en salud", {"intent": "CREATE", "amount": 30000, "category": "Salud", "section": "FAMILIA"}),
+    ("gasté en uber 7000", {"intent": "CREATE", "amount": 7000, "category": "Uber", "section": "TRANSPORTE"}),
+    ("uber 4500", {"intent": "CREATE", "amount": 4500, "category": "Uber", "section": "TRANSPORTE"}),
+    ("gasté 6000 en uber al trabajo", {"intent": "CREATE", "amount": 6000, "category": "Uber", "section": "TRANSPORTE"}),
+    ("pagué 350.000 de arriendo.", {"intent": "CREATE", "amount": 350000, "category": "Arriendo", "section": "CASA"}),
+    ("gasté 12000 en educacion", {"intent": "CREATE", "amount": 12000, "category": "Educación", "section": "FAMILIA"}),
+    ("borra el gasto 123", {"intent": "DELETE", "target_id": 123}),
+    ("Elimina gasto 45", {"intent": "DELETE", "target_id": 45}),
+    ("borrar el gasto #9", {"intent": "DELETE", "target_id": 9}),
+    ("elimina el gasto número 77", {"intent": "DELETE", "target_id": 77}),
+    ("cambia el gasto 12 a 8000", {"intent": "UPDATE", "target_id": 12, "amount": 8000}),
+    ("corrige el monto del gasto 30 a $15.500", {"intent": "UPDATE", "target_id": 30, "amount": 15500}),
+    ("borra el compromiso 4", {"intent": "DELETE_COMMITMENT", "target_id": 4}),
+    ("marca el compromiso 8 como pagado", {"intent": "MARK_PAID_COMMITMENT", "target_id": 8}),
+    ("ya pagué el compromiso 3", {"intent": "MARK_PAID_COMMITMENT", "target_id": 3}),
+    # Deben ir a Lúcio
+    ("gasté 5000 en regalos", None),            # categoría en dos carpetas
+    ("gasté 5000 en peluquería", None),         # categoría inexistente
+    ("¿cuánto gasté en uber este mes?", None),  # pregunta
+    ("borra el último gasto", None),            # sin ID explícito
+    ("gasté 5000 en uber y 3000 en metro", None),
+    ("hola lúcio", None),
+    ("le presté 20000 a juan", None),           # compromiso, requiere contexto
+    ("crea la categoría gimnasio en ocio", None),
+    ("cuánto me queda de presupuesto", None),
+    ("divide la boleta entre 3", None),
+    ("gasté algo en uber", None),
+    ("metro", None),
+    ("pagué 0 en luz", None),
+    ("sube el presupuesto de uber a 50000", None),
+    ("mueve uber a la carpeta casa", None),
+    ("gasté 5000 en uber ayer con tarjeta de crédito y también café", None),
+    # Medio de pago, fecha o gasto compartido: el registro rápido los perdería
+    ("gasté 5000 en uber con tarjeta de crédito", None),
+    ("pagué 5000 de luz con débito", None),
+    ("gasté 5000 en uber por transferencia", None),
+    ("gasté 5000 en uber ayer", None),
+    ("gasté 5000 en uber hace 3 días", None),
+    ("gasté 5000 en uber el lunes", None),
+    ("gasté 5000 en uber a medias con juan", None),
+    ("gasté 5000 en uber entre 3", None),
+    ("gasté 5000 en uber para el cumpleaños", None),
+]
+
+
+def matches(action, expected):
+    if action is None or expected is None:
+        return action is None and expected is None
+    return all(action.get(k) == v for k, v in expected.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del intérprete local de intenciones")
+    parser.add_argument("--runs", type=int, default=200, help="Repeticiones por mensaje para medir latencia")
+    args = parser.parse_args()
+
+    answered = correct = false_positive = misses = 0
+    failures = []
+    for message, expected in CORPUS:
+        action = parse(message, CATEGORIES)
+        if action is not None:
+            answered += 1
+            if expected is None:
+                false_positive += 1
+                failures.append((message, expected, action))
+            elif matches(action, expected):
+                correct += 1
+            else:
+                failures.append((message, expected, action))
+        elif expected is not None:
+            misses += 1
+            failures.append((message, expected, action))
+
+    timings = []
+    for message, _ in CORPUS:
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            parse(message, CATEGORIES)
+        timings.append((time.perf_counter() - start) / args.runs * 1e6)
+
+    expected_fast = sum(1 for _, e in CORPUS if e is not None)
+    print(f"Corpus: {len(CORPUS)} mensajes ({expected_fast} simples, {len(CORPUS) - expected_fast} para Lúcio)")
+    print(f"Cobertura:          {answered}/{expected_fast} resueltos localmente ({misses} simples no reconocidos)")
+    print(f"Precisión:          {correct}/{answered} acciones exactas" if answered else "Precisión: n/a")
+    print(f"Falsos positivos:   {false_positive}")
+    print(f"Latencia (µs):      mediana {statistics.median(timings):.1f}   p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.1f}   máx {max(timings):.1f}")
+    for message, expected, action in failures:
+        print(f"  FALLA {message!r}: esperado {expected}, obtenido {action}")
+    return 1 if false_positive or answered != correct else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
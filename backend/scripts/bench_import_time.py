@@ -0,0 +1,78 @@
+"""
+Tiempo de import de app.main (arranque en frío de cada worker de uvicorn / Cloud Run).
+
+Corre `python -X importtime -c "import app.main"` en un proceso limpio y reporta el
+total y los módulos más caros. Falla (exit 1) si:
+  - el total supera --max-ms
+  - se cargó algún SDK pesado que debe importarse recién al usarse (LAZY_MODULES)
+
+Importar app.main no debe tocar la BD: migraciones, usuario inicial y rollups corren
+en el lifespan (ver app/main.py).
+
+    python scripts/bench_import_time.py --runs 5 --max-ms 1500
+"""
+import sys
+import os
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Se cargan en la primera llamada que los necesita, nunca al importar la app
+LAZY_MODULES = [
+    "google.generativeai", "openai", "gspread", "oauth2client", "pywebpush",
+    "googleapiclient", "google_auth_oauthlib", "alembic", "PIL", "boto3",
+]
+
+
+def import_profile():
+    """[(módulo, self_us, cumulative_us)] de un import en frío."""
+    env = dict(os.environ, SHEETS_OUTBOX_ENABLED="false", GMAIL_SYNC_ENABLED="false")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de import de app.main")
+    parser.add_argument("--runs", type=int, default=5, help="Procesos en frío a medir")
+    parser.add_argument("--max-ms", type=float, default=1500.0, help="Presupuesto para el total (mediana)")
+    parser.add_argument("--top", type=int, default=15, help="Módulos más caros a listar")
+    args = parser.parse_args()
+
+    totals = []
+    rows = []
+    for _ in range(args.runs):
+        rows = import_profile()
+        totals.append(next(cum for name, _, cum in rows if name == "app.main") / 1000)
+
+    loaded = {name for name, _, _ in rows}
+    eager = [m for m in LAZY_MODULES if m in loaded]
+    median = statistics.median(totals)
+
+    print(f"import app.main (ms): mediana {median:.0f}   mín {min(totals):.0f}   máx {max(totals):.0f}   ({args.runs} procesos)")
+    print(f"Presupuesto:          {args.max_ms:.0f} ms")
+    print(f"Top {args.top} por tiempo acumulado (último proceso):")
+    top_level = [r for r in rows if "." not in r[0] or r[0].startswith("app.")]
+    for name, _, cum in sorted(top_level, key=lambda r: -r[2])[:args.top]:
+        print(f"  {cum / 1000:8.1f} ms  {name}")
+    for module in eager:
+        print(f"  FALLA {module} se importa al arrancar (debe cargarse al usarse)")
+    if median > args.max_ms:
+        print(f"  FALLA import de {median:.0f} ms supera el presupuesto de {args.max_ms:.0f} ms")
+    return 1 if eager or median > args.max_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Benchmark de GET /expenses/ y GET /commitments/ con y sin el camino rápido de JSON
+(app/core/fast_json.py, FAST_JSON_LISTS).
+
+Crea una BD SQLite temporal con --rows gastos y compromisos, y llama a los endpoints
+reales (TestClient) alternando:
+  - antes:   entidades ORM + response_model (validación fila por fila) + json.dumps
+  - después: columnas + orjson/TypeAdapter (+ gzip sobre el umbral si se pide)
+
+Reporta ms por request, costo por cada 10k filas y tamaño del payload, y verifica
+que ambos caminos devuelvan exactamente el mismo JSON.
+
+    python scripts/bench_list_serialization.py --rows 10000 --runs 5
+"""
+import sys
+import os
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# Add parent directory to path to allow importing app module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+_tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp.name}"
+os.environ["SHEETS_OUTBOX_ENABLED"] = "false"
+os.environ["GMAIL_SYNC_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.models.finance import Expense, Commitment  # noqa: E402
+from app.models.models import User  # noqa: E402
+from app.core.normalize import lookup_key  # noqa: E402
+
+SECTIONS = [("TRANSPORTE", "Uber"), ("CASA", "Supermercado"), ("OCIO", "Café"), ("FAMILIA", "Salud")]
+
+
+def seed(rows: int) -> int:
+    db = SessionLocal()
+    try:
+        user_id = db.query(User.id).filter(User.email == "christian.zv@cerebro.com").scalar()
+        today = date.today()
+        db.bulk_insert_mappings(Expense, [
+            {
+                "user_id": user_id, "amount": 1000 + i, "concept": f"Gasto de prueba {i}",
+                "section": SECTIONS[i % 4][0], "category": SECTIONS[i % 4][1],
+                "section_key": lookup_key(SECTIONS[i % 4][0]), "category_key": lookup_key(SECTIONS[i % 4][1]),
+                "payment_method": "Débito", "date": today - timedelta(days=i % 365),
+                "image_url": None if i % 3 else f"/api/v1/receipts/{i:064x}",
+            }
+            for i in range(rows)
+        ])
+        db.bulk_insert_mappings(Commitment, [
+            {
+                "user_id": user_id, "title": f"Compromiso {i}", "type": "DEBT" if i % 2 else "LOAN",
+                "total_amount": 50000 + i, "paid_amount": i % 50000, "status": "PENDING" if i % 3 else "PAID",
+                "due_date": today + timedelta(days=i % 90), "created_at": datetime.utcnow(),
+            }
+            for i in range(rows)
+        ])
+        db.commit()
+        return user_id
+    finally:
+        db.close()
+
+
+def measure(client, path, headers, runs, fast):
+    settings.FAST_JSON_LISTS = fast
+    timings = []
+    response = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text[:200]
+    wire = int(response.headers.get("content-length", len(response.content)))
+    return statistics.median(timings), wire, response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de listas grandes")
+    parser.add_argument("--rows", type=int, default=10000, help="Filas por tabla")
+    parser.add_argument("--runs", type=int, default=5, help="Requests por variante (se informa la mediana)")
+    args = parser.parse_args()
+
+    try:
+        with TestClient(app) as client:
+            seed(args.rows)
+            token = client.post(f"{settings.API_V1_STR}/auth/login",
+                                data={"username": "christian.zv@cerebro.com", "password": "123456"}).json()["access_token"]
+            auth = {"Authorization": f"Bearer {token}"}
+
+            print(f"{args.rows} filas por tabla, mediana de {args.runs} requests")
+            print(f"{'endpoint':<16}{'variante':<22}{'ms':>9}{'ms/10k filas':>15}{'bytes':>12}")
+            failed = False
+            for path in ("/expenses/", "/commitments/"):
+                url = f"{settings.API_V1_STR}{path}"
+                plain = dict(auth, **{"Accept-Encoding": "identity"})
+                gzipped = dict(auth, **{"Accept-Encoding": "gzip"})
+                results = [
+                    ("antes (ORM+pydantic)", measure(client, url, plain, args.runs, fast=False)),
+                    ("después", measure(client, url, plain, args.runs, fast=True)),
+                    ("después + gzip", measure(client, url, gzipped, args.runs, fast=True)),
+                ]
+                baseline = results[0][1]
+                for label, (ms, wire, payload) in results:
+                    print(f"{path:<16}{label:<22}{ms:>9.1f}{ms / args.rows * 10000:>15.1f}{wire:>12}")
+                    if payload != baseline[2]:
+                        failed = True
+                        print(f"  FALLA {path} {label}: el JSON difiere del camino original")
+                print(f"{'':<16}{'speedup':<22}{baseline[0] / results[1][1][0]:>8.1f}x")
+            return 1 if failed else 0
+    finally:
+        os.unlink(_tmp.name)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Build de los assets estáticos de la PWA (app/static -> app/static/dist).
+
+Por cada asset de ASSETS escribe una copia con el hash del contenido en el nombre
+(app.js -> dist/app.3f9c1a2b7d.js) más sus versiones precomprimidas .gz y .br, y
+dist/assets.json con el mapa nombre -> archivo. app/services/static_assets.py lee
+ese mapa: reescribe las URLs en el HTML y sirve dist/ con Cache-Control immutable,
+eligiendo .br o .gz según Accept-Encoding.
+
+Brotli es opcional (paquete "Brotli"): si no está instalado se generan solo .gz.
+Sin dist/ la app sirve los archivos originales (desarrollo local).
+
+    python scripts/build_static.py
+"""
+import sys
+import os
+import gzip
+import hashlib
+import json
+import shutil
+
+STATIC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app', 'static'))
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = 'assets.json'
+
+ASSETS = ["app.js", "chat.js", "analytics.js", "style.css", "chat.css"]
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def write_compressed(path: str, data: bytes, brotli) -> list:
+    """Escribe .gz (y .br) solo si quedan más chicos que el original."""
+    written = []
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, "wb") as f:
+                f.write(compressed)
+            written.append((suffix, len(compressed)))
+    return written
+
+
+def main():
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("Brotli no está instalado: solo se generan versiones .gz")
+
+    # dist/ se regenera completo: no quedan versiones viejas
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    for name in ASSETS:
+        source = os.path.join(STATIC_DIR, name)
+        if not os.path.exists(source):
+            print(f"  OMITIDO {name}: no existe")
+            continue
+        with open(source, "rb") as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{fingerprint(data)}{ext}"
+        target = os.path.join(DIST_DIR, hashed)
+        with open(target, "wb") as f:
+            f.write(data)
+        compressed = write_compressed(target, data, brotli)
+        manifest[name] = f"dist/{hashed}"
+        sizes = "   ".join(f"{suffix} {size / 1024:.1f} KB" for suffix, size in compressed)
+        print(f"  {name:<14} -> {hashed:<26} {len(data) / 1024:7.1f} KB   {sizes}")
+
+    with open(os.path.join(DIST_DIR, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"{len(manifest)} assets en {DIST_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Regresión de planes de consulta: verifica que las consultas calientes usen los índices compuestos.
+
+    python scripts/check_query_plans.py                # SQLite temporal (migraciones desde cero)
+    python scripts/check_query_plans.py --configured   # BD configurada (p.ej. Postgres de staging)
+
+Retorna código 1 si alguna consulta no usa el índice esperado.
+"""
+import sys
+import os
+import argparse
+import tempfile
+from datetime import date
+
+parser = argparse.ArgumentParser(description="Verifica el uso de índices en las consultas calientes")
+parser.add_argument("--configured", action="store_true", help="Usar la BD de FINANCE_DATABASE_URL en vez de una SQLite temporal")
+args = parser.parse_args()
+
+if not args.configured:
+    db_path = os.path.join(tempfile.mkdtemp(), "query_plans.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["FINANCE_DATABASE_URL"] = f"sqlite:///{db_path}"
+
+# Add parent directory to path to allow importing app module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func, text
+from app.database import engine, SessionLocal
+from app.core.migrations import run_migrations
+from app.models.models import ChatHistory
+from app.models.finance import Expense, Commitment, EmailLog
+from app.models.budget import Budget, Category
+from app.services.db_service import filter_categories_by_key, filter_expenses_by_key
+
+USER_ID = 1
+
+
+def hot_queries(db):
+    """(descripción, query, índices aceptados)"""
+    first_day = date.today().replace(day=1)
+    return [
+        ("dashboard: gastos del mes agrupados",
+         db.query(Expense.section, Expense.category, func.sum(Expense.amount))
+           .filter(Expense.user_id == USER_ID, Expense.date >= first_day)
+           .group_by(Expense.section, Expense.category),
+         {"ix_expenses_user_date", "ix_expenses_user_section_category"}),
+        ("GET /expenses/ (ORDER BY id DESC)",
+         db.query(Expense).filter(Expense.user_id == USER_ID).order_by(Expense.id.desc()),
+         {"ix_expenses_user_id_id"}),
+        ("GET /expenses/?limit=50&cursor=N (keyset)",
+         db.query(Expense).filter(Expense.user_id == USER_ID, Expense.id < 1000).order_by(Expense.id.desc()).limit(51),
+         {"ix_expenses_user_id_id"}),
+        ("contexto Lúcio: últimos 15 gastos",
+         db.query(Expense).filter(Expense.user_id == USER_ID).order_by(Expense.id.desc()).limit(15),
+         {"ix_expenses_user_id_id"}),
+        ("borrar categoría: gastos asociados",
+         db.query(Expense.id).filter(Expense.user_id == USER_ID, Expense.section == "CASA", Expense.category == "Luz"),
+         {"ix_expenses_user_section_category"}),
+        ("borrar categoría: gastos asociados (sin mayúsculas/acentos)",
+         filter_expenses_by_key(db.query(Expense.id), USER_ID, "casa", "Educación"),
+         {"ix_expenses_user_keys"}),
+        ("resolver categoría",
+         db.query(Category).filter(Category.user_id == USER_ID, Category.section == "CASA", Category.name == "Luz"),
+         {"ix_categories_user_section_name"}),
+        ("resolver categoría (sin mayúsculas/acentos)",
+         filter_categories_by_key(db.query(Category), USER_ID, "casa", "educacion"),
+         {"ix_categories_user_keys"}),
+        ("borrar carpeta: categorías de la sección",
+         filter_categories_by_key(db.query(Category), USER_ID, section="Familia"),
+         {"ix_categories_user_keys"}),
+        ("presupuesto mensual",
+         db.query(Budget.amount).filter(Budget.user_id == USER_ID, Budget.month == "2026-01"),
+         {"ix_budgets_user_month"}),
+        ("contexto Lúcio: compromisos",
+         db.query(Commitment).filter(Commitment.user_id == USER_ID).order_by(Commitment.id.desc()).limit(10),
+         {"ix_commitments_user_id_id"}),
+        ("contexto Lúcio: correos",
+         db.query(EmailLog).filter(EmailLog.user_id == USER_ID).order_by(EmailLog.date.desc()).limit(15),
+         {"ix_email_logs_user_date"}),
+        ("historial de chat",
+         db.query(ChatHistory).filter(ChatHistory.user_id == USER_ID).order_by(ChatHistory.id.desc()).limit(10),
+         {"ix_chat_history_user_id_id"}),
+    ]
+
+
+def explain(db, query) -> str:
+    sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    if engine.dialect.name == "sqlite":
+        rows = db.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        return "\n".join(str(r[-1]) for r in rows)
+    rows = db.execute(text(f"EXPLAIN {sql}")).fetchall()
+    return "\n".join(str(r[0]) for r in rows)
+
+
+def main():
+    run_migrations()
+    db = SessionLocal()
+    failures = 0
+    try:
+        if engine.dialect.name == "postgresql":
+            # Con tablas chicas el planner prefiere seq scan; forzamos a que muestre si PUEDE usar el índice
+            db.execute(text("SET enable_seqscan = off"))
+
+        for label, query, accepted in hot_queries(db):
+            plan = explain(db, query)
+            used = sorted(ix for ix in accepted if ix in plan)
+            status = "OK  " if used else "FAIL"
+            if not used:
+                failures += 1
+            print(f"[{status}] {label}: {', '.join(used) if used else 'sin índice esperado'}")
+            if not used:
+                print("       " + plan.replace("\n", "\n       "))
+    finally:
+        db.rollback()
+        db.close()
+
+    print(f"\n{failures} consultas sin el índice esperado." if failures else "\nTodas las consultas usan sus índices.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
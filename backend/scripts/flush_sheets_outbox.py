@@ -0,0 +1,52 @@
+import sys
+import os
+import argparse
+
+# Add parent directory to path to allow importing app module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func
+from app.database import SessionLocal
+from app.models.sync import SheetsOutbox
+from app.services.sheets_outbox import process_batch
+
+def main():
+    parser = argparse.ArgumentParser(description="Envía la cola de escrituras pendientes a Google Sheets.")
+    parser.add_argument("--status", action="store_true", help="Solo mostrar el estado de la cola")
+    parser.add_argument("--retry-failed", action="store_true", help="Volver a encolar las operaciones fallidas")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.retry_failed:
+            n = db.query(SheetsOutbox).filter(SheetsOutbox.status == "failed").update(
+                {"status": "pending", "attempts": 0, "next_attempt_at": None}, synchronize_session=False
+            )
+            db.commit()
+            print(f"Re-queued {n} failed operations.")
+
+        if args.status:
+            for status, count in db.query(SheetsOutbox.status, func.count()).group_by(SheetsOutbox.status).all():
+                print(f" - {status}: {count}")
+            for row in db.query(SheetsOutbox).filter(SheetsOutbox.status == "failed").order_by(SheetsOutbox.id).limit(20):
+                print(f"   #{row.id} {row.op} ({row.attempts} attempts): {row.last_error}")
+            return 0
+
+        total = 0
+        while True:
+            n = process_batch(db)
+            if not n:
+                break
+            total += n
+        remaining = db.query(SheetsOutbox).filter(SheetsOutbox.status != "failed").count()
+        print(f"Processed {total} operations, {remaining} still pending (backoff).")
+        return 0
+    except Exception as e:
+        print(f"Error flushing Sheets outbox: {e}")
+        db.rollback()
+        return 1
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
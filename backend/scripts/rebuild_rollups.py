@@ -0,0 +1,42 @@
+import sys
+import os
+import argparse
+
+# Add parent directory to path to allow importing app module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.services.rollup_service import rebuild_rollups, check_rollups
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula o verifica los rollups mensuales de gastos.")
+    parser.add_argument("--user", type=int, default=None, help="ID de usuario (por defecto: todos)")
+    parser.add_argument("--check", action="store_true", help="Solo verificar consistencia, sin modificar nada")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.check:
+            mismatches = check_rollups(db, args.user)
+            if not mismatches:
+                print("Rollups consistent with expenses table.")
+                return 0
+            print(f"Found {len(mismatches)} inconsistent rollups:")
+            for m in mismatches:
+                print(f" - user={m['user_id']} {m['month']} [{m['section']}] {m['category']}: "
+                      f"stored ${m['stored_total']} ({m['stored_count']}) vs expected ${m['expected_total']} ({m['expected_count']})")
+            return 1
+
+        rows = rebuild_rollups(db, args.user)
+        db.commit()
+        print(f"Rebuilt {rows} rollup rows.")
+        return 0
+    except Exception as e:
+        print(f"Error processing rollups: {e}")
+        db.rollback()
+        return 1
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+import sys
+import os
+
+# Add parent directory to path to allow importing app module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.services.sheet_index import reconcile_from_sheet
+
+def main():
+    """Reconstruye el índice expense_id -> fila de 'Gastos' (p.ej. tras editar la hoja a mano)."""
+    db = SessionLocal()
+    try:
+        result = reconcile_from_sheet(db)
+        if result is None:
+            print("No Google Sheets access, nothing reconciled.")
+            return 1
+        print(f"Indexed {result['indexed']} rows; {result['without_id']} rows without ID (matched by fields until edited).")
+        return 0
+    except Exception as e:
+        print(f"Error reconciling sheet index: {e}")
+        db.rollback()
+        return 1
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())